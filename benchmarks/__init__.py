@@ -0,0 +1 @@
+__all__ = ['synthetic', 'mock_layer', 'run', 'compare', 'startup']
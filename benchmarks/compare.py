@@ -0,0 +1,52 @@
+"""
+Compare two benchmark result files and flag slower stages.
+
+    python -m benchmarks.compare baseline.json current.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[dict]:
+    """Return one row per stage present in both results."""
+    rows = []
+    for name, before in baseline["stages"].items():
+        after = current["stages"].get(name)
+        if after is None:
+            continue
+        change = after["seconds_median"] / before["seconds_median"] - 1 if before["seconds_median"] else 0.0
+        rows.append({
+            "stage": name,
+            "before": before["seconds_median"],
+            "after": after["seconds_median"],
+            "change": change,
+            "regression": change > threshold,
+        })
+    return rows
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown counted as regression (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    rows = compare(
+        json.loads(args.baseline.read_text(encoding="utf-8")),
+        json.loads(args.current.read_text(encoding="utf-8")),
+        args.threshold
+    )
+
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['stage']:18} {row['before']:10.4f}s → {row['after']:10.4f}s  {row['change'] * 100:+7.1f}%  {flag}")
+
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
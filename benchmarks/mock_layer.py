@@ -0,0 +1,24 @@
+import random
+import threading
+import time
+
+
+class MockLayer:
+    """In-memory stand-in for a FeatureLayer with configurable request latency."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.features = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def edit_features(self, adds=None, deletes=None):
+        with self._lock:
+            self.requests += 1
+            self.features += len(adds or [])
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        return {"addResults": [{"objectId": i, "success": True} for i in range(len(adds or []))]}
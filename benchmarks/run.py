@@ -0,0 +1,302 @@
+"""
+Benchmark every pipeline stage on a synthetic sheet and write JSON results.
+
+    python -m benchmarks.run --rows 100000 --output bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import config
+from benchmarks.mock_layer import MockLayer
+from benchmarks.startup import import_times, startup_seconds
+from benchmarks.synthetic import DISTRIBUTIONS, make_sheet, sheet_csv
+from utils.arcgis_client import FeatureBatch, RestFeatureLayer, df_to_features, iter_features, upload_features_batch
+from utils.data_processing import expand_dataframe
+from utils.export import export_features
+from utils.fake_feature_server import FakeFeatureLayer, FakeFeatureService, serve_fake_feature_server
+from utils.google_sheets import SheetCache, load_google_sheet
+from utils.parallel import parallel_features
+
+STAGES = [
+    "startup", "load", "expand", "expand_reference", "features", "raw_features", "feature_batch",
+    "parallel", "export", "upload", "transport", "pipeline"
+]
+DEFAULT_STAGES = ["load", "expand", "features", "upload"]
+
+
+def parse_arguments(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on a synthetic sheet")
+    parser.add_argument("--rows", type=int, default=10000, help="Sheet rows to generate (default: 10000)")
+    parser.add_argument("--max-value", type=int, default=10, help="Largest value in a cell (default: 10)")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform", help="Value distribution (default: uniform)")
+    parser.add_argument("--invalid-share", type=float, default=0.01, help="Share of rows with invalid coordinates (default: 0.01)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=DEFAULT_STAGES, help="Stages to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; min and median are reported (default: 3)")
+    parser.add_argument("--memory", action="store_true", help="Trace peak Python allocations per stage (slower)")
+    parser.add_argument("--csv-engine", choices=["c", "pyarrow"], default="c", help="CSV parser for the load stage")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock applyEdits latency in seconds (default: 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency in seconds (default: 0)")
+    parser.add_argument("--batch-size", type=int, default=config.BATCH_SIZE, help=f"Upload batch size (default: {config.BATCH_SIZE})")
+    parser.add_argument("--jobs", type=int, default=2, help="Processes for the parallel expand+features stage (default: 2)")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent upload requests (default: 1)")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def measure(func, repeat: int, trace_memory: bool) -> tuple[dict, object]:
+    """Run ``func`` ``repeat`` times and return timing stats and the last result."""
+    wall, cpu = [], []
+    peak_mb = None
+    result = None
+
+    for i in range(repeat):
+        traced = trace_memory and i == repeat - 1
+        if traced:
+            tracemalloc.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = func()
+        wall.append(time.perf_counter() - wall_start)
+        cpu.append(time.process_time() - cpu_start)
+        if traced:
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+
+    stats = {
+        "seconds_min": round(min(wall), 6),
+        "seconds_median": round(statistics.median(wall), 6),
+        "cpu_seconds_median": round(statistics.median(cpu), 6),
+    }
+    if trace_memory:
+        stats["traced_peak_mb"] = round(peak_mb, 3)
+    return stats, result
+
+
+def run_pipeline(command: list[str], env: dict) -> tuple[float, float]:
+    """Run ``command`` to completion; return its wall time and peak RSS in MB (0 where unsupported)."""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=config.PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if hasattr(os, "wait4"):
+        # wait4 returns the resource usage of this child alone, unlike RUSAGE_CHILDREN
+        stderr = process.stderr.read()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak = usage.ru_maxrss / 2**20 if sys.platform == "darwin" else usage.ru_maxrss / 2**10
+    else:
+        stderr = process.communicate()[1]
+        peak = 0.0
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} exited with {process.returncode}: {stderr.decode(errors='replace')[-2000:]}")
+    return seconds, peak
+
+
+def run(args: argparse.Namespace) -> dict:
+    raw = make_sheet(args.rows, args.max_value, args.distribution, args.invalid_share, args.seed)
+    data = sheet_csv(raw)
+    stages = {}
+
+    if "startup" in args.stages:
+        stats, _ = measure(startup_seconds, args.repeat, False)
+        imports = import_times(top_level=False)
+        stages["startup"] = {
+            **stats,
+            "rows_in": 0,
+            "import_ms": round(sum(import_times().values()) / 1000, 1),
+            "arcgis_imported": "arcgis" in imports,
+        }
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = SheetCache(Path(cache_dir), offline=True)
+        cache.store("benchmark", 0, data)
+
+        stats, df = measure(
+            lambda: load_google_sheet("benchmark", 0, config.VALUE_COLUMNS, cache=cache, engine=args.csv_engine),
+            args.repeat if "load" in args.stages else 1,
+            args.memory and "load" in args.stages
+        )
+        if "load" in args.stages:
+            stages["load"] = {**stats, "rows_in": len(raw), "rows_out": len(df), "bytes_in": len(data)}
+
+    stats, expanded = measure(
+        lambda: expand_dataframe(df, config.VALUE_COLUMNS, show_progress=False),
+        args.repeat if "expand" in args.stages else 1,
+        args.memory and "expand" in args.stages
+    )
+    if "expand" in args.stages:
+        stages["expand"] = {**stats, "rows_in": len(df), "rows_out": len(expanded)}
+
+    if "expand_reference" in args.stages:
+        stats, _ = measure(
+            lambda: expand_dataframe(df, config.VALUE_COLUMNS, show_progress=False, vectorized=False),
+            args.repeat,
+            args.memory
+        )
+        stages["expand_reference"] = {**stats, "rows_in": len(df), "rows_out": len(expanded)}
+
+    features = None
+    if "features" in args.stages or "upload" in args.stages:
+        stats, features = measure(
+            lambda: df_to_features(expanded),
+            args.repeat if "features" in args.stages else 1,
+            args.memory and "features" in args.stages
+        )
+        if "features" in args.stages:
+            stages["features"] = {**stats, "rows_in": len(expanded), "rows_out": len(features)}
+
+    if "raw_features" in args.stages or "transport" in args.stages:
+        stats, raw_features = measure(
+            lambda: df_to_features(expanded, raw=True),
+            args.repeat if "raw_features" in args.stages else 1,
+            args.memory and "raw_features" in args.stages
+        )
+        if "raw_features" in args.stages:
+            stages["raw_features"] = {**stats, "rows_in": len(expanded), "rows_out": len(raw_features)}
+
+    if "feature_batch" in args.stages:
+        stats, batch = measure(lambda: FeatureBatch.from_dataframe(expanded), args.repeat, args.memory)
+        stages["feature_batch"] = {**stats, "rows_in": len(expanded), "rows_out": len(batch), "column_mb": round(batch.nbytes / 2**20, 3)}
+
+    if "transport" in args.stages:
+        # Feature objects in uncompressed bodies versus raw JSON in gzip bodies, over localhost HTTP
+        if features is None:
+            features = df_to_features(expanded)
+        for name, batch_features, level in [("transport_plain", features, 0), ("transport", raw_features, config.GZIP_LEVEL)]:
+            service = FakeFeatureService()
+            server, url = serve_fake_feature_server(service)
+            try:
+                layer = RestFeatureLayer(FakeFeatureLayer(service, url=url), pool_size=args.workers, compress_level=level)
+                stats, upload_stats = measure(
+                    lambda: upload_features_batch(
+                        layer, batch_features, batch_size=args.batch_size, show_progress=False, workers=args.workers
+                    ),
+                    args.repeat,
+                    args.memory
+                )
+            finally:
+                server.shutdown()
+            stages[name] = {
+                **stats,
+                "rows_in": len(batch_features),
+                "rows_out": upload_stats["success"],
+                "wire_bytes": layer.bytes_sent // args.repeat,
+            }
+
+    if "parallel" in args.stages:
+        stats, parallel = measure(
+            lambda: parallel_features(df, config.VALUE_COLUMNS, jobs=args.jobs),
+            args.repeat,
+            args.memory
+        )
+        stages["parallel"] = {**stats, "rows_in": len(df), "rows_out": len(parallel), "jobs": args.jobs}
+
+    if "export" in args.stages:
+        # Conversion and a GeoParquet write, streamed in CHUNK_SIZE chunks: the dry-run --output path
+        with tempfile.TemporaryDirectory() as output_dir:
+            stats, export_stats = measure(
+                lambda: export_features(iter_features([expanded], as_dict=True), Path(output_dir) / "features.parquet", config.CHUNK_SIZE),
+                args.repeat,
+                args.memory
+            )
+        stages["export"] = {**stats, "rows_in": len(expanded), "rows_out": export_stats["count"], "bytes_out": export_stats["bytes"]}
+
+    if "upload" in args.stages:
+        layer = MockLayer(args.latency, args.jitter, args.seed)
+        stats, upload_stats = measure(
+            lambda: upload_features_batch(
+                layer, features, batch_size=args.batch_size, show_progress=False, workers=args.workers
+            ),
+            args.repeat,
+            args.memory
+        )
+        stages["upload"] = {
+            **stats,
+            "rows_in": len(features),
+            "rows_out": upload_stats["success"],
+            "requests": layer.requests // args.repeat,
+        }
+
+    if "pipeline" in args.stages:
+        # The whole main.py run against the fake backend, measured from outside the process
+        with tempfile.TemporaryDirectory() as run_dir:
+            SheetCache(Path(run_dir)).store("benchmark", 0, data)
+            env = {
+                **os.environ, "CACHE_DIR": run_dir, "STATE_DB": str(Path(run_dir) / "state.sqlite3"),
+                "FAKE_LATENCY": str(args.latency),
+            }
+            command = [
+                sys.executable, "main.py", "--url", "https://docs.google.com/spreadsheets/d/benchmark/edit#gid=0",
+                "--backend", "fake", "--offline", "--no-progress", "--no-report", "--workers", str(args.workers),
+                "--batch-size", str(args.batch_size), "--log-file", str(Path(run_dir) / "run.log")
+            ]
+            runs = [run_pipeline(command, env) for _ in range(args.repeat)]
+        wall = [seconds for seconds, _ in runs]
+        stages["pipeline"] = {
+            "seconds_min": round(min(wall), 6),
+            "seconds_median": round(statistics.median(wall), 6),
+            "peak_rss_mb": round(max(peak for _, peak in runs), 1),
+            "rows_in": len(raw),
+            "rows_out": len(expanded),
+        }
+
+    for stage in stages.values():
+        if stage["rows_in"] and stage["seconds_median"] > 0:
+            stage["rows_per_second"] = round(stage["rows_in"] / stage["seconds_median"], 1)
+        if stage.get("traced_peak_mb") is not None and stage["rows_out"]:
+            stage["traced_mb_per_million"] = round(stage["traced_peak_mb"] / stage["rows_out"] * 1e6, 1)
+
+    return {"meta": environment(args), "stages": stages}
+
+
+def environment(args: argparse.Namespace) -> dict:
+    """Describe the run so results from different versions can be compared."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=config.PROJECT_ROOT, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "params": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+    }
+
+
+def main(argv: list[str] = None) -> int:
+    args = parse_arguments(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run(args)
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Measure CLI startup: wall time of ``main.py --help`` and ``python -X importtime``.
+
+    python -m benchmarks.startup --top 10
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import config
+
+HELP_COMMAND = [sys.executable, "main.py", "--help"]
+
+
+def import_times(command: list[str] = None, top_level: bool = True) -> dict[str, int]:
+    """Return cumulative import microseconds per module imported by ``command``.
+
+    With ``top_level`` only modules imported directly (not by another module) are listed.
+    """
+    command = command or HELP_COMMAND
+    result = subprocess.run(
+        [command[0], "-X", "importtime", *command[1:]],
+        capture_output=True, text=True, cwd=config.PROJECT_ROOT
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not top_level or not name.startswith("  "):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def startup_seconds(command: list[str] = None) -> float:
+    """Return the wall time of one run of ``command``."""
+    start = time.perf_counter()
+    subprocess.run(command or HELP_COMMAND, capture_output=True, cwd=config.PROJECT_ROOT, check=True)
+    return time.perf_counter() - start
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure main.py startup and import times")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to show (default: 10)")
+    args = parser.parse_args(argv)
+
+    times = import_times()
+    modules = import_times(top_level=False)
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    print(json.dumps({
+        "help_seconds": round(startup_seconds(), 4),
+        "imports_ms": {name: round(us / 1000, 1) for name, us in slowest},
+        "arcgis_imported": "arcgis" in modules,
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
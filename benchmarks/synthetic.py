@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+import config
+
+REGIONS = ["Київська", "Львівська", "Одеська", "Харківська", "Дніпропетровська", "Запорізька"]
+CITIES = ["Київ", "Львів", "Одеса", "Харків", "Дніпро", "Запоріжжя", "Біла Церква", "Ужгород"]
+DISTRIBUTIONS = ["uniform", "poisson", "zipf"]
+
+
+def make_sheet(
+    rows: int,
+    max_value: int = 10,
+    distribution: str = "uniform",
+    invalid_share: float = 0.0,
+    seed: int = 0
+) -> pd.DataFrame:
+    """Build a raw sheet as Google Sheets exports it (decimal-comma coordinates).
+
+    ``distribution`` controls the values: "uniform" in [0, max_value],
+    "poisson" with mean max_value / 2, or "zipf" (heavy tail, capped at
+    max_value). ``invalid_share`` of the rows get an empty coordinate.
+    """
+    rng = np.random.default_rng(seed)
+
+    if distribution == "uniform":
+        values = rng.integers(0, max_value + 1, size=(rows, len(config.VALUE_COLUMNS)))
+    elif distribution == "poisson":
+        values = rng.poisson(max_value / 2, size=(rows, len(config.VALUE_COLUMNS)))
+    elif distribution == "zipf":
+        values = rng.zipf(2.0, size=(rows, len(config.VALUE_COLUMNS))) - 1
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    values = np.clip(values, 0, max_value)
+
+    long = rng.uniform(22.0, 40.0, rows).round(6)
+    lat = rng.uniform(44.5, 52.3, rows).round(6)
+    long_text = pd.Series(long).map(lambda v: f"{v}".replace(".", ","))
+    lat_text = pd.Series(lat).map(lambda v: f"{v}".replace(".", ","))
+    invalid = rng.random(rows) < invalid_share
+    long_text[invalid] = ""
+
+    dates = pd.Timestamp("2026-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+
+    return pd.DataFrame({
+        "Дата": dates.strftime("%Y-%m-%d"),
+        "Область": rng.choice(REGIONS, rows),
+        "Місто": rng.choice(CITIES, rows),
+        "long": long_text,
+        "lat": lat_text,
+        **{col: values[:, i] for i, col in enumerate(config.VALUE_COLUMNS)}
+    })
+
+
+def sheet_csv(df: pd.DataFrame) -> bytes:
+    """Serialize a raw sheet the way the export endpoint returns it."""
+    return df.to_csv(index=False).encode("utf-8")
@@ -1,18 +1,62 @@
 import os
 from pathlib import Path
-from dotenv import load_dotenv
-
-load_dotenv()
 
 PROJECT_ROOT = Path(__file__).parent
+
+# Loaded here rather than in main(): every setting below is read from the environment
+# once, at import, and also configures benchmarks and the fake server CLI
+ENV_FILE = PROJECT_ROOT / ".env"
+if ENV_FILE.is_file():
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
+
 LOGS_DIR = PROJECT_ROOT / "logs"
-LOGS_DIR.mkdir(exist_ok=True)
+STATE_DB = Path(os.getenv("STATE_DB", LOGS_DIR / "state.sqlite3"))
+CACHE_DIR = Path(os.getenv("CACHE_DIR", PROJECT_ROOT / ".cache"))
 
 ARCGIS_ITEM_ID = os.getenv("item_id", "2250ee027e04401dae8c72e09159af25")
 
+# "online" uses ArcGIS Online, "fake" the local stand-in in utils/fake_feature_server.py
+ARCGIS_BACKEND = os.getenv("ARCGIS_BACKEND", "online")
+FAKE_LATENCY = float(os.getenv("FAKE_LATENCY", "0.05"))
+FAKE_THROTTLE_RATE = float(os.getenv("FAKE_THROTTLE_RATE", "0"))
+FAKE_MAX_CONCURRENT = int(os.getenv("FAKE_MAX_CONCURRENT", "0"))
+FAKE_MAX_REQUEST_BYTES = int(os.getenv("FAKE_MAX_REQUEST_BYTES", "0"))
+FAKE_REJECT_RATE = float(os.getenv("FAKE_REJECT_RATE", "0"))
+
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "500"))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "1"))
+JOBS = int(os.getenv("JOBS", "1"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "2000"))
+MAX_PAYLOAD_BYTES = int(os.getenv("MAX_PAYLOAD_BYTES", str(4 * 1024 * 1024)))
+TARGET_BATCH_SECONDS = float(os.getenv("TARGET_BATCH_SECONDS", "5"))
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "5"))
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "1"))
+RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS", "60"))
+# "arcgis" sends edits through the arcgis package, "rest" posts pre-encoded gzip bodies directly
+UPLOAD_TRANSPORT = os.getenv("UPLOAD_TRANSPORT", "arcgis")
+COORDINATE_PRECISION = int(os.getenv("COORDINATE_PRECISION", "6"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# "threads" keeps --workers blocking requests in flight, "async" drives them from one event loop
+UPLOAD_ENGINE = os.getenv("UPLOAD_ENGINE", "threads")
+RATE_LIMIT = float(os.getenv("RATE_LIMIT", "0"))
+MAX_IN_FLIGHT_MB = float(os.getenv("MAX_IN_FLIGHT_MB", "64"))
+CSV_ENGINE = os.getenv("CSV_ENGINE", "c")
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "4"))
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "10000"))
+# "ladder" uploads one feature per unit level, "weighted" one per run of identical levels
+OUTPUT_MODE = os.getenv("OUTPUT_MODE", "ladder")
 VALUE_COLUMNS = [f"Значення {i}" for i in range(1, 11)]
 
+TEXT_FIELDS = {"Дата": "date", "Область": "region", "Місто": "city"}
+VALUE_FIELDS = {col: f"value_{i}" for i, col in enumerate(VALUE_COLUMNS, 1)}
+RUN_FIELDS = {"count": "count", "level_from": "level_from", "level_to": "level_to"}
+
+# Prometheus metrics: node-exporter textfile path and/or pushgateway base URL
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE")
+PUSHGATEWAY_URL = os.getenv("PUSHGATEWAY_URL")
+METRICS_JOB = os.getenv("METRICS_JOB", "m1mt")
+
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
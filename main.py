@@ -1,22 +1,24 @@
 import logging
 import argparse
+import contextlib
+import importlib.util
 import sys
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
 import config
 from utils.logger import setup_logging
-from utils.google_sheets import parse_google_sheet_url, load_google_sheet, GoogleSheetsError
-from utils.data_processing import expand_dataframe, validate_dataframe
-from utils.arcgis_client import (
-    ArcGISClient,
-    ArcGISError,
-    df_to_features,
-    upload_features_batch
-)
+from utils.instrumentation import RunRecorder
+from utils.metrics_export import MetricsExportError, render_metrics, write_textfile, push_metrics
+
+# pandas and arcgis are imported where they are used, so --help and argument
+# errors return immediately and dry runs never load the arcgis package
 
 logger = logging.getLogger(__name__)
 
+REQUIRED_COLUMNS = ["Дата", "Область", "Місто", "long", "lat"] + config.VALUE_COLUMNS
+
 
 def parse_arguments() -> argparse.Namespace:
     """Parse command-line arguments."""
@@ -28,20 +30,90 @@ Examples:
   python main.py
   python main.py --url "https://docs.google.com/spreadsheets/d/SHEET_ID/edit?gid=0"
   python main.py --url "URL" --batch-size 1000 --log-level DEBUG
+  python main.py --url "URL" --workers 4
+  python main.py --url "URL1" "URL2" "URL3"
+  python main.py --manifest sheets.txt
+  python main.py --source backfill.parquet --stream
+  python main.py --url "URL" --adaptive-batching
+  python main.py --url "URL" --output-mode weighted
+  python main.py --url "URL" --jobs 4
+  python main.py --url "URL" --stream --chunk-size 5000
+  python main.py --url "URL" --resume
+  python main.py --url "URL" --sync
+  python main.py --url "URL" --dedup
+  python main.py --url "URL" --mode replace
+  python main.py --url "URL" --dry-run --offline
+  python main.py --url "URL" --dry-run --stream --output features.parquet
+  python main.py --url "URL" --backend fake --workers 8
+  python main.py --url "URL" --transport rest --workers 4
+  python main.py --url "URL" --engine async --workers 32 --rate 20
   python main.py --url "URL" --log-file logs/run.log
+  python main.py --url "URL" --metrics-textfile /var/lib/node_exporter/m1mt.prom
         """
     )
 
-    parser.add_argument("--url", type=str, help="Google Sheets URL to load data from")
+    parser.add_argument("--url", type=str, nargs="+", help="Google Sheets URL(s) to load data from")
+    parser.add_argument("--manifest", type=Path, help="File with one Google Sheets URL per line, loaded like several --url")
+    parser.add_argument("--source", type=Path, nargs="+", help="Local CSV, Parquet, Arrow IPC or XLSX file(s) to load instead of Google Sheets")
     parser.add_argument("--item-id", type=str, default=config.ARCGIS_ITEM_ID, help=f"ArcGIS item ID (default: {config.ARCGIS_ITEM_ID})")
+    parser.add_argument("--backend", type=str, default=config.ARCGIS_BACKEND, choices=["online", "fake"], help=f"Upload to ArcGIS Online or to a local fake FeatureServer (default: {config.ARCGIS_BACKEND})")
+    parser.add_argument("--mode", type=str, default="add", choices=["add", "replace"], help="Add features to the layer, or replace all of its features with the sheet (default: add)")
+    parser.add_argument("--output-mode", type=str, default=config.OUTPUT_MODE, choices=["ladder", "weighted"], help=f"One feature per ladder level, or one per run of identical levels with count/level_from/level_to (default: {config.OUTPUT_MODE})")
     parser.add_argument("--batch-size", type=int, default=config.BATCH_SIZE, help=f"Number of features per batch (default: {config.BATCH_SIZE})")
+    parser.add_argument("--adaptive-batching", action="store_true", help="Size batches from payload bytes and latency, splitting failed batches (--batch-size is the starting size)")
+    parser.add_argument("--max-retries", type=int, default=config.MAX_RETRIES, help=f"Retries per request for transient errors, 0 disables (default: {config.MAX_RETRIES})")
+    parser.add_argument("--transport", type=str, default=config.UPLOAD_TRANSPORT, choices=["arcgis", "rest"], help=f"Send edits through the arcgis package, or post pre-encoded gzip-compressed applyEdits requests directly (default: {config.UPLOAD_TRANSPORT})")
+    parser.add_argument("--workers", type=int, default=config.UPLOAD_WORKERS, help=f"Number of concurrent upload requests (default: {config.UPLOAD_WORKERS})")
+    parser.add_argument("--engine", type=str, default=config.UPLOAD_ENGINE, choices=["threads", "async"], help=f"Run upload requests on a thread pool or on an asyncio event loop (default: {config.UPLOAD_ENGINE})")
+    parser.add_argument("--rate", type=float, default=config.RATE_LIMIT, help="Async engine: at most this many requests per second, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--max-in-flight-mb", type=float, default=config.MAX_IN_FLIGHT_MB, help="Async engine: cap on payload megabytes in flight (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=config.JOBS, help=f"Processes for expanding and converting the sheet (default: {config.JOBS})")
     parser.add_argument("--log-level", type=str, default=config.LOG_LEVEL, choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], help=f"Logging level (default: {config.LOG_LEVEL})")
     parser.add_argument("--log-file", type=Path, help="Path to log file (optional)")
+    parser.add_argument("--no-report", action="store_true", help="Don't write the JSON run report next to the log file")
+    parser.add_argument("--metrics-textfile", type=Path, default=config.METRICS_TEXTFILE, help="Write Prometheus metrics to this file for the node-exporter textfile collector")
+    parser.add_argument("--pushgateway", type=str, default=config.PUSHGATEWAY_URL, help="Push Prometheus metrics to this pushgateway URL")
     parser.add_argument("--no-progress", action="store_true", help="Disable progress bars")
     parser.add_argument("--show-fields", action="store_true", help="Show ArcGIS layer fields and exit")
+    parser.add_argument("--no-cache", action="store_true", help="Always download the sheet instead of revalidating the local snapshot")
+    parser.add_argument("--offline", action="store_true", help="Load the sheet from the local snapshot without network access")
+    parser.add_argument("--csv-engine", type=str, default=config.CSV_ENGINE, choices=["c", "pyarrow"], help=f"CSV parser for the sheet export (default: {config.CSV_ENGINE})")
+    parser.add_argument("--stream", action="store_true", help="Load, expand and upload in bounded chunks instead of all at once")
+    parser.add_argument("--chunk-size", type=int, default=config.CHUNK_SIZE, help=f"Sheet rows per chunk in streaming mode (default: {config.CHUNK_SIZE})")
+    parser.add_argument("--resume", action="store_true", help="Skip batches of this sheet snapshot committed by a previous run")
+    parser.add_argument("--sync", action="store_true", help="Upload only rows changed since the last sync and delete features of removed rows")
+    parser.add_argument("--dedup", action="store_true", help="Skip features already on the layer, using a locally cached index of its features")
+    parser.add_argument("--refresh-index", action="store_true", help="Rebuild the --dedup index from a full layer scan")
     parser.add_argument("--dry-run", action="store_true", help="Process data but don't upload to ArcGIS")
-
-    return parser.parse_args()
+    parser.add_argument("--output", type=Path, help="With --dry-run, write the features to this .geojsonl, .parquet or .fgb file")
+
+    args = parser.parse_args()
+    if args.source and (args.url or args.manifest):
+        parser.error("--source reads local files and cannot be combined with --url or --manifest")
+    if args.resume and args.stream:
+        parser.error("--resume needs the full sheet snapshot and cannot be combined with --stream")
+    if args.offline and args.no_cache:
+        parser.error("--offline replays the local snapshot and cannot be combined with --no-cache")
+    if args.stream and args.csv_engine == "pyarrow":
+        parser.error("--csv-engine pyarrow cannot read in chunks; use it without --stream")
+    if args.sync and (args.stream or args.resume):
+        parser.error("--sync cannot be combined with --stream or --resume")
+    if args.dedup and (args.sync or args.resume):
+        parser.error("--dedup cannot be combined with --sync or --resume")
+    if args.mode == "replace" and (args.sync or args.resume or args.dedup):
+        parser.error("--mode replace clears the layer and cannot be combined with --sync, --resume or --dedup")
+    if args.refresh_index and not args.dedup:
+        parser.error("--refresh-index requires --dedup")
+    if args.engine == "async" and (args.sync or args.mode == "replace" or args.adaptive_batching):
+        parser.error("--engine async cannot be combined with --sync, --mode replace or --adaptive-batching")
+    if args.engine == "async" and not args.dry_run and importlib.util.find_spec("aiohttp") is None:
+        parser.error("--engine async needs aiohttp (pip install aiohttp)")
+    if args.output and (not args.dry_run or args.sync):
+        parser.error("--output requires --dry-run and cannot be combined with --sync")
+    if args.jobs > 1 and (args.stream or args.sync):
+        parser.error("--jobs partitions the whole sheet and cannot be combined with --stream or --sync")
+
+    return args
 
 
 def get_google_sheet_url(url_arg: str = None) -> str:
@@ -65,107 +137,494 @@ def get_google_sheet_url(url_arg: str = None) -> str:
     return url
 
 
-def main() -> int:
-    """Main application entry point."""
-    args = parse_arguments()
+def get_source_urls(args: argparse.Namespace) -> list[str]:
+    """Return the sheet URLs from --url and --manifest, asking for one if neither is given."""
+    from utils.google_sheets import read_manifest
 
-    log_file = args.log_file or config.LOGS_DIR / f"run_{datetime.now():%Y%m%d_%H%M%S}.log"
-    setup_logging(
-        log_level=args.log_level,
-        log_file=log_file,
-        log_format=config.LOG_FORMAT,
-        date_format=config.LOG_DATE_FORMAT
+    urls = list(args.url or [])
+    if args.manifest:
+        urls += read_manifest(args.manifest)
+    return list(dict.fromkeys(urls)) or [get_google_sheet_url()]
+
+
+def merge_stats(total: dict, stats: dict) -> dict:
+    """Add the counters of ``stats`` to ``total`` (error classes are summed too)."""
+    merged = dict(total)
+    for key, value in stats.items():
+        if key == "errors":
+            merged[key] = dict(Counter(merged.get(key, {})) + Counter(value))
+        else:
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def print_source_summary(sources: dict) -> None:
+    """Print per-source statistics of a multi-sheet run."""
+    print("Per source:")
+    for label, source_stats in sources.items():
+        print(f"  {label:30} " + "  ".join(f"{key}={value}" for key, value in source_stats.items()))
+
+
+def print_upload_summary(stats: dict) -> None:
+    """Print upload statistics."""
+    print("\n" + "=" * 80)
+    print("UPLOAD SUMMARY")
+    print("=" * 80)
+    print(f"Total features:     {stats['total']}")
+    if stats['resumed']:
+        print(f"Already committed:  {stats['resumed']} (skipped)")
+    if stats.get('duplicates'):
+        print(f"Already on layer:   {stats['duplicates']} (skipped)")
+    print(f"Successfully added: {stats['success']}")
+    print(f"Failed:             {stats['failed']}")
+    print(f"Success rate:       {stats['success'] / stats['total'] * 100:.1f}%")
+    print(f"Retries:            {stats['retries']} ({stats['retry_wait']:.1f}s waiting)")
+    if 'swap_seconds' in stats:
+        print(f"Replaced:           {stats['cleared']} features ({stats['clear_method']}, then {stats['upload_method']})")
+        print(f"Swap window:        {stats['swap_seconds']:.1f}s with the layer empty or partial")
+    if stats['errors']:
+        print(f"Errors by class:    {', '.join(f'{k}={v}' for k, v in sorted(stats['errors'].items()))}")
+    if stats.get('sources'):
+        print_source_summary(stats['sources'])
+    print("=" * 80 + "\n")
+
+    if stats['failed'] > 0:
+        logger.warning(f"{stats['failed']} features failed to upload. Check logs for details.")
+
+
+def print_sync_summary(stats: dict, dry_run: bool = False) -> None:
+    """Print incremental sync statistics."""
+    print("\n" + "=" * 80)
+    print("SYNC SUMMARY" + (" (DRY RUN)" if dry_run else ""))
+    print("=" * 80)
+    print(f"Unchanged rows:     {stats['unchanged_rows']}")
+    print(f"New/changed rows:   {stats['new_rows']}")
+    print(f"Removed rows:       {stats['removed_rows']}")
+    if not dry_run:
+        print(f"Features deleted:   {stats['deleted']}")
+        print(f"Features added:     {stats['success']}/{stats['total']}")
+        print(f"Failed:             {stats['failed']}")
+    if stats.get('sources'):
+        print_source_summary(stats['sources'])
+    print("=" * 80 + "\n")
+
+    if stats['failed'] > 0:
+        logger.warning(f"{stats['failed']} features failed to upload; their rows will be retried on the next sync.")
+
+
+def sync_source(args: argparse.Namespace, source: tuple) -> str:
+    """Key of the sync state; weighted output keeps its own state."""
+    key = ":".join([args.item_id, *map(str, source)])
+    return key if args.output_mode == "ladder" else f"{key}:{args.output_mode}"
+
+
+def load_sources(args: argparse.Namespace, sources: list[tuple], cache) -> list:
+    """Load every source: local files with --source, Google Sheets otherwise."""
+    if args.source:
+        from utils.local_sources import load_local_file
+        return [load_local_file(path, config.VALUE_COLUMNS, engine=args.csv_engine) for path, in sources]
+
+    from utils.google_sheets import load_google_sheets
+    return load_google_sheets(sources, config.VALUE_COLUMNS, cache=cache, engine=args.csv_engine, workers=config.FETCH_WORKERS)
+
+
+def iter_source(args: argparse.Namespace, source: tuple, cache):
+    """Yield prepared chunks of one local file or Google Sheet."""
+    if args.source:
+        from utils.local_sources import iter_local_file
+        return iter_local_file(source[0], config.VALUE_COLUMNS, chunksize=args.chunk_size)
+
+    from utils.google_sheets import iter_google_sheet
+    return iter_google_sheet(*source, config.VALUE_COLUMNS, chunksize=args.chunk_size, cache=cache)
+
+
+def create_client(backend: str, serve: bool = False):
+    """Return the ArcGIS client for ``backend`` ("online" or "fake").
+
+    With ``serve`` the fake layer is served over localhost HTTP, so requests
+    that need a layer URL (REST transport, aiohttp sender) work offline.
+    """
+    if backend == "fake":
+        from utils.fake_feature_server import FakeArcGISClient
+        return FakeArcGISClient(serve=serve)
+
+    from utils.arcgis_client import ArcGISClient
+    return ArcGISClient()
+
+
+def write_output(args: argparse.Namespace, features, recorder: RunRecorder) -> int:
+    """Export dry-run features to --output with the schema of the field mapping; return the count."""
+    from utils.export import export_features, mapped_fields
+
+    with recorder.span("export") as span:
+        export = export_features(features, args.output, chunk_size=args.chunk_size, fields=mapped_fields(args.output_mode))
+        span.rows_out = export["count"]
+    recorder.results.update(output=str(args.output), output_bytes=export["bytes"])
+    return export["count"]
+
+
+def run(args: argparse.Namespace, recorder: RunRecorder) -> int:
+    """Run the pipeline, timing every stage in ``recorder``; close what it opened."""
+    with contextlib.ExitStack() as cleanup:
+        return run_pipeline(args, recorder, cleanup)
+
+
+def run_pipeline(args: argparse.Namespace, recorder: RunRecorder, cleanup: contextlib.ExitStack) -> int:
+    """Run the pipeline, timing every stage in ``recorder``."""
+    from utils.google_sheets import parse_google_sheet_url, SheetCache
+    from utils.checkpoint import UploadJournal, snapshot_key
+    from utils.sync import SyncState, sync_sheet
+    from utils.parallel import parallel_feature_batch
+    from utils.data_processing import expand_dataframe, iter_expand_dataframe, validate_dataframe, validate_chunks
+    from utils.arcgis_client import (
+        AdaptiveBatcher,
+        FeatureBatch,
+        RetryPolicy,
+        SourceTally,
+        iter_features,
+        upload_features_batch
     )
 
-    logger.info("=" * 80)
-    logger.info("M1MT GIS DEVELOPER TEST TASK - STARTED")
-    logger.info("=" * 80)
+    if args.output:
+        from utils.export import export_format
 
-    try:
-        logger.info("Step 1/5: Initializing ArcGIS client")
-        client = ArcGISClient()
+        export_format(args.output)
+
+    layer = None
+    if args.show_fields or not args.dry_run or args.dedup:
+        with recorder.span("connect"):
+            logger.info("Step 1/5: Initializing ArcGIS client")
+            client = create_client(args.backend, serve=not args.dry_run and (args.transport == "rest" or args.engine == "async"))
+            if hasattr(client, "close"):
+                cleanup.callback(client.close)
 
-        logger.info("Step 2/5: Retrieving feature layer")
-        layer = client.get_feature_layer(args.item_id)
+            logger.info("Step 2/5: Retrieving feature layer")
+            layer = client.get_feature_layer(args.item_id)
 
         if args.show_fields:
             client.print_layer_fields(layer)
             return 0
 
-        logger.info("Step 3/5: Loading data from Google Sheets")
-        url = get_google_sheet_url(args.url)
-        sheet_id, gid = parse_google_sheet_url(url)
+        if args.transport == "rest" and not args.dry_run:
+            from utils.arcgis_client import RestFeatureLayer
 
-        df = load_google_sheet(sheet_id, gid, config.VALUE_COLUMNS)
-        logger.info(f"Loaded {len(df)} rows from Google Sheets")
+            # Read the token per request; ArcGIS Online tokens expire during long uploads
+            layer = RestFeatureLayer(
+                layer, token=lambda: client.token, refresh_token=client.refresh_token, pool_size=args.workers
+            )
+    else:
+        logger.info("Dry run mode: not connecting to ArcGIS")
+
+    index = None
+    dedup = lambda features: features
+    if args.dedup:
+        from utils.dedup import FeatureIndex
+
+        logger.info("Refreshing the index of features already on the layer")
+        with recorder.span("index") as span, FeatureIndex(config.STATE_DB, f"{args.backend}:{args.item_id}") as index:
+            span.rows_out = index.refresh(layer, full=args.refresh_index)
+            index.load()
+        dedup = index.filter
+
+    if args.source:
+        logger.info("Step 3/5: Loading data from local files")
+        sources = [(str(path.resolve()),) for path in args.source]
+        labels = [str(path) for path in args.source]
+    else:
+        logger.info("Step 3/5: Loading data from Google Sheets")
+        sources = [parse_google_sheet_url(url) for url in get_source_urls(args)]
+        labels = [f"{sheet_id}:{gid}" for sheet_id, gid in sources]
+    cache = None if args.no_cache else SheetCache(config.CACHE_DIR, offline=args.offline)
+    tally = SourceTally()
+    raw = args.transport == "rest" and not args.dry_run
+
+    if args.stream:
+        logger.info(f"Streaming mode: processing chunks of {args.chunk_size} rows")
+        logger.info("Step 4/5: Expanding data using 'unit ladder' rule")
+        pipelines = []
+        for label, source in zip(labels, sources):
+            chunks = recorder.track("load", validate_chunks(iter_source(args, source, cache), REQUIRED_COLUMNS))
+            expanded_chunks = recorder.track("expand", iter_expand_dataframe(chunks, value_columns=config.VALUE_COLUMNS, mode=args.output_mode))
+            pipelines.append((label, dedup(recorder.track("convert", iter_features(expanded_chunks, as_dict=args.dry_run, raw=raw)))))
+        features = tally.chain(pipelines)
+    else:
+        with recorder.span("load") as span:
+            frames = load_sources(args, sources, cache)
+            span.rows_out = sum(len(df) for df in frames)
+
+        for label, df in zip(labels, frames):
+            logger.info(f"Loaded {len(df)} rows ({label})")
+            validate_dataframe(df, REQUIRED_COLUMNS)
+        rows = sum(len(df) for df in frames)
+
+    if args.sync:
+        logger.info("Step 4/5: Comparing rows with the last synced state")
+        logger.info("Step 5/5: Uploading new rows and deleting removed ones")
+        stats = {}
+        with recorder.span("sync", rows_in=rows) as span:
+            for label, source, df in zip(labels, sources, frames):
+                with SyncState(config.STATE_DB, sync_source(args, source)) as state:
+                    source_stats = sync_sheet(
+                        layer,
+                        df,
+                        state,
+                        value_columns=config.VALUE_COLUMNS,
+                        batch_size=args.batch_size,
+                        show_progress=not args.no_progress,
+                        dry_run=args.dry_run,
+                        output_mode=args.output_mode,
+                        workers=args.workers,
+                        batcher=AdaptiveBatcher(initial_size=args.batch_size) if args.adaptive_batching else None,
+                        retry=RetryPolicy(max_retries=args.max_retries),
+                        recorder=recorder
+                    )
+                stats = merge_stats(stats, source_stats)
+                if len(sources) > 1:
+                    stats.setdefault("sources", {})[label] = {
+                        key: source_stats[key] for key in ("new_rows", "removed_rows", "deleted", "success", "failed")
+                    }
+            span.rows_out = stats['success']
+        recorder.results.update(stats)
+        print_sync_summary(stats, dry_run=args.dry_run)
+        return 0
 
-        required_columns = ["Дата", "Область", "Місто", "long", "lat"] + config.VALUE_COLUMNS
-        validate_dataframe(df, required_columns)
+    if not args.stream and args.jobs > 1:
+        logger.info(f"Step 4/5: Expanding and converting data on {args.jobs} processes")
+        with recorder.span("expand", rows_in=rows) as span:
+            batches = [
+                parallel_feature_batch(df, config.VALUE_COLUMNS, jobs=args.jobs, mode=args.output_mode, as_dict=args.dry_run, raw=raw)
+                for df in frames
+            ]
+            if index is not None:
+                features = list(tally.chain((label, dedup(batch)) for label, batch in zip(labels, batches)))
+            else:
+                features = tally.concat(zip(labels, batches))
+            span.rows_out = len(features)
+        del batches
+
+        if len(features) == 0:
+            logger.warning("No data to upload after expansion (all values are zero)")
+            if args.dry_run and args.output:
+                write_output(args, [], recorder)
+            return 0
 
+    elif not args.stream:
         logger.info("Step 4/5: Expanding data using 'unit ladder' rule")
-        df_expanded = expand_dataframe(
-            df,
-            value_columns=config.VALUE_COLUMNS,
-            show_progress=not args.no_progress
-        )
-
-        if len(df_expanded) == 0:
+        with recorder.span("expand", rows_in=rows) as span:
+            expanded = [
+                expand_dataframe(
+                    df,
+                    value_columns=config.VALUE_COLUMNS,
+                    show_progress=not args.no_progress,
+                    mode=args.output_mode
+                )
+                for df in frames
+            ]
+            span.rows_out = sum(len(df) for df in expanded)
+
+        if span.rows_out == 0:
             logger.warning("No data to upload after expansion (all values are zero)")
+            if args.dry_run and args.output:
+                write_output(args, [], recorder)
             return 0
 
-        logger.info("Step 5/5: Converting to features and uploading to ArcGIS")
+        with recorder.span("convert", rows_in=span.rows_out) as span:
+            batches = [FeatureBatch.from_dataframe(df_expanded, as_dict=args.dry_run, raw=raw) for df_expanded in expanded]
+            if index is not None:
+                features = list(tally.chain((label, dedup(batch)) for label, batch in zip(labels, batches)))
+            else:
+                features = tally.concat(zip(labels, batches))
+            span.rows_out = len(features)
+        # The joined batch is all the upload needs; free the expanded frames and per-source copies
+        del expanded, batches
+
+    logger.info("Step 5/5: Converting to features and uploading to ArcGIS")
+
+    if args.dry_run:
+        logger.info("Dry run mode: skipping upload to ArcGIS")
+        if args.output:
+            count = write_output(args, features, recorder)
+        else:
+            count = sum(1 for _ in features) if args.stream else len(features)
+        if len(sources) > 1:
+            for label, source_count in tally.counts.items():
+                logger.info(f"  {label}: {source_count} features")
+        if index is not None:
+            logger.info(f"Skipping {index.skipped} features already on the layer")
+        if args.mode == "replace":
+            logger.info(f"Would replace all features of the layer with {count} features")
+        else:
+            logger.info(f"Would upload {count} features")
+        return 0
 
-        if args.dry_run:
-            logger.info("Dry run mode: skipping upload to ArcGIS")
-            features = df_to_features(df_expanded)
-            logger.info(f"Would upload {len(features)} features")
+    journal = None
+    committed = []
+    if not args.stream and args.mode == "add":
+        parts = [part for source in sources for part in source]
+        journal = UploadJournal(config.STATE_DB, snapshot_key(frames, args.item_id, *parts, args.output_mode))
+        if args.resume:
+            committed = journal.committed_ranges()
+            logger.info(f"Resuming: {len(committed)} batches already committed")
         else:
-            features = df_to_features(df_expanded)
+            journal.reset()
+
+    def on_commit(start: int, object_ids: list) -> None:
+        if journal:
+            journal.record(start, object_ids)
+        tally.record(start, object_ids)
+
+    upload_options = dict(
+        batch_size=args.batch_size,
+        show_progress=not args.no_progress,
+        workers=args.workers,
+        batcher=AdaptiveBatcher(initial_size=args.batch_size) if args.adaptive_batching else None,
+        retry=RetryPolicy(max_retries=args.max_retries),
+        on_commit=on_commit
+    )
 
-            stats = upload_features_batch(
-                layer=layer,
-                features=features,
-                batch_size=args.batch_size,
-                show_progress=not args.no_progress
-            )
+    try:
+        if args.mode == "replace":
+            from utils.replace import replace_layer
+
+            logger.info("Replace mode: clearing the layer, then loading the new features")
+            stats = replace_layer(layer, features, gis=getattr(client, "gis", None), recorder=recorder, **upload_options)
+        elif args.engine == "async":
+            from utils.async_upload import upload_features_async
+
+            with recorder.span("upload") as span:
+                stats = upload_features_async(
+                    layer,
+                    features,
+                    token=lambda: client.token,
+                    refresh_token=client.refresh_token,
+                    batch_size=args.batch_size,
+                    concurrency=args.workers,
+                    rate=args.rate,
+                    max_in_flight_bytes=int(args.max_in_flight_mb * 2**20),
+                    retry=upload_options['retry'],
+                    committed=committed,
+                    on_commit=on_commit,
+                    recorder=recorder,
+                    show_progress=not args.no_progress
+                )
+                span.rows_in = stats['total']
+                span.rows_out = stats['success']
+                span.bytes_sent = sum(batch['bytes_sent'] for batch in recorder.batches)
+        else:
+            with recorder.span("upload") as span:
+                stats = upload_features_batch(
+                    layer=layer,
+                    features=features,
+                    committed=committed,
+                    recorder=recorder,
+                    **upload_options
+                )
+                span.rows_in = stats['total']
+                span.rows_out = stats['success']
+                span.bytes_sent = sum(batch['bytes_sent'] for batch in recorder.batches)
+                if raw:
+                    span.bytes_sent = layer.bytes_sent
+                    logger.info(f"Sent {layer.bytes_sent / 1e6:.2f} MB of compressed applyEdits bodies")
+    finally:
+        if journal:
+            journal.close()
+
+    if len(sources) > 1:
+        stats['sources'] = tally.summary(committed)
+    if index is not None:
+        stats['duplicates'] = index.skipped
+    recorder.results.update(stats)
+
+    if stats['total'] == 0:
+        if stats['resumed']:
+            logger.info(f"All {stats['resumed']} features were committed by a previous run")
+        elif stats.get('duplicates'):
+            logger.info(f"All {stats['duplicates']} features are already on the layer")
+        else:
+            logger.warning("No data to upload after expansion (all values are zero)")
+        return 0
+
+    print_upload_summary(stats)
+    return 0
+
+
+def main() -> int:
+    """Main application entry point."""
+    args = parse_arguments()
+
+    log_file = args.log_file or config.LOGS_DIR / f"run_{datetime.now():%Y%m%d_%H%M%S}.log"
+    setup_logging(
+        log_level=args.log_level,
+        log_file=log_file,
+        log_format=config.LOG_FORMAT,
+        date_format=config.LOG_DATE_FORMAT
+    )
+
+    logger.info("=" * 80)
+    logger.info("M1MT GIS DEVELOPER TEST TASK - STARTED")
+    logger.info("=" * 80)
 
-            print("\n" + "=" * 80)
-            print("UPLOAD SUMMARY")
-            print("=" * 80)
-            print(f"Total features:     {stats['total']}")
-            print(f"Successfully added: {stats['success']}")
-            print(f"Failed:             {stats['failed']}")
-            print(f"Success rate:       {stats['success'] / stats['total'] * 100:.1f}%")
-            print("=" * 80 + "\n")
+    from utils.google_sheets import GoogleSheetsError
+    from utils.local_sources import LocalSourceError
+    from utils.export import ExportError
+    from utils.arcgis_client import ArcGISError
 
-            if stats['failed'] > 0:
-                logger.warning(f"{stats['failed']} features failed to upload. Check logs for details.")
+    recorder = RunRecorder()
+
+    try:
+        exit_code = run(args, recorder)
 
         logger.info("=" * 80)
         logger.info("M1MT GIS DEVELOPER TEST TASK - COMPLETED SUCCESSFULLY")
         logger.info("=" * 80)
 
-        return 0
-
     except GoogleSheetsError as e:
         logger.error(f"Google Sheets error: {e}")
-        return 1
+        exit_code = 1
+
+    except LocalSourceError as e:
+        logger.error(f"Source file error: {e}")
+        exit_code = 1
+
+    except ExportError as e:
+        logger.error(f"Export error: {e}")
+        exit_code = 1
 
     except ArcGISError as e:
         logger.error(f"ArcGIS error: {e}")
-        return 2
+        exit_code = 2
 
     except ValueError as e:
         logger.error(f"Validation error: {e}")
-        return 3
+        exit_code = 3
 
     except KeyboardInterrupt:
         logger.warning("Operation cancelled by user")
-        return 130
+        exit_code = 130
 
     except Exception as e:
         logger.exception(f"Unexpected error: {e}")
-        return 4
+        exit_code = 4
+
+    if not args.no_report:
+        recorder.write(log_file.with_suffix(".json"), exit_code=exit_code, args=vars(args))
+
+    if args.metrics_textfile or args.pushgateway:
+        export_metrics(recorder.report(exit_code=exit_code), args.metrics_textfile, args.pushgateway)
+
+    return exit_code
+
+
+def export_metrics(report: dict, textfile: Path = None, pushgateway: str = None) -> None:
+    """Export run metrics; failures are logged and don't change the exit code."""
+    text = render_metrics(report)
+    try:
+        if textfile:
+            write_textfile(text, Path(textfile))
+        if pushgateway:
+            push_metrics(text, pushgateway, job=config.METRICS_JOB)
+    except (MetricsExportError, OSError) as e:
+        logger.error(f"Metrics export failed: {e}")
 
 
 if __name__ == "__main__":
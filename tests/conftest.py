@@ -0,0 +1,53 @@
+"""
+Shared fixtures for tests that run the whole pipeline through main.main().
+"""
+
+import json
+import sys
+
+import pytest
+
+import config
+import main
+from benchmarks.synthetic import sheet_csv
+from utils.fake_feature_server import FakeArcGISClient
+from utils.google_sheets import SheetCache
+
+
+class MainRunner:
+    """Run ``main.main()`` offline against the fake backend, with cache, state and logs in ``tmp_path``."""
+
+    def __init__(self, tmp_path, monkeypatch):
+        self.tmp_path = tmp_path
+        self.monkeypatch = monkeypatch
+        self.clients = 0
+        monkeypatch.setattr(config, "CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(config, "STATE_DB", tmp_path / "state.sqlite3")
+
+    def store_sheet(self, sheet, gid: int = 0) -> str:
+        """Put ``sheet`` in the snapshot cache and return the URL to pass with --url."""
+        SheetCache(self.tmp_path / "cache").store("sheet", gid, sheet_csv(sheet))
+        return f"https://docs.google.com/spreadsheets/d/sheet/edit#gid={gid}"
+
+    def __call__(self, *flags: str, service=None, layer=None) -> int:
+        """Run main.py with ``flags``; uploads go to ``layer`` or a layer of ``service``."""
+        def client(serve: bool = False) -> FakeArcGISClient:
+            self.clients += 1
+            return FakeArcGISClient(service, layer=layer, serve=serve)
+
+        if service is not None or layer is not None:
+            self.monkeypatch.setattr("utils.fake_feature_server.FakeArcGISClient", client)
+        self.monkeypatch.setattr(sys, "argv", [
+            "main.py", *flags, "--backend", "fake", "--offline", "--no-progress",
+            "--log-file", str(self.tmp_path / "run.log")
+        ])
+        return main.main()
+
+    @property
+    def report(self) -> dict:
+        return json.loads((self.tmp_path / "run.json").read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def run_main(tmp_path, monkeypatch) -> MainRunner:
+    return MainRunner(tmp_path, monkeypatch)
@@ -0,0 +1,171 @@
+"""
+Tests for the asyncio upload engine.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import threading
+import time
+
+import pytest
+
+from benchmarks.synthetic import make_sheet
+from utils.arcgis_client import RetryPolicy, estimate_payload_bytes
+from utils.async_upload import LayerSender, TokenBucket, make_sender, upload_async, upload_features_async
+from utils.fake_feature_server import FakeFeatureLayer, FakeFeatureService, serve_fake_feature_server
+from utils.instrumentation import RunRecorder
+
+
+def make_features(count: int) -> list[dict]:
+    return [
+        {"attributes": {"date": "2026-01-01", "value_1": i}, "geometry": {"x": 30.5, "y": 50.5}}
+        for i in range(count)
+    ]
+
+
+class RecordingSender:
+    """Async sender that tracks concurrent requests and their payload bytes."""
+
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.sent = []
+
+    async def send(self, batch: list) -> dict:
+        self.in_flight += estimate_payload_bytes(batch)
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= estimate_payload_bytes(batch)
+        self.sent.append(len(batch))
+        return {"addResults": [{"objectId": len(self.sent) * 1000 + i, "success": True} for i in range(len(batch))]}
+
+
+def test_token_bucket_limits_rate():
+    """Test that acquisitions beyond the burst are spaced by the rate."""
+    async def acquire_all(bucket: TokenBucket, count: int) -> float:
+        started = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(acquire_all(TokenBucket(rate=0), 100)) < 0.05
+    assert asyncio.run(acquire_all(TokenBucket(rate=50, burst=1), 11)) >= 0.19
+
+
+@pytest.mark.parametrize("limit_batches", [1, 3])
+def test_in_flight_bytes_are_capped(limit_batches):
+    """Test that concurrent payload bytes never exceed the budget."""
+    features = [{**f, "attributes": {**f["attributes"], "value_1": 1}} for f in make_features(400)]
+    batch_bytes = estimate_payload_bytes(features[:20])
+    sender = RecordingSender()
+
+    stats = asyncio.run(upload_async(
+        sender, features, batch_size=20, concurrency=8,
+        max_in_flight_bytes=batch_bytes * limit_batches, show_progress=False
+    ))
+
+    assert stats["success"] == 400
+    assert sender.peak <= batch_bytes * limit_batches
+    assert sender.peak >= batch_bytes * min(limit_batches, 2)
+
+
+def test_features_are_fed_from_another_thread():
+    """Test that feature generation runs off the event loop thread."""
+    threads = set()
+
+    def features():
+        for feature in make_features(100):
+            threads.add(threading.get_ident())
+            yield feature
+
+    stats = asyncio.run(upload_async(RecordingSender(latency=0), features(), batch_size=10, show_progress=False))
+
+    assert stats["total"] == 100
+    assert threads and threading.get_ident() not in threads
+
+
+def test_upload_against_fake_layer_with_throttling_and_resume():
+    """Test retries, committed ranges and on_commit through the sync entry point."""
+    service = FakeFeatureService(throttle_rate=0.2, seed=4)
+    commits = []
+
+    stats = upload_features_async(
+        FakeFeatureLayer(service), make_features(1000), batch_size=50, concurrency=8, rate=1000,
+        retry=RetryPolicy(max_retries=10, base_delay=0.001), committed=[(0, 100)],
+        on_commit=lambda start, ids: commits.append((start, ids)), show_progress=False
+    )
+
+    assert (stats["success"], stats["failed"], stats["resumed"]) == (900, 0, 100)
+    assert stats["errors"]["throttled"] == stats["retries"] > 0
+    assert sorted(f["attributes"]["value_1"] for f in service.features.values()) == list(range(100, 1000))
+    assert sorted(start for start, _ in commits) == list(range(100, 1000, 50))
+
+
+def test_aiohttp_sender_against_fake_server():
+    """Test the aiohttp sender over HTTP, through throttling and a token renewal."""
+    service = FakeFeatureService(throttle_rate=0.1, seed=5, token="t1")
+    server, url = serve_fake_feature_server(service)
+    current = {"token": "t1"}
+    layer = FakeFeatureLayer(service, url=url)
+    layer.refresh_token = lambda: current.update(token=service.token)
+    on_commit = lambda start, ids: start == 100 and setattr(service, "token", "t2")
+    try:
+        stats = upload_features_async(
+            layer, make_features(500), token=lambda: current["token"], refresh_token=layer.refresh_token,
+            batch_size=50, concurrency=4, retry=RetryPolicy(max_retries=10, base_delay=0.001),
+            on_commit=on_commit, show_progress=False
+        )
+    finally:
+        server.shutdown()
+
+    assert (stats["success"], stats["failed"]) == (500, 0)
+    assert stats["errors"].get("throttled", 0) > 0
+    assert current["token"] == "t2"
+    assert sorted(f["attributes"]["value_1"] for f in service.features.values()) == list(range(500))
+
+
+def test_thread_fallback_is_a_warning(caplog):
+    """Test that a layer without a URL is sent to in threads, with a warning."""
+    with caplog.at_level(logging.WARNING, logger="utils.async_upload"):
+        sender = make_sender(FakeFeatureLayer(FakeFeatureService()))
+
+    assert isinstance(sender, LayerSender)
+    assert [r.levelno for r in caplog.records] == [logging.WARNING]
+
+
+def test_batch_records_leave_out_cpu_time():
+    """Test that the async engine does not report a CPU time it cannot measure per batch."""
+    recorder = RunRecorder()
+
+    asyncio.run(upload_async(
+        RecordingSender(latency=0), make_features(40), batch_size=10, recorder=recorder, show_progress=False
+    ))
+
+    assert len(recorder.batches) == 4
+    assert all("cpu_seconds" not in batch and batch["size"] == 10 for batch in recorder.batches)
+
+
+def test_main_with_async_engine(run_main):
+    """Test the whole pipeline with --engine async against the fake backend."""
+    sheet = make_sheet(100, max_value=3, invalid_share=0.0, seed=8)
+    service = FakeFeatureService(latency=0.0)
+
+    assert run_main(
+        "--url", run_main.store_sheet(sheet), "--no-report", "--stream",
+        "--engine", "async", "--workers", "8", "--rate", "500", "--batch-size", "50", service=service
+    ) == 0
+    assert len(service.features) == sheet[[f"Значення {i}" for i in range(1, 11)]].max(axis=1).sum()
+
+
+def test_main_async_engine_needs_aiohttp(run_main, monkeypatch, capsys):
+    """Test that --engine async stops with a clear error instead of falling back to threads."""
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name, *args: None if name == "aiohttp" else find_spec(name, *args))
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_main("--url", run_main.store_sheet(make_sheet(10, seed=1)), "--engine", "async")
+
+    assert exit_info.value.code == 2
+    assert "needs aiohttp" in capsys.readouterr().err
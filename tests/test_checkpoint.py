@@ -0,0 +1,106 @@
+"""
+Tests for the resumable upload journal.
+"""
+
+import time
+
+import pandas as pd
+import pytest
+from utils.arcgis_client import upload_features_batch
+from utils.checkpoint import UploadJournal, snapshot_key
+
+
+class CountingLayer:
+    """Layer stand-in that assigns objectIds and can crash after N requests."""
+
+    def __init__(self, crash_after: int = None):
+        self.crash_after = crash_after
+        self.sent = []
+
+    def edit_features(self, adds):
+        if self.crash_after is not None and len(self.sent) >= self.crash_after:
+            raise KeyboardInterrupt
+        self.sent.append(list(adds))
+        return {"addResults": [{"success": True, "objectId": f * 10} for f in adds]}
+
+
+def test_snapshot_key_changes_with_content():
+    """Test that the snapshot key depends on data and target."""
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+
+    assert snapshot_key(df, "item", 0) == snapshot_key(df.copy(), "item", 0)
+    assert snapshot_key(df, "item", 0) != snapshot_key(df, "other", 0)
+    assert snapshot_key(df, "item", 0) != snapshot_key(df.assign(a=[1, 3]), "item", 0)
+
+
+def test_resume_skips_committed_batches(tmp_path):
+    """Test that a resumed run only sends what the crashed run did not commit."""
+    features = list(range(95))
+
+    with UploadJournal(tmp_path / "state.sqlite3", "snap") as journal:
+        crashing = CountingLayer(crash_after=4)
+        with pytest.raises(KeyboardInterrupt):
+            upload_features_batch(crashing, features, batch_size=10, show_progress=False, on_commit=journal.record)
+
+    with UploadJournal(tmp_path / "state.sqlite3", "snap") as journal:
+        assert journal.committed_ranges() == [(0, 10), (10, 20), (20, 30), (30, 40)]
+
+        layer = CountingLayer()
+        stats = upload_features_batch(
+            layer, features, batch_size=10, show_progress=False,
+            committed=journal.committed_ranges(), on_commit=journal.record
+        )
+
+        assert stats["resumed"] == 40
+        assert stats["success"] == stats["total"] == 55
+        assert [f for batch in layer.sent for f in batch] == list(range(40, 95))
+        assert sorted(journal.object_ids()) == [f * 10 for f in features]
+
+
+def test_committed_ranges_split_batches(tmp_path):
+    """Test that batches never cross into a committed range."""
+    layer = CountingLayer()
+
+    stats = upload_features_batch(
+        layer, list(range(30)), batch_size=10, show_progress=False,
+        committed=[(5, 12), (25, 40)]
+    )
+
+    assert [batch[0] for batch in layer.sent] == [0, 12, 22]
+    assert [len(batch) for batch in layer.sent] == [5, 10, 3]
+    assert stats["resumed"] == 12
+    assert stats["total"] == 18
+
+
+def test_interrupt_journals_requests_in_flight(tmp_path):
+    """Test that requests finishing after another one is interrupted are still journaled."""
+    class InterruptedLayer:
+        added = []
+
+        def edit_features(self, adds):
+            if adds[0] == 20:
+                raise KeyboardInterrupt
+            time.sleep(0.05)
+            self.added.append((adds[0], adds[-1] + 1))
+            return {"addResults": [{"success": True, "objectId": f * 10} for f in adds]}
+
+    with UploadJournal(tmp_path / "state.sqlite3", "snap") as journal:
+        layer = InterruptedLayer()
+        with pytest.raises(KeyboardInterrupt):
+            upload_features_batch(
+                layer, list(range(95)), batch_size=10, show_progress=False, workers=4, on_commit=journal.record
+            )
+
+        assert journal.committed_ranges() == sorted(layer.added)
+        assert {(0, 10), (10, 20), (30, 40)} <= set(layer.added)
+        assert (20, 30) not in layer.added
+
+
+def test_rejected_features_stay_uncommitted(tmp_path):
+    """Test that only runs of added features are journaled, so rejected ones are retried."""
+    with UploadJournal(tmp_path / "state.sqlite3", "snap") as journal:
+        journal.record(10, [1, 2, None, None, 5, None, 7])
+        journal.record(20, [None, None])
+
+        assert journal.committed_ranges() == [(10, 12), (14, 15), (16, 17)]
+        assert sorted(journal.object_ids()) == [1, 2, 5, 7]
@@ -0,0 +1,109 @@
+"""
+Tests for the pre-upload duplicate check against the layer's features.
+"""
+
+import pytest
+
+from benchmarks.synthetic import make_sheet
+from utils.dedup import FeatureIndex, feature_digest
+from utils.fake_feature_server import FakeFeatureLayer, FakeFeatureService
+
+
+def feature(value: int, x: float = 30.5) -> dict:
+    return {
+        "attributes": {"date": "2026-01-01", "region": "Kyiv", "city": "Kyiv", "value_1": value},
+        "geometry": {"x": x, "y": 50.5, "spatialReference": {"wkid": 4326}},
+    }
+
+
+def test_feature_digest_normalizes_server_values():
+    """Test that float-typed integers and coordinate noise hash alike."""
+    fields = ["date", "value_1"]
+    local = feature_digest({"date": "2026-01-01", "value_1": 1}, {"x": 30.123456789, "y": 50.5}, fields)
+    remote = feature_digest({"date": "2026-01-01", "value_1": 1.0, "OBJECTID": 7}, {"x": 30.1234571, "y": 50.5}, fields)
+
+    assert local == remote
+    assert local != feature_digest({"date": "2026-01-01", "value_1": 0}, {"x": 30.123456789, "y": 50.5}, fields)
+
+
+def test_filter_skips_each_existing_copy_once(tmp_path):
+    """Test that repeated ladder rows are matched as a multiset."""
+    layer = FakeFeatureLayer(FakeFeatureService())
+    layer.edit_features(adds=[feature(1), feature(1), feature(2)])
+
+    with FeatureIndex(tmp_path / "state.sqlite3", "layer") as index:
+        assert index.refresh(layer) == 3
+        result = list(index.filter([feature(1), feature(1), feature(1), feature(2), feature(3)]))
+
+    assert [f["attributes"]["value_1"] for f in result] == [1, 3]
+    assert index.skipped == 3
+
+
+def test_refresh_is_incremental_and_cached(tmp_path):
+    """Test that a cached index only pages features added since the last refresh."""
+    service = FakeFeatureService()
+    layer = FakeFeatureLayer(service)
+    layer.edit_features(adds=[feature(i) for i in range(5)])
+
+    with FeatureIndex(tmp_path / "state.sqlite3", "layer") as index:
+        index.refresh(layer, page_size=2)
+
+    layer.edit_features(adds=[feature(9)])
+    with FeatureIndex(tmp_path / "state.sqlite3", "layer") as index:
+        assert index.refresh(layer, page_size=2) == 1
+        assert len(index) == 6
+
+
+def test_refresh_rebuilds_after_deletes(tmp_path):
+    """Test that the index is rebuilt when the layer lost features."""
+    layer = FakeFeatureLayer(FakeFeatureService())
+    layer.edit_features(adds=[feature(i) for i in range(4)])
+
+    with FeatureIndex(tmp_path / "state.sqlite3", "layer") as index:
+        index.refresh(layer)
+        layer.edit_features(deletes="1,2")
+        assert index.refresh(layer) == 2
+        assert [f["attributes"]["value_1"] for f in index.filter([feature(0), feature(2)])] == [0]
+
+
+def test_refresh_rebuilds_after_deletes_and_later_adds(tmp_path):
+    """Test that deleted features leave the index even when as many were added since."""
+    layer = FakeFeatureLayer(FakeFeatureService())
+    layer.edit_features(adds=[feature(i) for i in range(4)])
+
+    with FeatureIndex(tmp_path / "state.sqlite3", "layer") as index:
+        index.refresh(layer)
+        layer.edit_features(deletes="1,2")
+        layer.edit_features(adds=[feature(i) for i in range(10, 13)])
+        assert index.refresh(layer) == 5
+        assert [f["attributes"]["value_1"] for f in index.filter([feature(0), feature(1), feature(10)])] == [0, 1]
+        assert index.skipped == 1
+
+
+def test_refresh_rebuilds_after_truncate_and_refill(tmp_path):
+    """Test that reused objectIds after a truncate do not leave stale digests in the index."""
+    layer = FakeFeatureLayer(FakeFeatureService())
+    layer.edit_features(adds=[feature(i) for i in range(6)])
+    layer.edit_features(deletes="3,4")
+
+    with FeatureIndex(tmp_path / "state.sqlite3", "layer") as index:
+        index.refresh(layer)
+        layer.manager.truncate()
+        layer.edit_features(adds=[feature(i) for i in range(10, 15)])
+        assert index.refresh(layer) == 5
+        assert [f["attributes"]["value_1"] for f in index.filter([feature(0), feature(10), feature(14)])] == [0]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_main_rerun_with_dedup_adds_nothing(run_main, stream):
+    """Test that running the same sheet twice with --dedup does not duplicate features."""
+    sheet = make_sheet(80, max_value=3, invalid_share=0.0, seed=3)
+    service = FakeFeatureService(latency=0.0)
+    flags = ["--url", run_main.store_sheet(sheet), "--no-report", "--dedup", *(["--stream"] if stream else [])]
+
+    assert run_main(*flags, service=service) == 0
+    uploaded = len(service.features)
+    assert uploaded == sheet[[f"Значення {i}" for i in range(1, 11)]].max(axis=1).sum()
+
+    assert run_main(*flags, service=service) == 0
+    assert len(service.features) == uploaded
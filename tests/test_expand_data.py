@@ -2,9 +2,10 @@
 Tests for data expansion using the "unit ladder" rule.
 """
 
+import numpy as np
 import pandas as pd
 import pytest
-from utils.data_processing import expand_row, expand_dataframe
+from utils.data_processing import expand_row, expand_dataframe, iter_expand_dataframe
 
 
 @pytest.mark.parametrize(
@@ -89,3 +90,70 @@ def test_expand_dataframe(df_data, expected_length):
     value_cols = [f'Значення {i}' for i in range(1, 11)]
     result = expand_dataframe(df_data, value_cols, show_progress=False)
     assert len(result) == expected_length
+
+
+@pytest.mark.parametrize("seed, n_rows, max_value", [(0, 20, 5), (1, 50, 12), (2, 5, 0)])
+def test_expand_dataframe_vectorized_matches_reference(seed, n_rows, max_value):
+    """Test that the vectorized engine matches the per-row reference implementation."""
+    value_cols = [f'Значення {i}' for i in range(1, 11)]
+    rng = np.random.default_rng(seed)
+    df_data = pd.DataFrame({
+        "Дата": [f"2026-01-{i % 28 + 1:02d}" for i in range(n_rows)],
+        "Область": [f"Region {i % 3}" for i in range(n_rows)],
+        "long": rng.uniform(22, 40, n_rows).astype("float32"),
+        "lat": rng.uniform(44, 52, n_rows).astype("float32"),
+        **{col: rng.integers(0, max_value + 1, n_rows).astype("uint16") for col in value_cols}
+    })
+
+    expected = expand_dataframe(df_data, value_cols, show_progress=False, vectorized=False)
+    result = expand_dataframe(df_data, value_cols, show_progress=False)
+
+    assert len(result) == len(expected)
+    if len(expected) > 0:
+        assert list(result.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        assert all(result[col].dtype == np.uint8 for col in value_cols)
+
+
+def test_iter_expand_dataframe_matches_whole_frame():
+    """Test that chunked expansion yields the same rows as expanding at once."""
+    value_cols = [f'Значення {i}' for i in range(1, 11)]
+    df_data = pd.DataFrame({
+        "Дата": [f"2026-01-{i + 1:02d}" for i in range(9)],
+        **{col: pd.Series([(i * j) % 4 for i in range(9)], dtype="uint16") for j, col in enumerate(value_cols)}
+    })
+
+    chunks = [df_data.iloc[i:i + 4] for i in range(0, len(df_data), 4)]
+    streamed = pd.concat(list(iter_expand_dataframe(chunks, value_cols)), ignore_index=True)
+
+    pd.testing.assert_frame_equal(streamed, expand_dataframe(df_data, value_cols, show_progress=False))
+
+
+@pytest.mark.parametrize("seed, n_rows, max_value", [(0, 20, 5), (1, 50, 300), (2, 5, 0)])
+def test_weighted_mode_repeats_to_ladder(seed, n_rows, max_value):
+    """Test that repeating weighted rows by count reproduces the ladder rows."""
+    value_cols = [f'Значення {i}' for i in range(1, 11)]
+    rng = np.random.default_rng(seed)
+    df_data = pd.DataFrame({
+        "Дата": [f"2026-01-{i % 28 + 1:02d}" for i in range(n_rows)],
+        **{col: rng.integers(0, max_value + 1, n_rows).astype("uint16") for col in value_cols}
+    })
+
+    weighted = expand_dataframe(df_data, value_cols, show_progress=False, mode="weighted")
+    ladder = expand_dataframe(df_data, value_cols, show_progress=False)
+
+    assert len(weighted) <= 10 * n_rows
+    assert (weighted["count"] == weighted["level_to"] - weighted["level_from"] + 1).all()
+    repeated = weighted.loc[weighted.index.repeat(weighted["count"])].drop(columns=["count", "level_from", "level_to"])
+    pd.testing.assert_frame_equal(repeated.reset_index(drop=True), ladder)
+
+
+def test_weighted_mode_runs():
+    """Test the runs produced for a single row."""
+    value_cols = [f'Значення {i}' for i in range(1, 11)]
+    df_data = pd.DataFrame([{col: v for col, v in zip(value_cols, [500, 3, 3, 0, 1, 0, 0, 0, 0, 0])}])
+
+    result = expand_dataframe(df_data, value_cols, show_progress=False, mode="weighted")
+
+    assert result[["level_from", "level_to", "count"]].values.tolist() == [[1, 1, 1], [2, 3, 2], [4, 500, 497]]
+    assert result[value_cols[:5]].values.tolist() == [[1, 1, 1, 0, 1], [1, 1, 1, 0, 0], [1, 0, 0, 0, 0]]
@@ -0,0 +1,144 @@
+"""
+Tests for streaming dry-run features to GeoJSON-seq, GeoParquet and FlatGeobuf files.
+"""
+
+import json
+import struct
+
+import pyarrow.parquet as pq
+import pytest
+
+import config
+from benchmarks.synthetic import make_sheet, sheet_csv
+from utils.export import ExportError, export_features, mapped_fields
+
+
+def make_features(count: int):
+    for i in range(count):
+        yield {
+            "attributes": {"date": "2026-01-01", "region": "Kyiv", "value_1": i},
+            "geometry": {"x": 30.5 + i / 1000, "y": 50.4, "spatialReference": {"wkid": 4326}},
+        }
+
+
+def read_output(path) -> list[dict]:
+    """Read an export back as ``(attributes, (x, y))`` pairs."""
+    if path.suffix == ".parquet":
+        rows = pq.read_table(path).to_pylist()
+        return [
+            ({k: v for k, v in row.items() if k != "geometry"}, struct.unpack("<BIdd", row["geometry"])[2:])
+            for row in rows
+        ]
+    with open(path, encoding="utf-8") as f:
+        return [(feature["properties"], tuple(feature["geometry"]["coordinates"])) for feature in map(json.loads, f)]
+
+
+@pytest.mark.parametrize("suffix", [".geojsonl", ".parquet"])
+def test_export_round_trip(tmp_path, suffix):
+    """Test that every feature is written once, in order, with its attributes and point."""
+    path = tmp_path / f"features{suffix}"
+
+    stats = export_features(make_features(25), path, chunk_size=10)
+
+    expected = [(f["attributes"], (f["geometry"]["x"], f["geometry"]["y"])) for f in make_features(25)]
+    assert read_output(path) == expected
+    assert stats["count"] == 25
+    assert stats["bytes"] == path.stat().st_size
+
+
+def test_parquet_has_geo_metadata_and_chunked_row_groups(tmp_path):
+    """Test that Parquet output is GeoParquet with one row group per chunk."""
+    path = tmp_path / "features.parquet"
+    export_features(make_features(25), path, chunk_size=10)
+
+    parquet = pq.ParquetFile(path)
+    geo = json.loads(parquet.schema_arrow.metadata[b"geo"])
+
+    assert parquet.num_row_groups == 3
+    assert geo["primary_column"] == "geometry"
+    assert geo["columns"]["geometry"] == {"encoding": "WKB", "geometry_types": ["Point"]}
+
+
+@pytest.mark.parametrize("fields", [None, {"date": str, "value_1": int, "value_2": int}])
+def test_parquet_fills_missing_attributes_with_null(tmp_path, fields):
+    """Test that attributes a feature lacks are null and the mapped schema does not depend on the first feature."""
+    path = tmp_path / "features.parquet"
+    features = [
+        {"attributes": {"date": "2026-01-01", "value_1": 1}, "geometry": {"x": 30.5, "y": 50.4}},
+        {"attributes": {"date": "2026-01-02", "value_2": 2}, "geometry": {"x": 30.6, "y": 50.4}},
+    ]
+
+    export_features(features, path, fields=fields)
+
+    table = pq.read_table(path)
+    assert table.column("value_1").to_pylist() == [1, None]
+    if fields:
+        assert table.column("value_2").to_pylist() == [None, 2]
+        assert str(table.schema.field("value_2").type) == "int64"
+
+
+def test_empty_parquet_has_mapped_schema(tmp_path):
+    """Test that no features still give a GeoParquet file with the output fields."""
+    path = tmp_path / "features.parquet"
+
+    assert export_features([], path, fields=mapped_fields("weighted"))["count"] == 0
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_rows == 0
+    assert parquet.schema_arrow.names == [*mapped_fields("weighted"), "geometry"]
+    assert b"geo" in parquet.schema_arrow.metadata
+
+
+def test_flatgeobuf_needs_fiona(tmp_path):
+    """Test that FlatGeobuf output is written by fiona, or fails clearly without it."""
+    path = tmp_path / "features.fgb"
+    try:
+        import fiona
+    except ImportError:
+        with pytest.raises(ExportError, match="fiona"):
+            export_features(make_features(5), path)
+        return
+
+    assert export_features(make_features(5), path)["count"] == 5
+    with fiona.open(path) as layer:
+        assert len(layer) == 5
+
+
+def test_unsupported_output_suffix(tmp_path):
+    """Test that an unknown suffix is rejected before anything is written."""
+    with pytest.raises(ExportError, match="Unsupported output file"):
+        export_features(make_features(1), tmp_path / "features.shp")
+    assert not (tmp_path / "features.shp").exists()
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_main_dry_run_writes_output(tmp_path, run_main, stream):
+    """Test that --dry-run --output writes every expanded feature without connecting to ArcGIS."""
+    df = make_sheet(300, max_value=3, seed=5)
+    (tmp_path / "sheet.csv").write_bytes(sheet_csv(df))
+    output = tmp_path / "features.geojsonl"
+
+    assert run_main(
+        "--source", str(tmp_path / "sheet.csv"), "--dry-run", "--output", str(output),
+        "--chunk-size", "100", *(["--stream"] if stream else [])
+    ) == 0
+    report = run_main.report
+    valid = df["long"].notna() & df["lat"].notna()
+    expected = int(df.loc[valid, config.VALUE_COLUMNS].max(axis=1).sum())
+    assert len(read_output(output)) == expected
+    assert report["results"]["output_bytes"] == output.stat().st_size
+    assert "export" in [stage["name"] for stage in report["stages"]]
+
+
+def test_main_dry_run_exports_empty_file_when_nothing_expands(tmp_path, run_main):
+    """Test that a sheet of zeros still leaves an (empty) output file behind."""
+    df = make_sheet(20, max_value=3, seed=2)
+    df[config.VALUE_COLUMNS] = 0
+    (tmp_path / "sheet.csv").write_bytes(sheet_csv(df))
+    output = tmp_path / "features.parquet"
+
+    assert run_main("--source", str(tmp_path / "sheet.csv"), "--dry-run", "--output", str(output)) == 0
+
+    assert pq.ParquetFile(output).schema_arrow.names == [*mapped_fields(), "geometry"]
+    assert pq.read_table(output).num_rows == 0
+    assert run_main.report["results"]["output_bytes"] == output.stat().st_size
@@ -0,0 +1,204 @@
+"""
+Tests for the local fake FeatureServer.
+"""
+
+import json
+import threading
+
+import pytest
+import requests
+
+from benchmarks.synthetic import make_sheet
+from utils.arcgis_client import (
+    AdaptiveBatcher,
+    RawFeature,
+    RestFeatureLayer,
+    RetryPolicy,
+    dumps_json,
+    estimate_payload_bytes,
+    upload_features_batch
+)
+from utils.fake_feature_server import (
+    FakeFeatureLayer,
+    FakeFeatureService,
+    serve_fake_feature_server
+)
+
+
+def make_features(count: int) -> list[dict]:
+    return [
+        {"attributes": {"date": "2026-01-01", "value_1": i}, "geometry": {"x": 30.5, "y": 50.5}}
+        for i in range(count)
+    ]
+
+
+def test_fake_layer_adds_and_queries():
+    """Test that added features can be paged back with query."""
+    layer = FakeFeatureLayer(FakeFeatureService())
+
+    result = layer.edit_features(adds=make_features(5))
+    assert [r["objectId"] for r in result["addResults"]] == [1, 2, 3, 4, 5]
+
+    page = layer.query(out_fields="value_1", result_offset=1, result_record_count=2)
+    assert [f.attributes for f in page.features] == [{"value_1": 1, "OBJECTID": 2}, {"value_1": 2, "OBJECTID": 3}]
+
+    layer.edit_features(deletes="1,2")
+    assert [f.attributes["OBJECTID"] for f in layer.query(where="OBJECTID > 3").features] == [4, 5]
+
+
+def test_fake_layer_failure_modes():
+    """Test throttling, request-size limits and per-feature rejection."""
+    with pytest.raises(Exception, match="429"):
+        FakeFeatureLayer(FakeFeatureService(throttle_rate=1.0)).edit_features(adds=make_features(1))
+
+    with pytest.raises(Exception, match="413"):
+        FakeFeatureLayer(FakeFeatureService(max_request_bytes=100)).edit_features(adds=make_features(10))
+
+    result = FakeFeatureLayer(FakeFeatureService(reject_rate=0.5, seed=1)).edit_features(adds=make_features(100))
+    assert 20 < sum(not r["success"] for r in result["addResults"]) < 80
+
+
+def test_query_while_adding_from_other_threads():
+    """Test that queries see a consistent page while other threads add and delete features."""
+    service = FakeFeatureService()
+    layer = FakeFeatureLayer(service)
+    stop = threading.Event()
+
+    def churn():
+        while not stop.is_set():
+            result = layer.edit_features(adds=make_features(20))
+            layer.edit_features(deletes=[r["objectId"] for r in result["addResults"][:10]])
+
+    threads = [threading.Thread(target=churn) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(200):
+            ids = [f.attributes["OBJECTID"] for f in layer.query(result_record_count=50).features]
+            assert ids == sorted(ids) and len(ids) <= 50
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_show_fields_with_fake_backend(run_main, capsys):
+    """Test that --show-fields prints the fake layer's fields."""
+    assert run_main("--show-fields", "--no-report", service=FakeFeatureService()) == 0
+
+    output = capsys.readouterr().out
+    assert "LAYER: Fake layer" in output
+    assert "value_10" in output
+
+
+def test_upload_recovers_from_throttling_and_size_limits():
+    """Test that retries and adaptive batching get everything through the fake service."""
+    service = FakeFeatureService(throttle_rate=0.2, max_request_bytes=20_000, seed=3)
+    layer = FakeFeatureLayer(service)
+
+    stats = upload_features_batch(
+        layer, make_features(2000), batch_size=500, show_progress=False, workers=4,
+        batcher=AdaptiveBatcher(initial_size=500, target_latency=1.0),
+        retry=RetryPolicy(max_retries=10, sleep=lambda _: None)
+    )
+
+    assert stats["success"] == 2000
+    assert stats["errors"]["throttled"] > 0
+    assert len(service.features) == 2000
+
+
+def test_http_endpoints():
+    """Test applyEdits and query over localhost HTTP."""
+    service = FakeFeatureService(throttle_rate=0.0)
+    server, url = serve_fake_feature_server(service)
+    try:
+        response = requests.post(f"{url}/applyEdits", data={"f": "json", "adds": json.dumps(make_features(3))})
+        assert [r["success"] for r in response.json()["addResults"]] == [True] * 3
+
+        response = requests.get(f"{url}/query", params={"where": "1=1", "outFields": "*", "f": "json"})
+        assert len(response.json()["features"]) == 3
+        assert requests.get(url, params={"f": "json"}).json()["name"] == "Fake layer"
+    finally:
+        server.shutdown()
+
+
+@pytest.mark.parametrize("transport", ["arcgis", "rest"])
+def test_main_end_to_end_with_fake_backend(run_main, transport):
+    """Test the whole pipeline against the fake backend without network access."""
+    sheet = make_sheet(200, max_value=4, invalid_share=0.0, seed=7)
+    url = run_main.store_sheet(sheet)
+    service = FakeFeatureService(latency=0.0)
+
+    # --transport rest needs a layer URL; the fake backend serves its layer over HTTP for it
+    assert run_main("--url", url, "--workers", "4", "--transport", transport, service=service) == 0
+
+    expected = sheet[[f"Значення {i}" for i in range(1, 11)]].max(axis=1).sum()
+    assert len(service.features) == expected
+
+    report = run_main.report
+    assert report["exit_code"] == 0
+    assert report["results"]["success"] == expected
+    assert [stage["name"] for stage in report["stages"]] == ["connect", "load", "expand", "convert", "upload"]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_main_multiple_sources_share_one_upload(tmp_path, run_main, stream):
+    """Test that several tabs from a manifest feed one upload with per-source stats."""
+    sheets = {gid: make_sheet(50, max_value=3, invalid_share=0.0, seed=gid) for gid in (0, 4)}
+    manifest = tmp_path / "sheets.txt"
+    manifest.write_text("\n".join(run_main.store_sheet(sheet, gid) for gid, sheet in sheets.items()), encoding="utf-8")
+    service = FakeFeatureService(latency=0.0)
+
+    assert run_main("--manifest", str(manifest), *(["--stream"] if stream else []), service=service) == 0
+
+    value_cols = [f"Значення {i}" for i in range(1, 11)]
+    expected = {f"sheet:{gid}": int(sheet[value_cols].max(axis=1).sum()) for gid, sheet in sheets.items()}
+    assert run_main.clients == 1
+    assert len(service.features) == sum(expected.values())
+
+    report = run_main.report
+    assert {label: s["success"] for label, s in report["results"]["sources"].items()} == expected
+
+
+@pytest.mark.parametrize("raw, compress_level", [(True, 6), (False, 0)])
+def test_rest_transport_over_http(raw, compress_level):
+    """Test that the REST transport uploads through applyEdits with the usual stats."""
+    service = FakeFeatureService(throttle_rate=0.1, seed=2)
+    server, url = serve_fake_feature_server(service)
+    features = [RawFeature(dumps_json(f)) for f in make_features(300)] if raw else make_features(300)
+    try:
+        layer = RestFeatureLayer(FakeFeatureLayer(service, url=url), pool_size=2, compress_level=compress_level)
+        stats = upload_features_batch(
+            layer, features, batch_size=50, show_progress=False, workers=2,
+            retry=RetryPolicy(max_retries=10, sleep=lambda _: None)
+        )
+    finally:
+        server.shutdown()
+
+    assert (stats["success"], stats["failed"], stats["total"]) == (300, 0, 300)
+    assert sorted(f["attributes"]["value_1"] for f in service.features.values()) == list(range(300))
+    assert stats["errors"].get("throttled", 0) > 0
+    assert (layer.bytes_sent < estimate_payload_bytes(features) / 4) == bool(compress_level)
+
+
+def test_rest_transport_renews_expired_token():
+    """Test that a token expiring mid-upload is refreshed and read again for the retry."""
+    service = FakeFeatureService(token="t1")
+    server, url = serve_fake_feature_server(service)
+    current = {"token": "t1"}
+    try:
+        layer = RestFeatureLayer(
+            FakeFeatureLayer(service, url=url),
+            token=lambda: current["token"],
+            refresh_token=lambda: current.update(token=service.token)
+        )
+        on_commit = lambda start, ids: start == 100 and setattr(service, "token", "t2")
+        stats = upload_features_batch(
+            layer, make_features(300), batch_size=50, show_progress=False, on_commit=on_commit,
+            retry=RetryPolicy(max_retries=2, sleep=lambda _: None)
+        )
+    finally:
+        server.shutdown()
+
+    assert (stats["success"], stats["retries"], stats["errors"]) == (300, 1, {"token": 1})
+    assert current["token"] == "t2"
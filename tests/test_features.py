@@ -5,7 +5,7 @@ Tests for converting DataFrames to ArcGIS Features.
 import pandas as pd
 import pytest
 from unittest.mock import patch, MagicMock
-from utils.arcgis_client import df_to_features
+from utils.arcgis_client import FeatureBatch, df_to_features
 
 
 @pytest.mark.parametrize(
@@ -89,3 +89,105 @@ def test_df_to_features(df_data, expected_features):
                 attributes=expected_call["attributes"],
                 geometry=expected_call["geometry"]
             )
+
+
+def test_df_to_features_skips_invalid_coordinates(caplog):
+    """Test that rows with missing coordinates are skipped and counted."""
+    df_data = pd.DataFrame({
+        "Дата": ["2026-02-16", "2026-02-17", "2026-02-18"],
+        "Область": pd.Categorical(["Kyiv", "Lviv", "Odesa"]),
+        "Місто": ["Kyiv", "Lviv", "Odesa"],
+        **{f"Значення {i}": pd.Series([1, 0, 1], dtype="uint8") for i in range(1, 11)},
+        "long": pd.Series([30.5, None, 30.7], dtype="float32"),
+        "lat": pd.Series([50.5, 49.8, None], dtype="float32")
+    })
+
+    with caplog.at_level("WARNING", logger="utils.arcgis_client"):
+        features = df_to_features(df_data)
+
+    assert len(features) == 1
+    assert "Skipped 2 rows" in caplog.text
+    attributes = features[0].attributes
+    assert attributes["region"] == "Kyiv"
+    assert attributes["value_10"] == 1
+    assert type(attributes["value_1"]) is int
+    assert features[0].geometry["x"] == 30.5
+
+
+def test_df_to_features_maps_weighted_fields():
+    """Test that count/level fields are mapped only when the frame has them."""
+    df_data = pd.DataFrame({
+        "Дата": ["2026-02-16"],
+        "Область": ["Kyiv"],
+        "Місто": ["Kyiv"],
+        **{f"Значення {i}": pd.Series([1], dtype="uint8") for i in range(1, 11)},
+        "long": [30.5],
+        "lat": [50.5]
+    })
+
+    plain = df_to_features(df_data)[0].attributes
+    weighted = df_to_features(df_data.assign(count=4, level_from=2, level_to=5))[0].attributes
+
+    assert "count" not in plain
+    assert (weighted["count"], weighted["level_from"], weighted["level_to"]) == (4, 2, 5)
+    assert type(weighted["count"]) is int
+
+
+@pytest.mark.parametrize("precision, expected_x", [(6, 30.123457), (3, 30.123)])
+def test_raw_features_match_dicts(monkeypatch, precision, expected_x):
+    """Test that pre-encoded features decode to the dict features with rounded coordinates."""
+    monkeypatch.setattr("config.COORDINATE_PRECISION", precision)
+    df_data = pd.DataFrame({
+        "Дата": ["2026-02-16"],
+        "Область": ["Київська"],
+        "Місто": ["Київ"],
+        **{f"Значення {i}": pd.Series([i % 2], dtype="uint8") for i in range(1, 11)},
+        "long": [30.1234567],
+        "lat": [50.5]
+    })
+
+    raw = df_to_features(df_data, raw=True)[0]
+    plain = df_to_features(df_data, as_dict=True)[0]
+
+    assert isinstance(raw, bytes)
+    assert raw.attributes == plain["attributes"]
+    assert raw.geometry == {**plain["geometry"], "x": expected_x}
+
+
+def _frame(regions: list, weighted: bool = False) -> pd.DataFrame:
+    n = len(regions)
+    df = pd.DataFrame({
+        "Дата": [f"2026-02-{10 + i % 5}" for i in range(n)],
+        "Область": pd.Categorical(regions),
+        "Місто": [f"City {i % 3}" for i in range(n)],
+        **{f"Значення {i}": pd.Series([(i + j) % 3 for j in range(n)], dtype="uint8") for i in range(1, 11)},
+        "long": pd.Series([30.5 + j / 100 if j % 7 else None for j in range(n)], dtype="float32"),
+        "lat": pd.Series([50.1] * n, dtype="float32")
+    })
+    return df.assign(count=2, level_from=1, level_to=2) if weighted else df
+
+
+@pytest.mark.parametrize("options", [{"as_dict": True}, {"raw": True}])
+@pytest.mark.parametrize("weighted", [False, True])
+def test_feature_batch_builds_same_features(options, weighted):
+    """Test that a FeatureBatch builds exactly what df_to_features does, whole or sliced."""
+    df = _frame(["Kyiv", "Lviv", None, "Odesa"] * 10, weighted=weighted)
+    expected = df_to_features(df, **options)
+
+    batch = FeatureBatch.from_dataframe(df, **options)
+
+    assert len(batch) == len(expected)
+    assert list(batch) == expected
+    assert batch[5:12].to_list() == expected[5:12]
+    assert (batch[0], batch[-1]) == (expected[0], expected[-1])
+    assert batch.nbytes < 64 * len(batch)
+
+
+def test_feature_batch_concat_merges_categories():
+    """Test that concatenated batches keep each source's text values."""
+    first, second = _frame(["Kyiv", "Lviv"] * 3), _frame(["Odesa", "Kyiv", "Dnipro"] * 2)
+
+    batch = FeatureBatch.concat([FeatureBatch.from_dataframe(first, as_dict=True), FeatureBatch.from_dataframe(second, as_dict=True)])
+
+    assert batch.to_list() == df_to_features(first, as_dict=True) + df_to_features(second, as_dict=True)
+    assert sorted(batch.categories[1]) == ["Dnipro", "Kyiv", "Lviv", "Odesa"]
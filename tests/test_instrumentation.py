@@ -0,0 +1,83 @@
+"""
+Tests for stage timing and the run report.
+"""
+
+import json
+import time
+
+import pytest
+from utils.instrumentation import RunRecorder
+
+
+def slow(items, delay):
+    for item in items:
+        time.sleep(delay)
+        yield item
+
+
+def test_span_records_rows_and_time():
+    """Test that a span records wall time and row counts."""
+    recorder = RunRecorder()
+
+    with recorder.span("expand", rows_in=10) as span:
+        time.sleep(0.02)
+        span.rows_out = 30
+
+    stage = recorder.report()["stages"][0]
+    assert stage["name"] == "expand"
+    assert stage["wall_seconds"] >= 0.02
+    assert stage["rows_in"] == 10
+    assert stage["rows_out"] == 30
+
+
+def test_span_records_rss_at_start_and_end():
+    """Test that a span's memory growth shows in its own RSS, not only in the cumulative peak."""
+    recorder = RunRecorder()
+
+    with recorder.span("small"):
+        pass
+    with recorder.span("allocate"):
+        block = bytearray(64 * 2**20)
+        block[::4096] = b"x" * len(block[::4096])
+    with recorder.span("after"):
+        del block
+
+    stages = {stage["name"]: stage for stage in recorder.report()["stages"]}
+    if stages["small"]["rss_end_mb"] == 0:
+        pytest.skip("current RSS is not available on this platform")
+    assert stages["allocate"]["rss_end_mb"] - stages["allocate"]["rss_start_mb"] >= 50
+    assert stages["after"]["rss_end_mb"] < stages["after"]["rss_start_mb"] - 50
+    assert stages["after"]["cumulative_peak_rss_mb"] >= stages["allocate"]["rss_start_mb"] + 50
+
+
+def test_track_attributes_time_to_each_stage():
+    """Test that nested generator stages are timed exclusively."""
+    recorder = RunRecorder()
+    load = recorder.track("load", slow(range(5), 0.01))
+    expand = recorder.track("expand", slow(load, 0.03))
+
+    with recorder.span("upload"):
+        assert list(expand) == [0, 1, 2, 3, 4]
+
+    stages = {stage["name"]: stage for stage in recorder.report()["stages"]}
+    assert stages["load"]["wall_seconds"] == pytest.approx(0.05, abs=0.03)
+    assert stages["expand"]["wall_seconds"] == pytest.approx(0.15, abs=0.05)
+    assert stages["upload"]["wall_seconds"] < 0.03
+    assert stages["expand"]["rows_out"] == 5
+
+
+def test_report_batches_and_write(tmp_path):
+    """Test that batch records are summarized and written as JSON."""
+    recorder = RunRecorder()
+    for seconds in (0.1, 0.2, 0.3):
+        recorder.record_batch(size=500, seconds=seconds, cpu_seconds=0.01, bytes_sent=1000, success=500, failed=0)
+    recorder.results["success"] = 1500
+
+    recorder.write(tmp_path / "run.json", exit_code=0)
+
+    report = json.loads((tmp_path / "run.json").read_text(encoding="utf-8"))
+    assert report["exit_code"] == 0
+    assert report["results"] == {"success": 1500}
+    assert report["batch_summary"]["count"] == 3
+    assert report["batch_summary"]["bytes_sent"] == 3000
+    assert report["batch_summary"]["seconds_p50"] == 0.2
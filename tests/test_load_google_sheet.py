@@ -5,7 +5,7 @@ Tests for loading Google Sheets.
 import pytest
 from unittest.mock import patch
 import pandas as pd
-from utils.google_sheets import load_google_sheet, GoogleSheetsError
+from utils.google_sheets import load_google_sheet, iter_google_sheet, GoogleSheetsError
 
 
 def test_load_google_sheet_success():
@@ -34,3 +34,66 @@ def test_load_google_sheet_error():
     with patch("pandas.read_csv", side_effect=Exception("Network error")):
         with pytest.raises(GoogleSheetsError):
             load_google_sheet("test_sheet_id", gid=0)
+
+
+def test_iter_google_sheet_chunks(tmp_path):
+    """Test that the sheet is yielded as prepared chunks."""
+    csv_path = tmp_path / "sheet.csv"
+    header = "Дата,Область,Місто,long,lat," + ",".join(f"Значення {i}" for i in range(1, 11))
+    rows = [f'2026-01-0{i % 9 + 1},Kyiv,Kyiv,"30,{i}","50,{i}",' + ",".join(["1"] * 10) for i in range(7)]
+    csv_path.write_text("\n".join([header] + rows) + "\n", encoding="utf-8")
+
+    with patch("utils.google_sheets._export_url", return_value=str(csv_path)):
+        chunks = list(iter_google_sheet("test_sheet_id", gid=0, chunksize=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert all(chunk["long"].dtype == "float32" for chunk in chunks)
+    assert chunks[2]["lat"].iloc[0] == pytest.approx(50.6)
+    assert chunks[0]["Значення 1"].dtype == "uint16"
+
+
+def test_iter_google_sheet_error():
+    """Test that streaming errors are raised as GoogleSheetsError."""
+    with patch("pandas.read_csv", side_effect=Exception("Network error")):
+        with pytest.raises(GoogleSheetsError):
+            list(iter_google_sheet("test_sheet_id", gid=0))
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_load_google_sheet_engines(tmp_path, engine):
+    """Test that dtypes are declared up front with either CSV engine."""
+    csv_path = tmp_path / "sheet.csv"
+    header = "Дата,Область,Місто,long,lat," + ",".join(f"Значення {i}" for i in range(1, 11))
+    rows = [
+        '2026-01-01,Kyiv,Kyiv,"30,5","50,5",' + ",".join(["3"] * 10),
+        '2026-01-02,Lviv,Lviv,"24,25",,' + ",".join([""] * 10),
+    ]
+    csv_path.write_text("\n".join([header] + rows) + "\n", encoding="utf-8")
+
+    with patch("utils.google_sheets._export_url", return_value=str(csv_path)):
+        df = load_google_sheet("test_sheet_id", gid=0, engine=engine)
+
+    assert df["Область"].dtype == "category"
+    assert df["Місто"].dtype == "category"
+    assert df["long"].dtype == "float32"
+    assert df["long"].tolist() == [30.5, 24.25]
+    assert pd.isna(df["lat"].iloc[1])
+    assert df["Значення 1"].dtype == "uint16"
+    assert df["Значення 1"].tolist() == [3, 0]
+
+
+def test_load_google_sheet_mixed_decimal_separators(tmp_path):
+    """Test that coordinates mixing dots and commas are still parsed."""
+    csv_path = tmp_path / "sheet.csv"
+    header = "Дата,Область,Місто,long,lat," + ",".join(f"Значення {i}" for i in range(1, 11))
+    rows = [
+        '2026-01-01,Kyiv,Kyiv,"30,5",50.5,' + ",".join(["1"] * 10),
+        '2026-01-02,Lviv,Lviv,24.25,"49,75",' + ",".join(["1"] * 10),
+    ]
+    csv_path.write_text("\n".join([header] + rows) + "\n", encoding="utf-8")
+
+    with patch("utils.google_sheets._export_url", return_value=str(csv_path)):
+        df = load_google_sheet("test_sheet_id", gid=0)
+
+    assert df["long"].tolist() == [30.5, 24.25]
+    assert df["lat"].tolist() == [50.5, 49.75]
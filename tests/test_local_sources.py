@@ -0,0 +1,125 @@
+"""
+Tests for loading local CSV, Parquet, Arrow IPC and XLSX files.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pytest
+
+import config
+from benchmarks.synthetic import make_sheet, sheet_csv
+from utils.google_sheets import SheetCache, load_google_sheet
+from utils.local_sources import LocalSourceError, iter_local_file, load_local_file
+
+
+@pytest.fixture
+def sheet(tmp_path):
+    """The synthetic sheet as raw CSV bytes and as loaded through the Google Sheets path."""
+    data = sheet_csv(make_sheet(500, max_value=4, seed=11))
+    cache = SheetCache(tmp_path / "cache", offline=True)
+    cache.store("sheet", 0, data)
+    return data, load_google_sheet("sheet", 0, config.VALUE_COLUMNS, cache=cache)
+
+
+def write_source(path, fmt: str, data: bytes, df: pd.DataFrame) -> None:
+    extra = df.assign(notes="ignored")
+    if fmt == "csv":
+        path.write_bytes(data)
+    elif fmt == "parquet":
+        extra.to_parquet(path)
+    elif fmt == "arrow":
+        feather.write_feather(extra, path)
+    elif fmt == "arrow_stream":
+        table = pa.Table.from_pandas(extra)
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif fmt == "xlsx":
+        pytest.importorskip("openpyxl")
+        extra.to_excel(path, index=False)
+
+
+@pytest.mark.parametrize("fmt, suffix", [
+    ("csv", ".csv"),
+    ("parquet", ".parquet"),
+    ("arrow", ".arrow"),
+    ("arrow_stream", ".ipc"),
+    ("xlsx", ".xlsx"),
+])
+def test_local_file_matches_google_sheet(tmp_path, sheet, fmt, suffix):
+    """Test that every format yields the same frame as the Google Sheets loader."""
+    data, expected = sheet
+    path = tmp_path / f"source{suffix}"
+    write_source(path, fmt, data, expected)
+
+    df = load_local_file(path)
+    chunks = list(iter_local_file(path, chunksize=200))
+
+    pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+    assert isinstance(df["Область"].dtype, pd.CategoricalDtype)
+    assert "notes" not in df.columns
+    assert len(chunks) == (1 if fmt == "xlsx" else 3)
+    assert sum(len(chunk) for chunk in chunks) == len(expected)
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_local_csv_with_each_engine(tmp_path, sheet, engine):
+    """Test that both CSV parsers read only the mapped columns of a local file."""
+    data, expected = sheet
+    path = tmp_path / "source.csv"
+    header, *rows = data.decode("utf-8").splitlines()
+    path.write_text("\n".join([f"{header},notes", *(f"{row},ignored" for row in rows)]) + "\n", encoding="utf-8")
+
+    df = load_local_file(path, engine=engine)
+
+    pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+
+
+def test_decimal_comma_coordinates_in_columnar_files(tmp_path):
+    """Test that text coordinates with decimal commas are fixed for Parquet too."""
+    df = pd.DataFrame({
+        "Дата": pd.to_datetime(["2026-01-01"]),
+        "Область": ["Kyiv"],
+        "Місто": ["Kyiv"],
+        "long": ["30,5"],
+        "lat": ["50,5"],
+        **{col: [1] for col in config.VALUE_COLUMNS}
+    })
+    df.to_parquet(tmp_path / "source.parquet")
+
+    loaded = load_local_file(tmp_path / "source.parquet")
+
+    assert (loaded["long"].iloc[0], loaded["lat"].iloc[0]) == (30.5, 50.5)
+    assert loaded["Дата"].iloc[0] == "2026-01-01"
+    assert loaded[config.VALUE_COLUMNS[0]].dtype == "uint16"
+
+
+@pytest.mark.parametrize("name, content, match", [
+    ("source.json", b"{}", "Unsupported source file"),
+    ("source.csv", "Дата,Область\n2026-01-01,Kyiv\n".encode("utf-8"), "Missing columns"),
+    ("missing.parquet", None, "Failed to read"),
+])
+def test_local_file_errors(tmp_path, name, content, match):
+    """Test that unreadable sources raise LocalSourceError."""
+    path = tmp_path / name
+    if content is not None:
+        path.write_bytes(content)
+
+    with pytest.raises(LocalSourceError, match=match):
+        load_local_file(path)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_main_uploads_from_local_file(tmp_path, run_main, sheet, stream):
+    """Test that --source feeds the pipeline without Google Sheets."""
+    from utils.fake_feature_server import FakeFeatureService
+
+    data, expected = sheet
+    feather.write_feather(expected, tmp_path / "backfill.arrow")
+    service = FakeFeatureService(latency=0.0)
+
+    assert run_main(
+        "--source", str(tmp_path / "backfill.arrow"), "--no-report", *(["--stream"] if stream else []), service=service
+    ) == 0
+    valid = expected["long"].notna() & expected["lat"].notna()
+    assert len(service.features) == expected.loc[valid, config.VALUE_COLUMNS].max(axis=1).sum()
@@ -0,0 +1,98 @@
+"""
+Tests for the Prometheus metrics export.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from utils.instrumentation import RunRecorder
+from utils.metrics_export import MetricsExportError, render_metrics, write_textfile, push_metrics
+
+
+def make_report() -> dict:
+    recorder = RunRecorder()
+    with recorder.span("expand", rows_in=2) as span:
+        span.rows_out = 7
+    for seconds in (0.05, 0.3, 2.0):
+        recorder.record_batch(size=100, seconds=seconds, cpu_seconds=0.01, bytes_sent=1000, success=100, failed=0)
+    recorder.results.update({"success": 300, "failed": 4, "retries": 2, "errors": {"throttled": 2}})
+    return recorder.report(exit_code=0)
+
+
+def samples(text: str) -> dict:
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+
+
+def test_render_counters_and_gauges():
+    """Test that run results become counter and gauge samples."""
+    values = samples(render_metrics(make_report()))
+
+    assert values["m1mt_features_uploaded_total"] == "300"
+    assert values["m1mt_features_failed_total"] == "4"
+    assert values["m1mt_upload_retries_total"] == "2"
+    assert values['m1mt_upload_errors_total{class="throttled"}'] == "2"
+    assert values["m1mt_rows_expanded_total"] == "7"
+    assert values["m1mt_upload_bytes_total"] == "3000"
+    assert 'm1mt_stage_duration_seconds{stage="expand"}' in values
+    assert float(values['m1mt_stage_rss_bytes{stage="expand",at="start"}']) >= 0
+    assert 'm1mt_stage_rss_bytes{stage="expand",at="end"}' in values
+    assert float(values['m1mt_stage_cumulative_peak_rss_bytes{stage="expand"}']) > 0
+    assert values["m1mt_run_exit_code"] == "0"
+
+
+def test_render_latency_histogram_is_cumulative():
+    """Test that histogram buckets count batches at or below each bound."""
+    values = samples(render_metrics(make_report(), buckets=(0.1, 1.0)))
+
+    assert values['m1mt_batch_latency_seconds_bucket{le="0.1"}'] == "1"
+    assert values['m1mt_batch_latency_seconds_bucket{le="1.0"}'] == "2"
+    assert values['m1mt_batch_latency_seconds_bucket{le="+Inf"}'] == "3"
+    assert values["m1mt_batch_latency_seconds_count"] == "3"
+    assert float(values["m1mt_batch_latency_seconds_sum"]) == pytest.approx(2.35)
+
+
+def test_write_textfile(tmp_path):
+    """Test that the textfile is written without leaving a temp file."""
+    path = tmp_path / "textfile" / "m1mt.prom"
+
+    write_textfile("m1mt_run_exit_code 0\n", path)
+
+    assert path.read_text(encoding="utf-8") == "m1mt_run_exit_code 0\n"
+    assert [p.name for p in path.parent.iterdir()] == ["m1mt.prom"]
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    """Records PUT requests like a pushgateway."""
+
+    received = []
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        GatewayHandler.received.append((self.path, self.headers["Content-Type"], body.decode("utf-8")))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_push_metrics():
+    """Test that metrics are PUT to the job's pushgateway path."""
+    server = HTTPServer(("127.0.0.1", 0), GatewayHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        push_metrics("m1mt_run_exit_code 0\n", f"http://127.0.0.1:{server.server_port}/", job="nightly")
+    finally:
+        server.shutdown()
+
+    path, content_type, body = GatewayHandler.received[-1]
+    assert path == "/metrics/job/nightly"
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert body == "m1mt_run_exit_code 0\n"
+
+
+def test_push_metrics_unreachable():
+    """Test that an unreachable gateway raises MetricsExportError."""
+    with pytest.raises(MetricsExportError):
+        push_metrics("", "http://127.0.0.1:9", timeout=1)
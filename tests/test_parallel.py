@@ -0,0 +1,90 @@
+"""
+Tests for multi-process expansion and conversion.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_sheet
+from utils import parallel
+from utils.arcgis_client import FeatureBatch, df_to_features
+from utils.data_processing import expand_dataframe
+from utils.fake_feature_server import FakeFeatureService
+
+VALUE_COLS = [f'Значення {i}' for i in range(1, 11)]
+
+
+def make_df(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    long = rng.uniform(22, 40, n_rows).astype("float32")
+    long[::7] = np.nan
+    return pd.DataFrame({
+        "Дата": [f"2026-01-{i % 28 + 1:02d}" for i in range(n_rows)],
+        "Область": pd.Categorical([f"Region {i % 3}" for i in range(n_rows)]),
+        "Місто": [f"City {i % 5}" for i in range(n_rows)],
+        "long": long,
+        "lat": rng.uniform(44, 52, n_rows).astype("float32"),
+        **{col: rng.integers(0, 6, n_rows).astype("uint16") for col in VALUE_COLS}
+    })
+
+
+@pytest.mark.parametrize("mode", ["ladder", "weighted"])
+def test_parallel_features_match_serial(mode):
+    """Test that partitioned output is identical to the serial path, in order."""
+    df = make_df(60)
+
+    expected = df_to_features(expand_dataframe(df, VALUE_COLS, show_progress=False, mode=mode))
+    result = parallel.parallel_features(df, VALUE_COLS, jobs=2, mode=mode, partition_rows=7)
+
+    assert [f.as_dict for f in result] == [f.as_dict for f in expected]
+    assert type(result[0].attributes["value_1"]) is int
+
+
+def test_parallel_features_empty():
+    """Test that an empty frame yields no features."""
+    assert parallel.parallel_features(make_df(0), VALUE_COLS, jobs=2) == []
+
+
+@pytest.mark.parametrize("empty", ["zero_values", "invalid_coordinates"])
+def test_parallel_features_empty_partition(empty):
+    """Test that a partition expanding to no features does not break the others."""
+    df = make_df(12)
+    if empty == "zero_values":
+        df.loc[4:7, VALUE_COLS] = 0
+    else:
+        df.loc[4:7, "long"] = np.nan
+
+    expected = df_to_features(expand_dataframe(df, VALUE_COLS, show_progress=False))
+    result = parallel.parallel_features(df, VALUE_COLS, jobs=2, partition_rows=4)
+
+    assert [f.as_dict for f in result] == [f.as_dict for f in expected]
+
+
+@pytest.mark.parametrize("mode", ["ladder", "weighted"])
+def test_parallel_feature_batch_matches_serial_batch(mode):
+    """Test that worker partitions join into the batch the serial path encodes."""
+    df = make_df(60)
+
+    expected = FeatureBatch.from_dataframe(expand_dataframe(df, VALUE_COLS, show_progress=False, mode=mode), raw=True)
+    result = parallel.parallel_feature_batch(df, VALUE_COLS, jobs=2, mode=mode, partition_rows=7, raw=True)
+
+    assert isinstance(result, FeatureBatch)
+    assert result.names == expected.names
+    assert result.to_list() == expected.to_list()
+
+
+@pytest.mark.parametrize("dedup", [False, True])
+def test_main_with_jobs(run_main, dedup):
+    """Test the whole pipeline with --jobs, joining worker batches or filtering them for --dedup."""
+    sheet = make_sheet(60, max_value=3, invalid_share=0.0, seed=4)
+    service = FakeFeatureService(latency=0.0)
+    url = run_main.store_sheet(sheet)
+    flags = ["--url", url, "--jobs", "2", "--no-report", *(["--dedup"] if dedup else [])]
+
+    assert run_main(*flags, service=service) == 0
+    expected = sheet[VALUE_COLS].max(axis=1).sum()
+    assert len(service.features) == expected
+
+    if dedup:
+        assert run_main(*flags, service=service) == 0
+        assert len(service.features) == expected
@@ -3,7 +3,7 @@ Tests for Google Sheets URL parsing.
 """
 
 import pytest
-from utils.google_sheets import parse_google_sheet_url, GoogleSheetsError
+from utils.google_sheets import parse_google_sheet_url, read_manifest, GoogleSheetsError
 
 
 @pytest.mark.parametrize(
@@ -36,3 +36,28 @@ def test_parse_google_sheet_url_invalid():
     """Test that invalid URLs raise GoogleSheetsError."""
     with pytest.raises(GoogleSheetsError):
         parse_google_sheet_url("https://docs.google.com/spreadsheets/invalid_url")
+
+
+def test_read_manifest(tmp_path):
+    """Test that manifest comments and blank lines are skipped but URL fragments kept."""
+    manifest = tmp_path / "sheets.txt"
+    manifest.write_text(
+        "# regional tabs\n"
+        "https://docs.google.com/spreadsheets/d/abc123/edit#gid=0\n"
+        "\n"
+        "  https://docs.google.com/spreadsheets/d/abc123/edit#gid=7  \n",
+        encoding="utf-8"
+    )
+
+    urls = read_manifest(manifest)
+
+    assert [parse_google_sheet_url(url) for url in urls] == [("abc123", 0), ("abc123", 7)]
+
+
+def test_read_manifest_empty(tmp_path):
+    """Test that a manifest without URLs raises GoogleSheetsError."""
+    manifest = tmp_path / "sheets.txt"
+    manifest.write_text("# nothing yet\n", encoding="utf-8")
+
+    with pytest.raises(GoogleSheetsError):
+        read_manifest(manifest)
@@ -0,0 +1,115 @@
+"""
+Tests for replacing all features of a layer.
+"""
+
+import json
+
+import pytest
+
+from benchmarks.synthetic import make_sheet
+from utils.export import geojson_feature
+from utils.fake_feature_server import FakeArcGISClient, FakeFeatureLayer, FakeFeatureService, FakeServiceError
+from utils.replace import clear_layer, read_geojson, replace_layer, write_geojson
+
+
+def make_features(count: int, start: int = 0) -> list[dict]:
+    return [
+        {"attributes": {"date": "2026-01-01", "value_1": i}, "geometry": {"x": 30.5, "y": 50.5}}
+        for i in range(start, start + count)
+    ]
+
+
+def values(service: FakeFeatureService) -> list[int]:
+    return sorted(f["attributes"]["value_1"] for f in service.features.values())
+
+
+def test_geojson_round_trip(tmp_path):
+    """Test that staged features read back as the same feature dicts."""
+    path = tmp_path / "features.geojson"
+
+    assert write_geojson(make_features(3), path) == 3
+    # Same GeoJSON as --output writes
+    assert json.loads(path.read_text(encoding="utf-8"))["features"] == [geojson_feature(f) for f in make_features(3)]
+    assert [(f["attributes"], f["geometry"]["x"]) for f in read_geojson(path)] == [
+        (f["attributes"], 30.5) for f in make_features(3)
+    ]
+
+
+@pytest.mark.parametrize("supports_truncate, method", [(True, "truncate"), (False, "delete")])
+def test_clear_layer_uses_fastest_operation(supports_truncate, method):
+    """Test that truncate is preferred and a where-clause delete is the fallback."""
+    layer = FakeFeatureLayer(FakeFeatureService(), supports_truncate=supports_truncate)
+    layer.edit_features(adds=make_features(10))
+
+    assert clear_layer(layer) == (method, 10)
+    assert layer.service.features == {}
+
+
+@pytest.mark.parametrize("supports_append, with_gis, upload_method", [
+    (True, True, "append"),
+    (False, True, "adds"),
+    (True, False, "adds"),
+])
+def test_replace_layer(supports_append, with_gis, upload_method):
+    """Test that only the new features remain, loaded by append where possible."""
+    layer = FakeFeatureLayer(FakeFeatureService(), supports_append=supports_append)
+    layer.edit_features(adds=make_features(5, start=100))
+    client = FakeArcGISClient(layer=layer)
+    commits = []
+
+    stats = replace_layer(
+        layer, make_features(20), gis=client.gis if with_gis else None,
+        batch_size=7, show_progress=False, on_commit=lambda start, ids: commits.append((start, ids))
+    )
+
+    assert values(layer.service) == list(range(20))
+    assert stats["success"] == stats["total"] == 20
+    assert (stats["cleared"], stats["clear_method"], stats["upload_method"]) == (5, "truncate", upload_method)
+    assert stats["swap_seconds"] >= 0
+    assert sorted(oid for _, ids in commits for oid in ids) == sorted(layer.service.features)
+    assert layer.service.uploads == {}
+
+
+@pytest.mark.parametrize("supports_append", [True, False])
+def test_replace_keeps_layer_when_source_fails(supports_append):
+    """Test that a source failing mid-way raises before the layer is cleared."""
+    layer = FakeFeatureLayer(FakeFeatureService(), supports_append=supports_append)
+    layer.edit_features(adds=make_features(5, start=100))
+    client = FakeArcGISClient(layer=layer)
+
+    def failing_source():
+        yield from make_features(10)
+        raise ValueError("Missing required columns: Місто")
+
+    with pytest.raises(ValueError, match="Місто"):
+        replace_layer(layer, failing_source(), gis=client.gis, batch_size=3, show_progress=False)
+
+    assert values(layer.service) == list(range(100, 105))
+
+
+def test_replace_falls_back_when_append_fails(monkeypatch):
+    """Test that a failed append is redone as batched adds on a cleared layer."""
+    layer = FakeFeatureLayer(FakeFeatureService())
+    client = FakeArcGISClient(layer=layer)
+
+    def partial_append(**kwargs):
+        layer.edit_features(adds=make_features(3, start=50))
+        raise FakeServiceError(500, "Append job failed")
+
+    monkeypatch.setattr(layer, "append", partial_append)
+    stats = replace_layer(layer, make_features(8), gis=client.gis, show_progress=False)
+
+    assert stats["upload_method"] == "adds"
+    assert values(layer.service) == list(range(8))
+
+
+def test_main_replace_twice_keeps_one_copy(run_main):
+    """Test that --mode replace leaves exactly the sheet's features on the layer."""
+    sheet = make_sheet(60, max_value=3, invalid_share=0.0, seed=5)
+    service = FakeFeatureService(latency=0.0)
+    url = run_main.store_sheet(sheet)
+    expected = sheet[[f"Значення {i}" for i in range(1, 11)]].max(axis=1).sum()
+
+    for _ in range(2):
+        assert run_main("--url", url, "--no-report", "--mode", "replace", service=service) == 0
+        assert len(service.features) == expected
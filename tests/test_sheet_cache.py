@@ -0,0 +1,93 @@
+"""
+Tests for the cached, conditional Google Sheets fetch.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from utils.google_sheets import SheetCache, iter_google_sheet, load_google_sheet, GoogleSheetsError
+
+CSV = (
+    "Дата,Область,Місто,long,lat," + ",".join(f"Значення {i}" for i in range(1, 11)) + "\n"
+    '2026-01-01,Kyiv,Kyiv,"30,5","50,5",' + ",".join(["1"] * 10) + "\n"
+).encode("utf-8")
+
+
+class SheetHandler(BaseHTTPRequestHandler):
+    """Serves CSV with an ETag and honours If-None-Match."""
+
+    requests = []
+
+    def do_GET(self):
+        SheetHandler.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(CSV)))
+        self.end_headers()
+        self.wfile.write(CSV)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def sheet_url():
+    SheetHandler.requests = []
+    server = HTTPServer(("127.0.0.1", 0), SheetHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/export.csv"
+    server.shutdown()
+
+
+def test_sheet_cache_revalidates_snapshot(tmp_path, sheet_url):
+    """Test that an unchanged sheet is served from the snapshot after a 304."""
+    cache = SheetCache(tmp_path)
+
+    assert cache.fetch("sheet", 0, sheet_url) == CSV
+    assert cache.fetch("sheet", 0, sheet_url) == CSV
+
+    assert len(SheetHandler.requests) == 2
+    assert "If-None-Match" not in SheetHandler.requests[0]
+    assert SheetHandler.requests[1]["If-None-Match"] == '"v1"'
+    assert (tmp_path / "sheet_0.csv.gz").exists()
+
+
+def test_sheet_cache_offline(tmp_path, sheet_url):
+    """Test that offline mode replays the snapshot without requests."""
+    SheetCache(tmp_path).fetch("sheet", 0, sheet_url)
+
+    assert SheetCache(tmp_path, offline=True).fetch("sheet", 0, "http://127.0.0.1:9/unreachable") == CSV
+    assert len(SheetHandler.requests) == 1
+
+    with pytest.raises(GoogleSheetsError):
+        SheetCache(tmp_path, offline=True).fetch("other", 0)
+
+
+def test_load_google_sheet_from_cache(tmp_path, sheet_url):
+    """Test that the loader prepares a DataFrame from the cached export."""
+    SheetCache(tmp_path).fetch("sheet", 0, sheet_url)
+
+    df = load_google_sheet("sheet", 0, cache=SheetCache(tmp_path, offline=True))
+
+    assert len(df) == 1
+    assert df["long"].iloc[0] == 30.5
+    assert df["Значення 10"].dtype == "uint16"
+
+
+def test_loaders_read_snapshot_file(tmp_path, sheet_url, monkeypatch):
+    """Test that the loaders read chunks from the gzip snapshot instead of the whole export in memory."""
+    path = SheetCache(tmp_path).snapshot("sheet", 0, sheet_url)
+    monkeypatch.setattr(SheetCache, "fetch", lambda *args: pytest.fail("export read into memory"))
+
+    chunks = list(iter_google_sheet("sheet", 0, chunksize=1, cache=SheetCache(tmp_path, offline=True)))
+
+    assert path == tmp_path / "sheet_0.csv.gz"
+    assert len(chunks) == 1
+    assert chunks[0]["lat"].iloc[0] == 50.5
@@ -0,0 +1,52 @@
+"""
+Tests that the CLI starts without importing heavy packages.
+"""
+
+import os
+import subprocess
+import sys
+
+import config
+from benchmarks.synthetic import make_sheet, sheet_csv
+from utils.google_sheets import SheetCache
+
+# Runs main() and reports which heavy packages ended up imported
+PROBE = """
+import sys
+import main
+sys.argv = ["main.py", *sys.argv[1:]]
+try:
+    code = main.main()
+except SystemExit as e:
+    code = e.code
+print("IMPORTED", code, "pandas" in sys.modules, "arcgis" in sys.modules)
+"""
+
+
+def probe(*args: str, env: dict = None) -> tuple[str, str, str]:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, *args],
+        capture_output=True, text=True, cwd=config.PROJECT_ROOT, env=env, timeout=120
+    )
+    line = next(line for line in result.stdout.splitlines() if line.startswith("IMPORTED"))
+    return tuple(line.split()[1:])
+
+
+def test_help_imports_neither_pandas_nor_arcgis():
+    """Test that --help returns before any heavy import."""
+    assert probe("--help") == ("0", "False", "False")
+
+
+def test_dry_run_does_not_import_arcgis(tmp_path):
+    """Test that an offline dry run never loads the arcgis package."""
+    cache = SheetCache(tmp_path / "cache")
+    cache.store("sheet", 0, sheet_csv(make_sheet(20, max_value=3, seed=1)))
+    env = {**os.environ, "CACHE_DIR": str(tmp_path / "cache")}
+
+    result = probe(
+        "--url", "https://docs.google.com/spreadsheets/d/sheet/edit#gid=0",
+        "--offline", "--dry-run", "--no-progress", "--no-report", "--log-file", str(tmp_path / "run.log"),
+        env=env
+    )
+
+    assert result == ("0", "True", "False")
@@ -0,0 +1,139 @@
+"""
+Tests for incremental sync of changed rows.
+"""
+
+import pandas as pd
+import pytest
+from utils.sync import SyncState, row_keys, sync_sheet
+
+
+class MemoryLayer:
+    """Layer stand-in that stores added features by objectId."""
+
+    def __init__(self):
+        self.features = {}
+        self.next_id = 1
+
+    def edit_features(self, adds=None, deletes=None):
+        if deletes:
+            ids = [int(oid) for oid in deletes.split(",")]
+            for oid in ids:
+                self.features.pop(oid)
+            return {"deleteResults": [{"objectId": oid, "success": True} for oid in ids]}
+
+        results = []
+        for feature in adds:
+            self.features[self.next_id] = feature.attributes
+            results.append({"objectId": self.next_id, "success": True})
+            self.next_id += 1
+        return {"addResults": results}
+
+
+def make_sheet(rows: list[tuple[str, int]]) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Дата": [date for date, _ in rows],
+        "Область": "Kyiv",
+        "Місто": "Kyiv",
+        "long": pd.Series([30.5] * len(rows), dtype="float32"),
+        "lat": pd.Series([50.5] * len(rows), dtype="float32"),
+        **{f"Значення {i}": pd.Series([value if i == 1 else 0 for _, value in rows], dtype="uint16") for i in range(1, 11)}
+    })
+
+
+def test_row_keys_stable_and_unique():
+    """Test that row keys depend on content only and tell duplicate rows apart."""
+    df = make_sheet([("2026-01-01", 2), ("2026-01-01", 2), ("2026-01-02", 1)])
+
+    keys = row_keys(df)
+
+    assert keys.is_unique
+    assert set(keys) == set(row_keys(df.iloc[::-1]))
+    assert keys.iloc[0].split("#")[0] == keys.iloc[1].split("#")[0]
+
+
+def test_sync_sheet_uploads_only_delta(tmp_path):
+    """Test that only new rows are added and removed rows are deleted."""
+    layer = MemoryLayer()
+    first = make_sheet([("2026-01-01", 2), ("2026-01-02", 3)])
+
+    with SyncState(tmp_path / "state.sqlite3", "item:sheet:0") as state:
+        stats = sync_sheet(layer, first, state, show_progress=False)
+    assert stats["success"] == 5
+    assert len(layer.features) == 5
+
+    second = make_sheet([("2026-01-02", 3), ("2026-01-03", 1)])
+    with SyncState(tmp_path / "state.sqlite3", "item:sheet:0") as state:
+        stats = sync_sheet(layer, second, state, show_progress=False)
+
+    assert stats["unchanged_rows"] == 1
+    assert stats["new_rows"] == 1
+    assert stats["removed_rows"] == 1
+    assert stats["deleted"] == 2
+    assert stats["success"] == 1
+    assert sorted(f["date"] for f in layer.features.values()) == ["2026-01-02"] * 3 + ["2026-01-03"]
+
+
+def test_sync_sheet_dry_run_changes_nothing(tmp_path):
+    """Test that a dry-run sync only reports the plan."""
+    layer = MemoryLayer()
+
+    with SyncState(tmp_path / "state.sqlite3", "item:sheet:0") as state:
+        stats = sync_sheet(layer, make_sheet([("2026-01-01", 2)]), state, dry_run=True)
+        assert state.rows() == {}
+
+    assert stats["new_rows"] == 1
+    assert layer.features == {}
+
+
+def test_failed_deletes_are_retried_next_sync(tmp_path):
+    """Test that rows whose features could not be deleted are kept in the state."""
+    layer = MemoryLayer()
+    with SyncState(tmp_path / "state.sqlite3", "item:sheet:0") as state:
+        sync_sheet(layer, make_sheet([("2026-01-01", 2)]), state, show_progress=False)
+
+    edit = layer.edit_features
+
+    def failing_deletes(adds=None, deletes=None):
+        if deletes:
+            raise RuntimeError("Unable to delete features")
+        return edit(adds=adds)
+
+    layer.edit_features = failing_deletes
+    second = make_sheet([("2026-01-02", 1)])
+    with SyncState(tmp_path / "state.sqlite3", "item:sheet:0") as state:
+        stats = sync_sheet(layer, second, state, show_progress=False)
+        assert stats["deleted"] == 0
+        assert len(state.rows()) == 2
+
+    layer.edit_features = edit
+    with SyncState(tmp_path / "state.sqlite3", "item:sheet:0") as state:
+        stats = sync_sheet(layer, second, state, show_progress=False)
+        assert (stats["deleted"], stats["new_rows"]) == (2, 0)
+        assert len(state.rows()) == 1
+    assert [f["date"] for f in layer.features.values()] == ["2026-01-02"]
+
+
+def test_interrupted_sync_saves_committed_rows(tmp_path):
+    """Test that rows added before an interrupt are not added again by the next sync."""
+    layer = MemoryLayer()
+    edit = layer.edit_features
+    calls = []
+
+    def interrupted(adds=None, deletes=None):
+        calls.append(len(adds))
+        if len(calls) > 1:
+            raise KeyboardInterrupt
+        return edit(adds=adds)
+
+    layer.edit_features = interrupted
+    sheet = make_sheet([("2026-01-01", 2), ("2026-01-02", 3)])
+    with SyncState(tmp_path / "state.sqlite3", "item:sheet:0") as state:
+        with pytest.raises(KeyboardInterrupt):
+            sync_sheet(layer, sheet, state, batch_size=2, show_progress=False)
+
+    layer.edit_features = edit
+    with SyncState(tmp_path / "state.sqlite3", "item:sheet:0") as state:
+        stats = sync_sheet(layer, sheet, state, batch_size=2, show_progress=False)
+
+    assert stats["unchanged_rows"] == 1
+    assert sorted(f["date"] for f in layer.features.values()) == ["2026-01-01"] * 2 + ["2026-01-02"] * 3
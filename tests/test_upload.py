@@ -0,0 +1,301 @@
+"""
+Tests for batched feature uploads.
+"""
+
+import threading
+import time
+
+import pytest
+from unittest.mock import MagicMock
+from utils.arcgis_client import (
+    upload_features_batch,
+    classify_error,
+    AdaptiveBatcher,
+    ArcGISError,
+    FeatureBatch,
+    RetryPolicy,
+    SourceTally
+)
+
+
+def _counts(stats: dict) -> dict:
+    return {key: stats[key] for key in ("success", "failed", "total")}
+
+
+class SlowLayer:
+    """Layer stand-in that tracks concurrent applyEdits calls."""
+
+    def __init__(self, latency: float = 0.01, reject_every: int = 0, fail_batches: tuple = ()):
+        self.latency = latency
+        self.reject_every = reject_every
+        self.fail_batches = fail_batches
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def edit_features(self, adds):
+        with self.lock:
+            call = self.calls
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if call in self.fail_batches:
+                raise RuntimeError("Invalid geometry")
+            return {"addResults": [
+                {"objectId": call * 10000 + i, "success": not (self.reject_every and f % self.reject_every == 0)}
+                for i, f in enumerate(adds)
+            ]}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_upload_features_batch_counts(workers):
+    """Test that success and failure accounting is exact with any worker count."""
+    layer = SlowLayer(reject_every=10)
+    features = list(range(1000))
+
+    stats = upload_features_batch(layer, features, batch_size=64, show_progress=False, workers=workers)
+
+    assert _counts(stats) == {"success": 900, "failed": 100, "total": 1000}
+    assert layer.calls == 16
+    assert layer.max_in_flight <= workers
+
+
+def test_upload_features_batch_failed_batch():
+    """Test that an exception fails only its own batch."""
+    layer = SlowLayer(fail_batches=(0,))
+
+    stats = upload_features_batch(layer, list(range(25)), batch_size=10, show_progress=False, workers=2)
+
+    assert _counts(stats) == {"success": 15, "failed": 10, "total": 25}
+
+
+def test_upload_features_batch_all_failed():
+    """Test that ArcGISError is raised when every batch fails."""
+    layer = MagicMock()
+    layer.edit_features.side_effect = RuntimeError("Network error")
+
+    with pytest.raises(ArcGISError, match="All batches failed"):
+        upload_features_batch(layer, list(range(5)), batch_size=2, show_progress=False, workers=3)
+
+
+class PoisonLayer:
+    """Layer stand-in that rejects any request containing a poisoned feature."""
+
+    def __init__(self, poisoned: set):
+        self.poisoned = poisoned
+        self.calls = 0
+
+    def edit_features(self, adds):
+        self.calls += 1
+        if self.poisoned.intersection(f["attributes"]["id"] for f in adds):
+            raise RuntimeError("Invalid feature")
+        return {"addResults": [{"success": True} for _ in adds]}
+
+
+def test_adaptive_batching_splits_failed_batch():
+    """Test that one bad feature no longer fails its whole batch."""
+    layer = PoisonLayer(poisoned={137})
+    features = [{"attributes": {"id": i}} for i in range(500)]
+    batcher = AdaptiveBatcher(initial_size=500, target_latency=1.0)
+
+    stats = upload_features_batch(layer, features, show_progress=False, batcher=batcher)
+
+    assert _counts(stats) == {"success": 499, "failed": 1, "total": 500}
+    assert batcher.size < 500
+
+
+def test_adaptive_batching_does_not_split_transient_failures():
+    """Test that a batch failing with exhausted transient retries is not split."""
+    layer = MagicMock()
+    layer.edit_features.side_effect = RuntimeError("HTTP 503 Service Unavailable")
+    features = [{"attributes": {"id": i}} for i in range(64)]
+
+    with pytest.raises(ArcGISError):
+        upload_features_batch(
+            layer, features, show_progress=False,
+            batcher=AdaptiveBatcher(initial_size=64), retry=RetryPolicy(max_retries=2, base_delay=0)
+        )
+
+    assert layer.edit_features.call_count == 3
+
+
+@pytest.mark.parametrize(
+    "latency, expected_growth",
+    [(0.0, True), (10.0, False)]
+)
+def test_adaptive_batcher_latency(latency, expected_growth):
+    """Test that batches grow after fast responses and shrink after slow ones."""
+    batcher = AdaptiveBatcher(initial_size=100, target_latency=1.0)
+    batcher.record_success(100, latency)
+    assert (batcher.next_size() > 100) == expected_growth
+
+
+def test_adaptive_batcher_payload_limit():
+    """Test that the batch size is capped by the estimated payload bytes."""
+    batcher = AdaptiveBatcher(initial_size=1000, max_payload_bytes=10_000, target_latency=1.0)
+    batcher.observe_payload([{"attributes": {"text": "x" * 80}}] * 5)
+    assert 50 <= batcher.next_size() <= 125
+
+
+class FlakyLayer:
+    """Layer stand-in that raises the given errors before succeeding."""
+
+    def __init__(self, errors: list):
+        self.errors = list(errors)
+
+    def edit_features(self, adds):
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"addResults": [{"success": True} for _ in adds]}
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (TimeoutError("read timed out"), "timeout"),
+        (RuntimeError("Error code 429: Too Many Requests"), "throttled"),
+        (RuntimeError("503 Service Unavailable"), "server"),
+        (RuntimeError("Invalid token. (Error Code: 498)"), "token"),
+        (ConnectionResetError("Connection reset by peer"), "connection"),
+        (RuntimeError("Unable to add feature: invalid geometry"), "permanent"),
+        (RuntimeError("HTTP Error 502: Bad Gateway"), "server"),
+        (RuntimeError("Unable to add 500 features: invalid geometry"), "permanent"),
+        (RuntimeError("Field value_1 must be below 429"), "permanent"),
+        (RuntimeError("Row 498 has no coordinates"), "permanent"),
+    ]
+)
+def test_classify_error(error, expected):
+    """Test that transient and permanent errors are told apart."""
+    assert classify_error(error) == expected
+
+
+def test_upload_features_batch_retries_transient_errors():
+    """Test that transient errors are retried and reported in stats."""
+    waits = []
+    layer = FlakyLayer([RuntimeError("Error code 429"), TimeoutError("timed out")])
+    retry = RetryPolicy(max_retries=3, base_delay=1.0, max_delay=4.0, sleep=waits.append)
+
+    stats = upload_features_batch(layer, list(range(10)), batch_size=10, show_progress=False, retry=retry)
+
+    assert _counts(stats) == {"success": 10, "failed": 0, "total": 10}
+    assert stats["retries"] == 2
+    assert stats["errors"] == {"throttled": 1, "timeout": 1}
+    assert stats["retry_wait"] == pytest.approx(sum(waits), abs=1e-3)
+    assert waits[0] <= 1.0 and waits[1] <= 2.0
+
+
+def test_upload_features_batch_permanent_error_not_retried():
+    """Test that permanent errors fail the batch without retrying."""
+    layer = FlakyLayer([RuntimeError("Invalid geometry")])
+    retry = RetryPolicy(max_retries=3, sleep=lambda _: pytest.fail("should not sleep"))
+
+    stats = upload_features_batch(layer, list(range(20)), batch_size=10, show_progress=False, retry=retry)
+
+    assert _counts(stats) == {"success": 10, "failed": 10, "total": 20}
+    assert stats["retries"] == 0
+    assert stats["errors"] == {"permanent": 1}
+
+
+def test_upload_features_batch_consumes_generator():
+    """Test that features can be streamed from a generator."""
+    layer = SlowLayer(latency=0)
+    features = (i for i in range(95))
+
+    stats = upload_features_batch(layer, features, batch_size=10, show_progress=False, workers=2)
+
+    assert _counts(stats) == {"success": 95, "failed": 0, "total": 95}
+    assert layer.calls == 10
+
+
+def test_source_tally_attributes_commits():
+    """Test that added, failed and resumed features are counted per source."""
+    tally = SourceTally()
+    features = list(tally.chain([("a", range(30)), ("b", []), ("c", range(40))]))
+    layer = SlowLayer(fail_batches=(2,))
+
+    stats = upload_features_batch(
+        layer, features, batch_size=10, show_progress=False, committed=[(0, 10)], on_commit=tally.record
+    )
+
+    assert _counts(stats) == {"success": 50, "failed": 10, "total": 60}
+    assert tally.summary([(0, 10)]) == {
+        "a": {"features": 30, "resumed": 10, "success": 20, "failed": 0},
+        "b": {"features": 0, "resumed": 0, "success": 0, "failed": 0},
+        "c": {"features": 40, "resumed": 0, "success": 30, "failed": 10},
+    }
+
+
+@pytest.mark.parametrize("response", [{}, {"addResults": []}, None])
+def test_response_without_add_results_counts_as_failed(response):
+    """Test that an unconfirmed batch is failed in the stats, the commits and the tally alike."""
+    layer = SlowLayer(latency=0)
+    edit_features = layer.edit_features
+    layer.edit_features = lambda adds: response if layer.calls == 1 else edit_features(adds)
+    tally = SourceTally()
+    features = list(tally.chain([("a", range(20))]))
+    commits = []
+
+    def on_commit(start, object_ids):
+        commits.append((start, object_ids))
+        tally.record(start, object_ids)
+
+    stats = upload_features_batch(layer, features, batch_size=10, show_progress=False, workers=1, on_commit=on_commit)
+
+    assert _counts(stats) == {"success": 10, "failed": 10, "total": 20}
+    assert tally.summary()["a"] == {"features": 20, "resumed": 0, "success": 10, "failed": 10}
+    assert sum(oid is not None for _, object_ids in commits for oid in object_ids) == stats["success"]
+
+
+def test_upload_feature_batch_slices_per_request():
+    """Test that a FeatureBatch is uploaded directly, skipping committed ranges, with per-source tallies."""
+    import numpy as np
+
+    def batch(n: int) -> FeatureBatch:
+        codes = np.zeros(n, dtype=np.uint8)
+        return FeatureBatch(["region", "value_1"], [codes, np.arange(n)], [np.array(["Kyiv"], dtype=object), None], np.full(n, 30.5), np.full(n, 50.5), as_dict=True)
+
+    tally = SourceTally()
+    features = tally.concat([("a", batch(30)), ("b", batch(40))])
+    layer = SlowLayer(latency=0)
+    sent = []
+    layer.edit_features = lambda adds, edit=layer.edit_features: sent.append(adds) or edit(adds)
+
+    stats = upload_features_batch(
+        layer, features, batch_size=10, show_progress=False, committed=[(0, 10)], on_commit=tally.record
+    )
+
+    assert _counts(stats) == {"success": 60, "failed": 0, "total": 60}
+    assert stats["resumed"] == 10
+    assert sent[0][0] == {"attributes": {"region": "Kyiv", "value_1": 10}, "geometry": {"x": 30.5, "y": 50.5, "spatialReference": {"wkid": 4326}}}
+    assert tally.summary([(0, 10)])["b"] == {"features": 40, "resumed": 0, "success": 40, "failed": 0}
+
+
+@pytest.mark.parametrize("refreshable", [True, False])
+def test_token_errors_retried_only_after_refresh(refreshable):
+    """Test that an expired token is refreshed before retrying, and not retried without a way to refresh it."""
+    class ExpiringLayer:
+        def __init__(self):
+            self.token = "old"
+            self.calls = 0
+
+        def edit_features(self, adds):
+            self.calls += 1
+            if self.token == "old":
+                raise RuntimeError("Invalid token. (Error Code: 498)")
+            return {"addResults": [{"success": True} for _ in adds]}
+
+    layer = ExpiringLayer()
+    if refreshable:
+        layer.refresh_token = lambda: setattr(layer, "token", "new")
+        stats = upload_features_batch(layer, list(range(5)), show_progress=False, retry=RetryPolicy(base_delay=0))
+        assert (stats["success"], stats["retries"], layer.calls) == (5, 1, 2)
+    else:
+        with pytest.raises(ArcGISError):
+            upload_features_batch(layer, list(range(5)), show_progress=False, retry=RetryPolicy(base_delay=0))
+        assert layer.calls == 1
@@ -1 +1 @@
-__all__ = ['google_sheets', 'data_processing', 'arcgis_client']
+__all__ = ['google_sheets', 'data_processing', 'arcgis_client', 'checkpoint', 'sync', 'fake_feature_server', 'instrumentation', 'metrics_export', 'dedup', 'replace', 'async_upload', 'local_sources', 'export', 'parallel']
@@ -1,10 +1,66 @@
+from __future__ import annotations
+
+import contextlib
+import gzip
+import json
 import logging
-import pandas as pd
-from arcgis.gis import GIS
-from arcgis.features import Feature, FeatureLayer
+import random
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
+
+import numpy as np
+
+import config
+from utils.instrumentation import RunRecorder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from arcgis.features import Feature, FeatureLayer
 
 logger = logging.getLogger(__name__)
 
+# The arcgis package takes seconds to import; its names are resolved on first use
+_LAZY_IMPORTS = {"GIS": "arcgis.gis", "Feature": "arcgis.features", "FeatureLayer": "arcgis.features"}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def _feature_cls() -> type:
+    """Return ``Feature``, honouring a patched module attribute."""
+    return globals().get("Feature") or __getattr__("Feature")
+
+# (sheet column, ArcGIS field, cast) compiled once from the field table in config
+FIELD_MAPPING: list[tuple[str, str, type]] = [
+    *((col, field, str) for col, field in config.TEXT_FIELDS.items()),
+    *((col, field, int) for col, field in config.VALUE_FIELDS.items()),
+]
+# Extra fields of weighted output, mapped only when the frame has them
+RUN_MAPPING: list[tuple[str, str, type]] = [(col, field, int) for col, field in config.RUN_FIELDS.items()]
+
 
 class ArcGISError(Exception):
     pass
@@ -15,6 +71,8 @@ class ArcGISClient:
 
     def __init__(self):
         """Initialize ArcGIS client with anonymous access."""
+        from arcgis.gis import GIS
+
         try:
             self.gis = GIS()
             logger.info("Connected to ArcGIS (anonymous)")
@@ -37,94 +95,868 @@ class ArcGISClient:
         except Exception as e:
             raise ArcGISError(f"Failed to get layer: {e}") from e
 
+    @property
+    def token(self) -> str | None:
+        """Current token of the connection, ``None`` when anonymous; renewed by the connection when it expires."""
+        return getattr(getattr(self.gis, "_con", None), "token", None)
+
+    def refresh_token(self) -> None:
+        """Log in again to replace a token the service refused."""
+        relogin = getattr(getattr(self.gis, "_con", None), "relogin", None)
+        if relogin is not None and self.token is not None:
+            logger.info("Token refused, logging in again")
+            relogin()
+
     def print_layer_fields(self, layer: FeatureLayer) -> None:
         """Print layer fields."""
-        print("\n" + "=" * 80)
-        print(f"LAYER: {layer.properties.name}")
-        print("=" * 80)
-        for f in layer.properties.fields:
-            print(f"  {f.name:20} | {f.type:15} | {f.alias}")
-        print("=" * 80 + "\n")
-
-
-def df_to_features(df: pd.DataFrame, spatial_reference: int = 4326) -> list[Feature]:
-    """Convert DataFrame to ArcGIS Features."""
-    features = []
-    skipped = 0
-
-    for _, row in df.iterrows():
-        if pd.isna(row["long"]) or pd.isna(row["lat"]):
-            skipped += 1
-            continue
+        print_layer_fields(layer)
 
-        attributes = {
-            "date": str(row["Дата"]),
-            "region": str(row["Область"]),
-            "city": str(row["Місто"]),
-            "value_1": int(row["Значення 1"]),
-            "value_2": int(row["Значення 2"]),
-            "value_3": int(row["Значення 3"]),
-            "value_4": int(row["Значення 4"]),
-            "value_5": int(row["Значення 5"]),
-            "value_6": int(row["Значення 6"]),
-            "value_7": int(row["Значення 7"]),
-            "value_8": int(row["Значення 8"]),
-            "value_9": int(row["Значення 9"]),
-            "value_10": int(row["Значення 10"])
-        }
 
-        geometry = {
-            "x": float(row["long"]),
-            "y": float(row["lat"]),
-            "spatialReference": {"wkid": spatial_reference}
-        }
+def print_layer_fields(layer: FeatureLayer) -> None:
+    """Print the name, type and alias of every field of ``layer``."""
+    print("\n" + "=" * 80)
+    print(f"LAYER: {layer.properties.name}")
+    print("=" * 80)
+    for f in layer.properties.fields:
+        print(f"  {f.name:20} | {f.type:15} | {f.alias}")
+    print("=" * 80 + "\n")
+
+
+def df_to_features(df: pd.DataFrame, spatial_reference: int = 4326, as_dict: bool = False, raw: bool = False) -> list[Feature]:
+    """Convert DataFrame to ArcGIS Features (or plain feature dicts with ``as_dict``)."""
+    return list(iter_features([df], spatial_reference, as_dict, raw))
 
-        features.append(Feature(attributes=attributes, geometry=geometry))
+
+def iter_features(
+    chunks: Iterable[pd.DataFrame],
+    spatial_reference: int = 4326,
+    as_dict: bool = False,
+    raw: bool = False
+) -> Iterator[Feature]:
+    """Convert DataFrame chunks to ArcGIS Features lazily."""
+    return build_features((_feature_columns(chunk) for chunk in chunks), spatial_reference, as_dict, raw)
+
+
+def build_features(
+    prepared: Iterable[tuple[list[str], list[list], int]],
+    spatial_reference: int = 4326,
+    as_dict: bool = False,
+    raw: bool = False
+) -> Iterator[Feature]:
+    """Build Features from ``(field names, column lists, skipped rows)`` parts.
+
+    The column lists are those of ``_feature_columns``: one per field, then x and y.
+    ``as_dict`` yields the equivalent plain dicts, without importing arcgis;
+    ``raw`` yields ``RawFeature`` JSON with coordinates rounded to
+    ``config.COORDINATE_PRECISION`` decimals, for ``RestFeatureLayer``.
+    """
+    feature_cls = _feature_factory(as_dict, raw)
+    created = skipped = 0
+
+    for names, columns, part_skipped in prepared:
+        skipped += part_skipped
+        for *values, x, y in zip(*columns):
+            created += 1
+            yield feature_cls(
+                attributes=dict(zip(names, values)),
+                geometry={"x": x, "y": y, "spatialReference": {"wkid": spatial_reference}}
+            )
 
     if skipped:
         logger.warning(f"Skipped {skipped} rows (invalid coordinates)")
 
-    logger.info(f"Created {len(features)} features")
-    return features
+    logger.info(f"Created {created} features")
+
+
+def _feature_factory(as_dict: bool = False, raw: bool = False) -> Callable[..., Feature]:
+    """Return the ``(attributes=, geometry=)`` constructor ``build_features`` uses."""
+    if raw:
+        precision = config.COORDINATE_PRECISION
+        return lambda attributes, geometry: RawFeature(dumps_json({
+            "attributes": attributes,
+            "geometry": {**geometry, "x": round(geometry["x"], precision), "y": round(geometry["y"], precision)}
+        }))
+    return dict if as_dict else _feature_cls()
+
+
+class FeatureBatch:
+    """Features stored as NumPy columns, built only when sliced out for a request.
+
+    Text fields are kept as small integer codes into per-field categories and
+    numbers in their frame dtype; field names and the spatial reference are
+    stored once. Iterating, indexing or ``to_list`` build what
+    ``build_features`` would: ``Feature`` objects, dicts with ``as_dict`` or
+    ``RawFeature`` with ``raw``. Slices share the columns.
+    """
+
+    __slots__ = ("names", "columns", "categories", "x", "y", "spatial_reference", "as_dict", "raw")
+
+    def __init__(
+        self,
+        names: list[str],
+        columns: list[np.ndarray],
+        categories: list[np.ndarray | None],
+        x: np.ndarray,
+        y: np.ndarray,
+        spatial_reference: int = 4326,
+        as_dict: bool = False,
+        raw: bool = False
+    ):
+        self.names = names
+        self.columns = columns
+        self.categories = categories
+        self.x = x
+        self.y = y
+        self.spatial_reference = spatial_reference
+        self.as_dict = as_dict
+        self.raw = raw
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, spatial_reference: int = 4326, as_dict: bool = False, raw: bool = False) -> "FeatureBatch":
+        """Encode the mapped columns of an expanded frame, skipping invalid coordinates like ``df_to_features``."""
+        batch, skipped = cls._encode(df, spatial_reference, as_dict, raw)
+        if skipped:
+            logger.warning(f"Skipped {skipped} rows (invalid coordinates)")
+        logger.info(f"Encoded {len(batch)} features in {batch.nbytes / 2**20:.1f} MB")
+        return batch
+
+    @classmethod
+    def _encode(cls, df: pd.DataFrame, spatial_reference: int, as_dict: bool, raw: bool) -> tuple["FeatureBatch", int]:
+        """``from_dataframe`` without logging; also returns the number of skipped rows."""
+        import pandas as pd
+
+        valid = (df["long"].notna() & df["lat"].notna()).to_numpy()
+        skipped = int(len(df) - valid.sum())
+        valid_df = df[valid] if skipped else df
+
+        mapping = _field_mapping(df)
+        columns, categories = [], []
+        for col, _, cast in mapping:
+            series = valid_df[col]
+            if cast is str:
+                # Categorical columns factorize without a per-row string copy
+                codes, uniques = pd.factorize(series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype(str), use_na_sentinel=False)
+                columns.append(codes.astype(np.min_scalar_type(max(len(uniques) - 1, 0))))
+                categories.append(np.asarray(uniques.astype(str), dtype=object))
+            else:
+                columns.append(series.to_numpy() if pd.api.types.is_integer_dtype(series.dtype) else series.to_numpy(dtype=np.int64))
+                categories.append(None)
+
+        return cls(
+            [field for _, field, _ in mapping], columns, categories,
+            valid_df["long"].to_numpy(), valid_df["lat"].to_numpy(),
+            spatial_reference, as_dict, raw
+        ), skipped
+
+    @classmethod
+    def concat(cls, batches: list["FeatureBatch"]) -> "FeatureBatch":
+        """Join batches with the same fields; text codes are re-based onto merged categories."""
+        first = batches[0]
+        if len(batches) == 1:
+            return first
+        if any(batch.names != first.names for batch in batches):
+            raise ValueError("Cannot concatenate feature batches with different fields")
+        columns, categories = [], []
+        for i in range(len(first.names)):
+            if first.categories[i] is None:
+                columns.append(np.concatenate([batch.columns[i] for batch in batches]))
+                categories.append(None)
+                continue
+            merged = {}
+            parts = []
+            for batch in batches:
+                lookup = np.array([merged.setdefault(value, len(merged)) for value in batch.categories[i]], dtype=np.int64)
+                parts.append(lookup[batch.columns[i]] if len(lookup) else batch.columns[i].astype(np.int64))
+            codes = np.concatenate(parts)
+            columns.append(codes.astype(np.min_scalar_type(max(len(merged) - 1, 0))))
+            categories.append(np.array(list(merged), dtype=object))
+
+        return cls(
+            first.names, columns, categories,
+            np.concatenate([batch.x for batch in batches]), np.concatenate([batch.y for batch in batches]),
+            first.spatial_reference, first.as_dict, first.raw
+        )
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FeatureBatch(
+                self.names, [column[index] for column in self.columns], self.categories,
+                self.x[index], self.y[index], self.spatial_reference, self.as_dict, self.raw
+            )
+        return self[index:index + 1 or None].to_list()[0]
+
+    def __iter__(self) -> Iterator[Feature]:
+        for start in range(0, len(self), 1000):
+            yield from self[start:start + 1000].to_list()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays (categories excluded)."""
+        return sum(column.nbytes for column in self.columns) + self.x.nbytes + self.y.nbytes
+
+    def to_list(self) -> list[Feature]:
+        """Build every feature of the batch."""
+        feature_cls = _feature_factory(self.as_dict, self.raw)
+        values = [
+            (column.tolist() if categories is None else categories[column].tolist())
+            for column, categories in zip(self.columns, self.categories)
+        ]
+        spatial_reference = self.spatial_reference
+        return [
+            feature_cls(
+                attributes=dict(zip(self.names, row)),
+                geometry={"x": x, "y": y, "spatialReference": {"wkid": spatial_reference}}
+            )
+            for *row, x, y in zip(*values, self.x.astype(np.float64).tolist(), self.y.astype(np.float64).tolist())
+        ]
+
+
+def _feature_columns(df: pd.DataFrame) -> tuple[list[str], list[list], int]:
+    """Mask invalid coordinates and cast every mapped column once.
+
+    Returns the field names, one Python list per field followed by x and y
+    lists, and the number of skipped rows.
+    """
+    names, arrays, skipped = feature_arrays(df)
+    return names, [array.tolist() for array in arrays], skipped
+
+
+def feature_arrays(df: pd.DataFrame) -> tuple[list[str], list[np.ndarray], int]:
+    """Like ``_feature_columns`` but returning NumPy arrays (strings as object arrays)."""
+    valid = (df["long"].notna() & df["lat"].notna()).to_numpy()
+    skipped = int(len(df) - valid.sum())
+    valid_df = df[valid] if skipped else df
+
+    mapping = _field_mapping(df)
+    arrays = []
+    for col, _, cast in mapping:
+        series = valid_df[col]
+        if cast is str:
+            arrays.append(series.astype(str).to_numpy(dtype=object))
+        else:
+            arrays.append(series.to_numpy(dtype=np.int64))
+
+    arrays.append(valid_df["long"].to_numpy(dtype=np.float64))
+    arrays.append(valid_df["lat"].to_numpy(dtype=np.float64))
+
+    return [field for _, field, _ in mapping], arrays, skipped
+
+
+def _field_mapping(df: pd.DataFrame) -> list[tuple[str, str, type]]:
+    """FIELD_MAPPING plus the weighted-output fields present in ``df``."""
+    return FIELD_MAPPING + [entry for entry in RUN_MAPPING if entry[0] in df.columns]
+
+
+class AdaptiveBatcher:
+    """Choose batch sizes from estimated payload bytes and observed latency.
+
+    The size grows while batches succeed faster than ``target_latency`` and is
+    halved after a failure; it never exceeds what fits in ``max_payload_bytes``.
+    """
+
+    def __init__(
+        self,
+        initial_size: int = 500,
+        min_size: int = 1,
+        max_size: int = None,
+        max_payload_bytes: int = None,
+        target_latency: float = None
+    ):
+        self.size = initial_size
+        self.min_size = min_size
+        self.max_size = max_size or config.MAX_BATCH_SIZE
+        self.max_payload_bytes = max_payload_bytes or config.MAX_PAYLOAD_BYTES
+        self.target_latency = target_latency or config.TARGET_BATCH_SECONDS
+        self.bytes_per_feature = None
+        self.error_rate = 0.0
+        self._lock = threading.Lock()
+
+    def next_size(self) -> int:
+        """Return the number of features for the next batch."""
+        with self._lock:
+            size = self.size
+            if self.bytes_per_feature:
+                size = min(size, int(self.max_payload_bytes // self.bytes_per_feature))
+            return max(self.min_size, min(size, self.max_size))
+
+    def observe_payload(self, batch: list, sample: int = 5) -> None:
+        """Update the per-feature payload estimate from the first features of a batch."""
+        if not batch:
+            return
+        estimate = estimate_payload_bytes(batch, sample) / len(batch)
+        with self._lock:
+            if self.bytes_per_feature is None:
+                self.bytes_per_feature = estimate
+            else:
+                self.bytes_per_feature = 0.8 * self.bytes_per_feature + 0.2 * estimate
+
+    def record_success(self, size: int, latency: float) -> None:
+        """Grow after fast responses, shrink after slow ones."""
+        with self._lock:
+            self.error_rate *= 0.8
+            if latency < self.target_latency / 2 and self.error_rate < 0.1 and size >= self.size:
+                self.size = min(self.max_size, int(self.size * 1.5) + 1)
+            elif latency > self.target_latency:
+                self.size = max(self.min_size, int(self.size * 0.75))
+
+    def record_failure(self, size: int) -> None:
+        """Halve the batch size after a timeout, size limit or other error."""
+        with self._lock:
+            self.error_rate = 0.8 * self.error_rate + 0.2
+            self.size = max(self.min_size, min(self.size, size) // 2)
+
+
+def _feature_dict(feature) -> dict:
+    """Return the JSON-serializable form of a Feature or plain feature dict."""
+    return feature.as_dict if hasattr(feature, "as_dict") else feature
+
+
+def dumps_json(obj) -> bytes:
+    """Serialize to compact UTF-8 JSON with orjson or ujson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    if ujson is not None:
+        return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RawFeature(bytes):
+    """A feature already encoded as applyEdits JSON; decoded only when inspected."""
+
+    __slots__ = ()
+
+    @property
+    def as_dict(self) -> dict:
+        return json.loads(self)
+
+    @property
+    def attributes(self) -> dict:
+        return self.as_dict["attributes"]
+
+    @property
+    def geometry(self) -> dict:
+        return self.as_dict["geometry"]
+
+
+def estimate_payload_bytes(batch: list, sample: int = 5) -> int:
+    """Estimate the serialized size of a batch from its first few features."""
+    if not batch:
+        return 0
+    if isinstance(batch[0], bytes):
+        return sum(len(feature) + 1 for feature in batch) + 1
+    head = batch[:sample]
+    return int(len(json.dumps([_feature_dict(f) for f in head], default=str)) / len(head) * len(batch))
+
+
+class RetryPolicy:
+    """Retry transient failures with capped exponential backoff and full jitter."""
+
+    def __init__(
+        self,
+        max_retries: int = None,
+        base_delay: float = None,
+        max_delay: float = None,
+        sleep=time.sleep
+    ):
+        self.max_retries = config.MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = config.RETRY_BASE_SECONDS if base_delay is None else base_delay
+        self.max_delay = config.RETRY_MAX_SECONDS if max_delay is None else max_delay
+        self.sleep = sleep
+
+    def delay(self, attempt: int) -> float:
+        """Return a jittered wait before retry number ``attempt`` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+# Status codes count only next to "HTTP", "Error Code", "status" or at the start of the message
+_CODE_CONTEXT = r"(?:\bhttp(?:\s+error)?|\berror\s+code|\bstatus(?:\s+code)?|^\w+:)\W*"
+
+_TRANSIENT_PATTERNS = [
+    ("throttled", re.compile(_CODE_CONTEXT + r"429\b|too many requests|rate limit", re.IGNORECASE)),
+    ("server", re.compile(_CODE_CONTEXT + r"50[0234]\b|service unavailable|bad gateway|internal server error", re.IGNORECASE)),
+    ("token", re.compile(_CODE_CONTEXT + r"49[89]\b|invalid token|token required|token expired", re.IGNORECASE)),
+    ("timeout", re.compile(r"timed? ?out", re.IGNORECASE)),
+    ("connection", re.compile(r"connection (aborted|reset|refused|error)|remote end closed", re.IGNORECASE)),
+]
+
+
+def classify_error(error: Exception) -> str:
+    """Return the error class name; anything not listed as transient is 'permanent'.
+
+    'token' errors are worth retrying only after the token was refreshed.
+    """
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    if isinstance(error, ConnectionError):
+        return "connection"
+
+    message = f"{type(error).__name__}: {error}"
+    for name, pattern in _TRANSIENT_PATTERNS:
+        if pattern.search(message):
+            return name
+    return "permanent"
 
 
 def upload_features_batch(
     layer: FeatureLayer,
-    features: list[Feature],
+    features: Iterable[Feature],
     batch_size: int = 500,
-    show_progress: bool = True
-) -> dict[str, int]:
-    """Upload features in batches."""
-    total = len(features)
-    success = failed = 0
-    batches = range(0, total, batch_size)
-
-    iterator = batches
+    show_progress: bool = True,
+    workers: int = 1,
+    batcher: AdaptiveBatcher = None,
+    retry: RetryPolicy = None,
+    committed: Iterable[tuple[int, int]] = (),
+    on_commit: Callable[[int, list], None] = None,
+    recorder: RunRecorder = None
+) -> dict:
+    """Upload features in batches, keeping up to ``workers`` requests in flight.
+
+    ``features`` may be a list or any iterable, e.g. the ``iter_features``
+    generator; batches are pulled only as upload slots free up. Transient
+    errors are retried according to ``retry``. With a ``batcher`` the size of
+    every batch is chosen adaptively, and batches failing with a permanent
+    error (e.g. a bad feature or HTTP 413) are split in half and retried;
+    transient errors that exhaust their retries fail the batch outright.
+
+    Features whose positions fall in a ``committed`` ``(start, end)`` range are
+    skipped. After every applyEdits request that returned, ``on_commit`` is
+    called from the calling thread with the start position and the objectIds
+    of that request (``None`` for rejected features). Every request is also
+    recorded in ``recorder`` when given.
+    """
+    total = success = failed = 0
+    next_size = batcher.next_size if batcher else lambda: batch_size
+    sender = _BatchSender(layer, batcher, retry or RetryPolicy(), recorder)
+    reader = _BatchReader(features, next_size, committed)
+
+    progress = None
     if show_progress:
         try:
             from tqdm import tqdm
-            iterator = tqdm(batches, desc="Uploading", unit="batch")
+            progress = tqdm(total=len(features) if hasattr(features, "__len__") else None, desc="Uploading", unit="feature")
         except ImportError:
             pass
 
-    for i in iterator:
-        batch = features[i:i + batch_size]
+    # Submitted but unfinished batches are capped so memory stays bounded
+    max_in_flight = max(1, workers) * 2
+
+    def collect(done) -> None:
+        """Count finished requests and pass on their commits; re-raise the first error afterwards."""
+        nonlocal success, failed
+        error = None
+        for future in done:
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                error = error or future.exception()
+                continue
+            batch_success, batch_failed, commits = future.result()
+            success += batch_success
+            failed += batch_failed
+            if on_commit:
+                for start, object_ids in commits:
+                    on_commit(start, object_ids)
+            if progress is not None:
+                progress.update(batch_success + batch_failed)
+        if error is not None:
+            raise error
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = set()
         try:
-            result = layer.edit_features(adds=batch)
+            for start, batch in reader:
+                total += len(batch)
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(executor.submit(sender.send, start, batch))
+            collect(wait(pending).done)
+        except BaseException:
+            # Requests already sent may still succeed; report their commits so --resume skips them
+            for future in pending:
+                future.cancel()
+            with contextlib.suppress(Exception):
+                collect(wait(pending).done)
+            raise
 
-            if hasattr(result, 'get') and result.get('addResults'):
-                batch_success = sum(1 for r in result['addResults'] if r.get('success'))
-                success += batch_success
-                failed += len(batch) - batch_success
-            else:
-                success += len(batch)
-        except Exception as e:
-            failed += len(batch)
-            logger.error(f"Batch failed: {e}")
+    if progress is not None:
+        progress.close()
 
+    if reader.skipped:
+        logger.info(f"Skipped {reader.skipped} features committed by a previous run")
     logger.info(f"Upload complete: {success}/{total} succeeded")
+    if sender.retries:
+        logger.info(f"Retried {sender.retries} requests, waited {sender.retry_wait:.1f}s")
 
     if success == 0 and total > 0:
         raise ArcGISError("All batches failed")
 
-    return {"success": success, "failed": failed, "total": total}
+    return {
+        "success": success,
+        "failed": failed,
+        "total": total,
+        "resumed": reader.skipped,
+        "retries": sender.retries,
+        "retry_wait": round(sender.retry_wait, 3),
+        "errors": dict(sender.errors),
+    }
+
+
+class RestFeatureLayer:
+    """``FeatureLayer`` wrapper that sends applyEdits requests itself.
+
+    Features are joined into the ``adds`` array as encoded JSON (``RawFeature``
+    as-is, anything else through ``dumps_json``) and posted as a gzip-compressed
+    multipart form over a keep-alive session pooled for ``pool_size`` threads.
+    Every other attribute is read from the wrapped layer.
+
+    ``token`` may be a callable, read before every request so a renewed token
+    is picked up; ``refresh_token`` is called before a token error is retried.
+    """
+
+    def __init__(
+        self,
+        layer: FeatureLayer,
+        token: str | Callable[[], str | None] = None,
+        refresh_token: Callable[[], None] = None,
+        pool_size: int = 4,
+        compress_level: int = None,
+        timeout: float = 60.0
+    ):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        if not getattr(layer, "url", None):
+            raise ArcGISError("The REST transport needs a layer URL")
+        self.layer = layer
+        self.url = layer.url.rstrip("/")
+        self._token = token
+        self.refresh_token = refresh_token
+        self.compress_level = config.GZIP_LEVEL if compress_level is None else compress_level
+        self.timeout = timeout
+        self.bytes_sent = 0
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        return getattr(self.layer, name)
+
+    @property
+    def token(self) -> str | None:
+        return self._token() if callable(self._token) else self._token
+
+    def edit_features(self, adds=None, updates=None, deletes=None, rollback_on_failure: bool = True, **kwargs) -> dict:
+        """Post one applyEdits request and return its JSON result, raising on service errors."""
+        body, headers = applyedits_request(adds, updates, deletes, rollback_on_failure, self.token, self.compress_level)
+        with self._lock:
+            self.bytes_sent += len(body)
+
+        response = self.session.post(f"{self.url}/applyEdits", data=body, headers=headers, timeout=self.timeout)
+        return applyedits_result(response.status_code, response.reason, response.content)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def applyedits_request(
+    adds: list = None,
+    updates: list = None,
+    deletes=None,
+    rollback_on_failure: bool = True,
+    token: str = None,
+    compress_level: int = 0
+) -> tuple[bytes, dict]:
+    """Return the body and headers of an applyEdits POST."""
+    fields = {"f": b"json", "rollbackOnFailure": b"true" if rollback_on_failure else b"false"}
+    if adds:
+        fields["adds"] = _encode_features(adds)
+    if updates:
+        fields["updates"] = _encode_features(updates)
+    if deletes:
+        fields["deletes"] = (deletes if isinstance(deletes, str) else ",".join(map(str, deletes))).encode("utf-8")
+    if token:
+        fields["token"] = token.encode("utf-8")
+
+    body, content_type = _multipart_body(fields)
+    headers = {"Content-Type": content_type}
+    if compress_level:
+        body = gzip.compress(body, compresslevel=compress_level)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+def applyedits_result(status: int, reason: str, content: bytes) -> dict:
+    """Decode an applyEdits response, raising ``ArcGISError`` for service and HTTP errors."""
+    try:
+        result = json.loads(content)
+    except ValueError:
+        result = {}
+    error = result.get("error") if isinstance(result, dict) else None
+    if error:
+        raise ArcGISError(f"{error.get('message')} (Error Code: {error.get('code')})")
+    if status >= 400:
+        raise ArcGISError(f"HTTP {status} {reason}")
+    return result
+
+
+def _encode_features(features: list) -> bytes:
+    return b"[" + b",".join(f if isinstance(f, bytes) else dumps_json(_feature_dict(f)) for f in features) + b"]"
+
+
+def _multipart_body(fields: dict[str, bytes]) -> tuple[bytes, str]:
+    """Encode form fields as multipart/form-data, which needs no percent-encoding of the JSON."""
+    boundary = f"m1mt{random.getrandbits(64):016x}"
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode("ascii"))
+        parts.append(value)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode("ascii"))
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def delete_features(layer: FeatureLayer, object_ids: list[int], batch_size: int = 500) -> list[int]:
+    """Delete features by objectId in batches and return the objectIds that were deleted."""
+    deleted = []
+    for i in range(0, len(object_ids), batch_size):
+        batch = object_ids[i:i + batch_size]
+        try:
+            result = layer.edit_features(deletes=",".join(map(str, batch)))
+        except Exception as e:
+            logger.error(f"Delete batch failed: {e}")
+            continue
+
+        if hasattr(result, 'get') and result.get('deleteResults') is not None:
+            deleted.extend(r.get('objectId') for r in result['deleteResults'] if r.get('success'))
+        else:
+            deleted.extend(batch)
+
+    logger.info(f"Deleted {len(deleted)}/{len(object_ids)} features")
+    return deleted
+
+
+class SourceTally:
+    """Attribute features of a combined upload back to the sources that produced them.
+
+    ``chain`` concatenates per-source feature iterables and remembers where each
+    source starts; ``record`` is an ``on_commit`` callback counting added features.
+    """
+
+    def __init__(self):
+        self.counts: dict[str, int] = {}
+        self.added: dict[str, int] = {}
+        self._starts: list[int] = []
+        self._labels: list[str] = []
+        self._end = 0
+
+    def chain(self, sources: Iterable[tuple[str, Iterable]]) -> Iterator:
+        for label, features in sources:
+            self._starts.append(self._end)
+            self._labels.append(label)
+            self.counts.setdefault(label, 0)
+            self.added.setdefault(label, 0)
+            for feature in features:
+                self._end += 1
+                self.counts[label] += 1
+                yield feature
+
+    def concat(self, sources: Iterable[tuple[str, FeatureBatch]]) -> FeatureBatch:
+        """Like ``chain`` for ``FeatureBatch`` sources, without building their features."""
+        batches = []
+        for label, batch in sources:
+            self._starts.append(self._end)
+            self._labels.append(label)
+            self.counts[label] = self.counts.get(label, 0) + len(batch)
+            self.added.setdefault(label, 0)
+            self._end += len(batch)
+            batches.append(batch)
+        return FeatureBatch.concat(batches)
+
+    def record(self, start: int, object_ids: list) -> None:
+        for offset, oid in enumerate(object_ids):
+            if oid is not None:
+                self.added[self._labels[bisect_right(self._starts, start + offset) - 1]] += 1
+
+    def summary(self, committed: Iterable[tuple[int, int]] = ()) -> dict[str, dict]:
+        """Per-source feature, resumed, success and failed counts."""
+        resumed = dict.fromkeys(self.counts, 0)
+        ends = self._starts[1:] + [self._end]
+        for label, first, last in zip(self._labels, self._starts, ends):
+            resumed[label] += sum(max(0, min(last, end) - max(first, start)) for start, end in committed)
+
+        return {
+            label: {
+                "features": count,
+                "resumed": resumed[label],
+                "success": self.added[label],
+                "failed": count - resumed[label] - self.added[label],
+            }
+            for label, count in self.counts.items()
+        }
+
+
+class _BatchReader:
+    """Iterate ``(start, batch)`` pairs over features, skipping committed ranges.
+
+    ``next_size`` is asked for every batch length; batches never cross into a
+    committed range.
+    """
+
+    def __init__(self, features: Iterable, next_size: Callable[[], int], committed: Iterable[tuple[int, int]] = ()):
+        self.features = features
+        self.next_size = next_size
+        self.committed = sorted(committed)
+        self.skipped = 0
+
+    def __iter__(self) -> Iterator[tuple[int, list]]:
+        if isinstance(self.features, FeatureBatch):
+            # Slice the columns and build only the features of each batch
+            features = self.features
+
+            def take(size: int) -> list:
+                return features[position:position + size].to_list()
+
+            def skip(size: int) -> int:
+                return len(features.x[position:position + size])
+        else:
+            iterator = iter(self.features)
+            take = lambda size: list(islice(iterator, size))
+            skip = lambda size: sum(1 for _ in islice(iterator, size))
+
+        ranges = iter(self.committed)
+        skip_start, skip_end = next(ranges, (None, None))
+        position = 0
+
+        while True:
+            while skip_end is not None and skip_end <= position:
+                skip_start, skip_end = next(ranges, (None, None))
+
+            if skip_start is not None and skip_start <= position:
+                skipped = skip(skip_end - position)
+                self.skipped += skipped
+                position += skipped
+                if position < skip_end:
+                    return
+                continue
+
+            size = self.next_size()
+            if skip_start is not None:
+                size = min(size, skip_start - position)
+
+            batch = take(size)
+            if not batch:
+                return
+            yield position, batch
+            position += len(batch)
+
+
+def _add_outcome(result, size: int) -> tuple[int, list]:
+    """Return the number of added features and their objectIds (``None`` if rejected).
+
+    A response without ``addResults`` confirms nothing, so the whole batch counts
+    as failed, like the journal and ``SourceTally`` read its ``None`` objectIds.
+    """
+    if hasattr(result, 'get') and result.get('addResults'):
+        object_ids = [r.get('objectId') if r.get('success') else None for r in result['addResults']]
+        return sum(1 for r in result['addResults'] if r.get('success')), object_ids
+    logger.warning(f"applyEdits response has no addResults; counting {size} features as failed")
+    return 0, [None] * size
+
+
+class _BatchSender:
+    """Send batches with retries and optional split-on-failure, counting errors."""
+
+    def __init__(self, layer: FeatureLayer, batcher: AdaptiveBatcher, retry: RetryPolicy, recorder: RunRecorder = None):
+        self.layer = layer
+        self.batcher = batcher
+        self.retry = retry
+        self.recorder = recorder
+        self.retries = 0
+        self.retry_wait = 0.0
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def send(self, start: int, batch: list[Feature]) -> tuple[int, int, list[tuple[int, list]]]:
+        """Send one batch starting at position ``start``.
+
+        Returns (succeeded, failed, commits) where commits lists the start and
+        objectIds of every request that went through.
+        """
+        if self.batcher:
+            self.batcher.observe_payload(batch)
+
+        started, cpu_started = time.monotonic(), time.thread_time()
+        try:
+            result = self._edit_with_retry(batch)
+        except Exception as e:
+            self._record(batch, started, cpu_started, 0)
+            if self.batcher is None:
+                logger.error(f"Batch failed: {e}")
+                return 0, len(batch), []
+
+            self.batcher.record_failure(len(batch))
+            if classify_error(e) != "permanent":
+                # Halves would only multiply requests against a throttled or failing service
+                logger.error(f"Batch of {len(batch)} failed after retries: {e}")
+                return 0, len(batch), []
+            if len(batch) == 1:
+                logger.error(f"Feature failed: {e}")
+                return 0, 1, []
+
+            logger.warning(f"Batch of {len(batch)} failed, retrying in halves: {e}")
+            middle = len(batch) // 2
+            left = self.send(start, batch[:middle])
+            right = self.send(start + middle, batch[middle:])
+            return left[0] + right[0], left[1] + right[1], left[2] + right[2]
+
+        if self.batcher:
+            self.batcher.record_success(len(batch), time.monotonic() - started)
+
+        batch_success, object_ids = _add_outcome(result, len(batch))
+        self._record(batch, started, cpu_started, batch_success)
+        return batch_success, len(batch) - batch_success, [(start, object_ids)]
+
+    def _record(self, batch: list, started: float, cpu_started: float, success: int) -> None:
+        if self.recorder:
+            self.recorder.record_batch(
+                size=len(batch),
+                seconds=time.monotonic() - started,
+                cpu_seconds=time.thread_time() - cpu_started,
+                bytes_sent=estimate_payload_bytes(batch),
+                success=success,
+                failed=len(batch) - success
+            )
+
+    def _edit_with_retry(self, batch: list[Feature]):
+        """Call applyEdits, retrying transient errors; re-raise the last error."""
+        attempt = 0
+        while True:
+            try:
+                return self.layer.edit_features(adds=batch)
+            except Exception as e:
+                error_class = classify_error(e)
+                with self._lock:
+                    self.errors[error_class] += 1
+
+                if error_class == "permanent" or attempt >= self.retry.max_retries:
+                    raise
+                if error_class == "token":
+                    # The same token would be refused again
+                    refresh = getattr(self.layer, "refresh_token", None)
+                    if refresh is None:
+                        raise
+                    refresh()
+
+                delay = self.retry.delay(attempt)
+                with self._lock:
+                    self.retries += 1
+                    self.retry_wait += delay
+                logger.warning(f"Transient {error_class} error, retry {attempt + 1}/{self.retry.max_retries} in {delay:.1f}s: {e}")
+                self.retry.sleep(delay)
+                attempt += 1
@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Iterable
+
+import config
+from utils.arcgis_client import (
+    ArcGISError,
+    RetryPolicy,
+    _add_outcome,
+    _BatchReader,
+    applyedits_request,
+    applyedits_result,
+    classify_error,
+    estimate_payload_bytes
+)
+from utils.instrumentation import RunRecorder
+
+if TYPE_CHECKING:
+    from arcgis.features import Feature, FeatureLayer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class TokenBucket:
+    """Allow ``rate`` acquisitions per second on average, in bursts of up to ``burst``.
+
+    A ``rate`` of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: float = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.waited = 0.0
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.rate:
+            return
+        async with self._lock:
+            while True:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+
+class ByteBudget:
+    """Cap the payload bytes of requests in flight; 0 disables the cap.
+
+    A request larger than the whole budget is let through alone.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, size: int) -> None:
+        async with self._condition:
+            if self.limit:
+                await self._condition.wait_for(lambda: self.in_flight == 0 or self.in_flight + size <= self.limit)
+            self.in_flight += size
+            self.peak = max(self.peak, self.in_flight)
+
+    async def release(self, size: int) -> None:
+        async with self._condition:
+            self.in_flight -= size
+            self._condition.notify_all()
+
+
+class AioHttpSender:
+    """Send applyEdits requests to ``url`` with aiohttp, sharing ``applyedits_request`` with the REST transport.
+
+    ``token`` and ``refresh_token`` work as for ``RestFeatureLayer``.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        token: str | Callable[[], str | None] = None,
+        refresh_token: Callable[[], None] = None,
+        limit: int = 16,
+        compress_level: int = None,
+        timeout: float = 60.0
+    ):
+        if aiohttp is None:
+            raise ArcGISError("The aiohttp sender needs the aiohttp package (pip install aiohttp)")
+        self.url = url.rstrip("/")
+        self._token = token
+        self.refresh_token = refresh_token
+        self.limit = limit
+        self.compress_level = config.GZIP_LEVEL if compress_level is None else compress_level
+        self.timeout = timeout
+        self.bytes_sent = 0
+        self.session = None
+
+    async def __aenter__(self) -> "AioHttpSender":
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.limit),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.session.close()
+
+    @property
+    def token(self) -> str | None:
+        return self._token() if callable(self._token) else self._token
+
+    async def send(self, batch: list) -> dict:
+        body, headers = applyedits_request(adds=batch, token=self.token, compress_level=self.compress_level)
+        self.bytes_sent += len(body)
+        try:
+            async with self.session.post(f"{self.url}/applyEdits", data=body, headers=headers) as response:
+                return applyedits_result(response.status, response.reason, await response.read())
+        except aiohttp.ClientConnectionError as e:
+            raise ConnectionError(str(e)) from e
+
+
+class LayerSender:
+    """Send batches through a layer's blocking ``edit_features`` in worker threads."""
+
+    def __init__(self, layer: FeatureLayer):
+        self.layer = layer
+        self.refresh_token = getattr(layer, "refresh_token", None)
+
+    async def __aenter__(self) -> "LayerSender":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    async def send(self, batch: list) -> dict:
+        return await asyncio.to_thread(self.layer.edit_features, adds=batch)
+
+
+def make_sender(
+    layer: FeatureLayer,
+    token: str | Callable[[], str | None] = None,
+    refresh_token: Callable[[], None] = None,
+    limit: int = 16
+) -> AioHttpSender | LayerSender:
+    """Send through aiohttp to the layer's URL; a layer without a URL (in-process stand-ins) runs in threads."""
+    url = getattr(layer, "url", None)
+    if url:
+        return AioHttpSender(url, token=token, refresh_token=refresh_token, limit=limit)
+    logger.warning("The layer has no URL; sending edits through the layer in threads")
+    return LayerSender(layer)
+
+
+async def upload_async(
+    sender: AioHttpSender | LayerSender,
+    features: Iterable[Feature],
+    batch_size: int = 500,
+    concurrency: int = 16,
+    rate: float = 0.0,
+    max_in_flight_bytes: int = 0,
+    retry: RetryPolicy = None,
+    committed: Iterable[tuple[int, int]] = (),
+    on_commit: Callable[[int, list], None] = None,
+    recorder: RunRecorder = None,
+    show_progress: bool = True
+) -> dict:
+    """Upload features with ``concurrency`` requests on one event loop.
+
+    ``features`` is batched in a worker thread and handed over through a
+    bounded queue, so loading and expansion overlap with network I/O. Every
+    request, retries included, takes a token from a ``rate`` per second
+    bucket, and requests wait while ``max_in_flight_bytes`` of payload are
+    outstanding. ``committed``, ``on_commit`` (called on the loop thread) and
+    the returned stats are those of ``upload_features_batch``.
+    """
+    concurrency = max(1, concurrency)
+    retry = retry or RetryPolicy()
+    bucket = TokenBucket(rate)
+    budget = ByteBudget(max_in_flight_bytes)
+    reader = _BatchReader(features, lambda: batch_size, committed)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+    counts = Counter()
+    errors = Counter()
+
+    progress = None
+    if show_progress:
+        try:
+            from tqdm import tqdm
+            progress = tqdm(total=len(features) if hasattr(features, "__len__") else None, desc="Uploading", unit="feature")
+        except ImportError:
+            pass
+
+    def produce() -> None:
+        try:
+            for item in reader:
+                if stop.is_set():
+                    return
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        finally:
+            for _ in range(concurrency):
+                asyncio.run_coroutine_threadsafe(queue.put(None), loop).result()
+
+    async def send_with_retry(batch: list) -> dict:
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            try:
+                return await sender.send(batch)
+            except Exception as e:
+                error_class = classify_error(e)
+                errors[error_class] += 1
+                if error_class == "permanent" or attempt >= retry.max_retries:
+                    raise
+                if error_class == "token":
+                    # The same token would be refused again
+                    if getattr(sender, "refresh_token", None) is None:
+                        raise
+                    await asyncio.to_thread(sender.refresh_token)
+
+                delay = retry.delay(attempt)
+                counts["retries"] += 1
+                counts["retry_wait"] += delay
+                logger.warning(f"Transient {error_class} error, retry {attempt + 1}/{retry.max_retries} in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def consume() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            start, batch = item
+            size = estimate_payload_bytes(batch)
+            counts["total"] += len(batch)
+
+            await budget.acquire(size)
+            started = time.monotonic()
+            try:
+                result = await send_with_retry(batch)
+            except Exception as e:
+                logger.error(f"Batch failed: {e}")
+                success, object_ids = 0, None
+            else:
+                success, object_ids = _add_outcome(result, len(batch))
+            finally:
+                await budget.release(size)
+
+            counts["success"] += success
+            counts["failed"] += len(batch) - success
+            if recorder:
+                recorder.record_batch(
+                    size=len(batch), seconds=time.monotonic() - started,
+                    bytes_sent=size, success=success, failed=len(batch) - success
+                )
+            if on_commit and object_ids is not None:
+                on_commit(start, object_ids)
+            if progress is not None:
+                progress.update(len(batch))
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        await asyncio.gather(*(consume() for _ in range(concurrency)))
+    finally:
+        stop.set()
+        while not producer.done():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(0.01)
+        if progress is not None:
+            progress.close()
+    await producer
+
+    success, total = counts["success"], counts["total"]
+    if reader.skipped:
+        logger.info(f"Skipped {reader.skipped} features committed by a previous run")
+    logger.info(f"Upload complete: {success}/{total} succeeded")
+    logger.info(f"Peak in-flight payload {budget.peak / 1e6:.1f} MB, waited {bucket.waited:.1f}s for rate limit")
+    if counts["retries"]:
+        logger.info(f"Retried {counts['retries']} requests, waited {counts['retry_wait']:.1f}s")
+
+    if success == 0 and total > 0:
+        raise ArcGISError("All batches failed")
+
+    return {
+        "success": success,
+        "failed": counts["failed"],
+        "total": total,
+        "resumed": reader.skipped,
+        "retries": counts["retries"],
+        "retry_wait": round(counts["retry_wait"], 3),
+        "errors": dict(errors),
+    }
+
+
+def upload_features_async(
+    layer: FeatureLayer,
+    features: Iterable[Feature],
+    token: str | Callable[[], str | None] = None,
+    refresh_token: Callable[[], None] = None,
+    **options
+) -> dict:
+    """Synchronous entry point: run ``upload_async`` for ``layer`` on a new event loop."""
+    concurrency = options.get("concurrency", 16)
+
+    async def run() -> dict:
+        sender = make_sender(layer, token=token, refresh_token=refresh_token, limit=concurrency)
+        # One thread feeds the queue (and refreshes tokens); a LayerSender needs one per request in flight
+        workers = concurrency + 1 if isinstance(sender, LayerSender) else 2
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers))
+        async with sender:
+            stats = await upload_async(sender, features, **options)
+            if getattr(sender, "bytes_sent", 0):
+                logger.info(f"Sent {sender.bytes_sent / 1e6:.2f} MB of compressed applyEdits bodies")
+            return stats
+
+    return asyncio.run(run())
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import logging
+import sqlite3
+from pathlib import Path
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_key(df: pd.DataFrame | list[pd.DataFrame], *parts) -> str:
+    """Return a stable key for a loaded sheet snapshot (or several) and its upload target."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(f"{part}\0".encode("utf-8"))
+    for frame in df if isinstance(df, list) else [df]:
+        digest.update(",".join(map(str, frame.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class UploadJournal:
+    """SQLite journal of committed upload ranges for one sheet snapshot."""
+
+    def __init__(self, path: Path, snapshot: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.snapshot = snapshot
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS upload_batches ("
+            "snapshot TEXT NOT NULL, start INTEGER NOT NULL, end INTEGER NOT NULL, "
+            "object_ids TEXT NOT NULL, committed_at TEXT DEFAULT CURRENT_TIMESTAMP, "
+            "PRIMARY KEY (snapshot, start))"
+        )
+        self.conn.commit()
+
+    def committed_ranges(self) -> list[tuple[int, int]]:
+        """Return ``(start, end)`` feature ranges already committed for this snapshot."""
+        rows = self.conn.execute(
+            "SELECT start, end FROM upload_batches WHERE snapshot = ? ORDER BY start",
+            (self.snapshot,)
+        )
+        return [(start, end) for start, end in rows]
+
+    def object_ids(self) -> list[int]:
+        """Return objectIds recorded for this snapshot."""
+        rows = self.conn.execute("SELECT object_ids FROM upload_batches WHERE snapshot = ?", (self.snapshot,))
+        return [oid for (ids,) in rows for oid in json.loads(ids) if oid is not None]
+
+    def record(self, start: int, object_ids: list) -> None:
+        """Record a request covering ``len(object_ids)`` features from ``start``.
+
+        Only runs of added features are journaled; rejected positions (``None``)
+        stay uncommitted so ``--resume`` sends them again.
+        """
+        runs = []
+        run_start = None
+        for offset, oid in enumerate([*object_ids, None]):
+            if oid is not None and run_start is None:
+                run_start = offset
+            elif oid is None and run_start is not None:
+                runs.append((self.snapshot, start + run_start, start + offset, json.dumps(object_ids[run_start:offset])))
+                run_start = None
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO upload_batches (snapshot, start, end, object_ids) VALUES (?, ?, ?, ?)",
+            runs
+        )
+        self.conn.commit()
+
+    def reset(self) -> None:
+        """Forget everything recorded for this snapshot."""
+        self.conn.execute("DELETE FROM upload_batches WHERE snapshot = ?", (self.snapshot,))
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "UploadJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,6 +1,7 @@
 import logging
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -29,12 +30,105 @@ def expand_row(row: pd.Series, value_columns: Optional[list[str]] = None) -> lis
 def expand_dataframe(
     df: pd.DataFrame,
     value_columns: Optional[list[str]] = None,
-    show_progress: bool = True
+    show_progress: bool = True,
+    vectorized: bool = True,
+    mode: str = "ladder"
 ) -> pd.DataFrame:
-    """Apply expand_row to all DataFrame rows."""
+    """Apply unit ladder rule to all DataFrame rows.
+
+    The vectorized engine builds every ladder row at once; ``vectorized=False``
+    runs the original per-row ``expand_row`` loop, kept as reference implementation.
+    ``mode="weighted"`` collapses identical ladder levels instead (see ``compact_dataframe``).
+    """
+    if value_columns is None:
+        value_columns = [f'Значення {i}' for i in range(1, 11)]
+
+    if mode == "weighted":
+        result_df = compact_dataframe(df, value_columns)
+    elif vectorized:
+        result_df = _expand_vectorized(df, value_columns)
+    else:
+        result_df = _expand_rows(df, value_columns, show_progress)
+
+    logger.info(f"Expanded {len(df)} → {len(result_df)} rows")
+    return result_df
+
+
+def iter_expand_dataframe(
+    chunks: Iterable[pd.DataFrame],
+    value_columns: Optional[list[str]] = None,
+    mode: str = "ladder"
+) -> Iterator[pd.DataFrame]:
+    """Expand DataFrame chunks lazily, yielding one expanded chunk per input chunk."""
     if value_columns is None:
         value_columns = [f'Значення {i}' for i in range(1, 11)]
+    expand = compact_dataframe if mode == "weighted" else _expand_vectorized
+
+    rows_in = rows_out = 0
+    for chunk in chunks:
+        expanded = expand(chunk, value_columns)
+        rows_in += len(chunk)
+        rows_out += len(expanded)
+        if len(expanded):
+            yield expanded
+
+    logger.info(f"Expanded {rows_in} → {rows_out} rows")
+
+
+def _expand_vectorized(df: pd.DataFrame, value_columns: list[str]) -> pd.DataFrame:
+    """Expand all rows with np.repeat and a broadcast ``values >= level`` comparison."""
+    values = df[value_columns].to_numpy()
+    if len(df) == 0:
+        repeats = np.zeros(0, dtype=np.int64)
+    else:
+        repeats = np.clip(values.max(axis=1), 0, None).astype(np.int64)
 
+    row_idx = np.repeat(np.arange(len(df)), repeats)
+    starts = np.repeat(np.cumsum(repeats) - repeats, repeats)
+    levels = np.arange(len(row_idx)) - starts + 1
+
+    flags = (values[row_idx] >= levels[:, None]).astype(np.uint8)
+
+    result_df = df.iloc[row_idx].reset_index(drop=True)
+    for j, col in enumerate(value_columns):
+        result_df[col] = flags[:, j]
+
+    return result_df
+
+
+def compact_dataframe(df: pd.DataFrame, value_columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """Run-length encode the unit ladder: one row per run of identical levels.
+
+    Ladder levels between two consecutive distinct cell values share the same
+    0/1 vector, so each run becomes a single row with ``count``, ``level_from``
+    and ``level_to`` columns; a source row yields at most one row per value column.
+    Repeating every row ``count`` times gives back ``expand_dataframe``'s output.
+    """
+    if value_columns is None:
+        value_columns = [f'Значення {i}' for i in range(1, 11)]
+
+    values = np.clip(df[value_columns].to_numpy(dtype=np.int64), 0, None)
+    levels = np.sort(values, axis=1)
+    previous = np.zeros_like(levels)
+    previous[:, 1:] = levels[:, :-1]
+    row_idx, col_idx = np.nonzero(levels > previous)
+
+    level_to = levels[row_idx, col_idx]
+    level_from = previous[row_idx, col_idx] + 1
+    flags = (values[row_idx] >= level_to[:, None]).astype(np.uint8)
+
+    result_df = df.iloc[row_idx].reset_index(drop=True)
+    for j, col in enumerate(value_columns):
+        result_df[col] = flags[:, j]
+    result_df["count"] = (level_to - level_from + 1).astype(np.int32)
+    result_df["level_from"] = level_from.astype(np.int32)
+    result_df["level_to"] = level_to.astype(np.int32)
+
+    return result_df
+
+
+def _expand_rows(df: pd.DataFrame, value_columns: list[str], show_progress: bool) -> pd.DataFrame:
+    """Reference implementation: expand row by row with expand_row."""
     expanded_rows = []
     iterator = df.iterrows()
 
@@ -48,10 +142,7 @@ def expand_dataframe(
     for _, row in iterator:
         expanded_rows.extend(expand_row(row, value_columns))
 
-    result_df = pd.DataFrame(expanded_rows).reset_index(drop=True)
-    logger.info(f"Expanded {len(df)} → {len(result_df)} rows")
-
-    return result_df
+    return pd.DataFrame(expanded_rows).reset_index(drop=True)
 
 
 def validate_dataframe(df: pd.DataFrame, required_columns: list[str]) -> bool:
@@ -62,3 +153,10 @@ def validate_dataframe(df: pd.DataFrame, required_columns: list[str]) -> bool:
         logger.error(error_msg)
         raise ValueError(error_msg)
     return True
+
+
+def validate_chunks(chunks: Iterable[pd.DataFrame], required_columns: list[str]) -> Iterator[pd.DataFrame]:
+    """Validate every chunk has all required columns while passing chunks through."""
+    for chunk in chunks:
+        validate_dataframe(chunk, required_columns)
+        yield chunk
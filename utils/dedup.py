@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+import config
+
+if TYPE_CHECKING:
+    from arcgis.features import Feature, FeatureLayer
+
+logger = logging.getLogger(__name__)
+
+# Attributes that identify a feature, in digest order; fields missing on the layer are left out
+KEY_FIELDS = [*config.TEXT_FIELDS.values(), *config.VALUE_FIELDS.values(), *config.RUN_FIELDS.values()]
+COORDINATE_DECIMALS = 6
+
+
+def feature_digest(attributes: dict, geometry: dict | None, fields: list[str]) -> int:
+    """Return a signed 64-bit digest of the key attributes and point geometry."""
+    geometry = geometry or {}
+    key = (
+        *(_normalize(attributes.get(field)) for field in fields),
+        _coordinate(geometry.get("x")),
+        _coordinate(geometry.get("y")),
+    )
+    digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def _normalize(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _coordinate(value) -> float | None:
+    return None if value is None else round(float(value), COORDINATE_DECIMALS)
+
+
+def _max_object_id(layer: FeatureLayer, oid_field: str) -> int | None:
+    """Return the highest objectId on ``layer``, or None for an empty layer or an unexpected reply."""
+    result = layer.query(
+        where="1=1",
+        out_statistics=[{"statisticType": "max", "onStatisticField": oid_field, "outStatisticFieldName": "max_oid"}]
+    )
+    features = getattr(result, "features", None) or []
+    value = features[0].attributes.get("max_oid") if features else None
+    return int(value) if isinstance(value, (int, float)) else None
+
+
+class FeatureIndex:
+    """Digests of the features already on a layer, cached in SQLite.
+
+    Identical ladder rows are legitimate, so the index is a multiset: a digest
+    seen n times on the layer lets ``filter`` skip n matching features.
+    ``refresh`` only pages features with an objectId above the highest one
+    cached, and rebuilds when the layer's feature count then differs from the
+    cache (features deleted) or its highest objectId is below the cached one
+    (truncated and refilled).
+    """
+
+    def __init__(self, path: Path, layer_key: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.layer_key = layer_key
+        self.fields = list(KEY_FIELDS)
+        self.skipped = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS feature_index ("
+            "layer TEXT NOT NULL, object_id INTEGER NOT NULL, digest INTEGER NOT NULL, "
+            "PRIMARY KEY (layer, object_id))"
+        )
+        self.conn.commit()
+        self._counts: Counter = None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM feature_index WHERE layer = ?", (self.layer_key,)).fetchone()[0]
+
+    def refresh(self, layer: FeatureLayer, page_size: int = None, full: bool = False) -> int:
+        """Page new features of ``layer`` into the index; return how many were added."""
+        properties = layer.properties
+        oid_field = getattr(properties, "objectIdField", None) or "OBJECTID"
+        page_size = page_size or getattr(properties, "maxRecordCount", None) or 1000
+        available = {field.name for field in getattr(properties, "fields", None) or []}
+        if available:
+            self.fields = [field for field in KEY_FIELDS if field in available]
+
+        cached = len(self)
+        last = self.conn.execute(
+            "SELECT COALESCE(MAX(object_id), 0) FROM feature_index WHERE layer = ?", (self.layer_key,)
+        ).fetchone()[0]
+        if not full and cached:
+            layer_max = _max_object_id(layer, oid_field)
+            if layer_max is not None and layer_max < last:
+                logger.info(f"Layer's highest {oid_field} is {layer_max} but the index has {last}; rebuilding")
+                full = True
+        if full:
+            self._clear()
+            last = 0
+
+        added = self._page(layer, oid_field, page_size, last)
+        if not full and cached:
+            # Deletes below the cached objectIds are invisible to paging; the totals must agree
+            count = layer.query(where="1=1", return_count_only=True)
+            if isinstance(count, int) and count != len(self):
+                logger.info(f"Layer has {count} features but the index {len(self)}; rebuilding")
+                self._clear()
+                added = self._page(layer, oid_field, page_size, 0)
+
+        self._counts = None
+        logger.info(f"Feature index: {added} new features paged, {len(self)} indexed")
+        return added
+
+    def _clear(self) -> None:
+        self.conn.execute("DELETE FROM feature_index WHERE layer = ?", (self.layer_key,))
+
+    def _page(self, layer: FeatureLayer, oid_field: str, page_size: int, last: int) -> int:
+        """Index the features with an objectId above ``last``; return how many were paged."""
+        out_fields = ",".join([oid_field, *self.fields])
+        added = 0
+        while True:
+            page = layer.query(
+                where=f"{oid_field} > {last}",
+                out_fields=out_fields,
+                return_geometry=True,
+                order_by_fields=f"{oid_field} ASC",
+                result_record_count=page_size,
+                out_sr=4326
+            ).features
+            rows = [
+                (self.layer_key, int(f.attributes[oid_field]), feature_digest(f.attributes, f.geometry, self.fields))
+                for f in page
+            ]
+            if not rows:
+                break
+            self.conn.executemany("INSERT OR REPLACE INTO feature_index (layer, object_id, digest) VALUES (?, ?, ?)", rows)
+            self.conn.commit()
+            added += len(rows)
+            last = max(row[1] for row in rows)
+            if len(rows) < page_size:
+                break
+        return added
+
+    def load(self) -> None:
+        """Read the digest multiset into memory; ``filter`` keeps working after ``close``."""
+        rows = self.conn.execute("SELECT digest FROM feature_index WHERE layer = ?", (self.layer_key,))
+        self._counts = Counter(digest for digest, in rows)
+
+    def filter(self, features: Iterable[Feature | dict]) -> Iterator[Feature | dict]:
+        """Yield the features not already on the layer, counting skipped ones in ``skipped``."""
+        if self._counts is None:
+            self.load()
+        counts = self._counts
+
+        for feature in features:
+            if isinstance(feature, dict):
+                digest = feature_digest(feature.get("attributes", {}), feature.get("geometry"), self.fields)
+            else:
+                digest = feature_digest(feature.attributes, feature.geometry, self.fields)
+            if counts.get(digest):
+                counts[digest] -= 1
+                self.skipped += 1
+                continue
+            yield feature
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "FeatureIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import json
+import logging
+import struct
+import time
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+import config
+from utils.arcgis_client import _feature_dict, dumps_json
+from utils.instrumentation import peak_rss_mb
+
+if TYPE_CHECKING:
+    from arcgis.features import Feature
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    ".geojsonl": "geojsonseq",
+    ".geojsons": "geojsonseq",
+    ".geojsonseq": "geojsonseq",
+    ".ndjson": "geojsonseq",
+    ".jsonl": "geojsonseq",
+    ".parquet": "parquet",
+    ".fgb": "flatgeobuf",
+}
+
+# GeoParquet 1.0 column metadata; no "crs" means OGC:CRS84 (longitude, latitude)
+GEO_METADATA = {
+    "version": "1.0.0",
+    "primary_column": "geometry",
+    "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["Point"]}},
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def export_format(path: Path) -> str:
+    """Return the export format of ``path`` from its suffix."""
+    try:
+        return FORMATS[Path(path).suffix.lower()]
+    except KeyError:
+        raise ExportError(f"Unsupported output file {path}; expected one of {', '.join(sorted(FORMATS))}") from None
+
+
+def iter_chunks(features: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(features)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def mapped_fields(mode: str = "ladder") -> dict[str, type]:
+    """Attribute names and types of the features built from the sheet field mapping."""
+    fields = {name: str for name in config.TEXT_FIELDS.values()}
+    fields.update((name, int) for name in config.VALUE_FIELDS.values())
+    if mode == "weighted":
+        fields.update((name, int) for name in config.RUN_FIELDS.values())
+    return fields
+
+
+def point_wkb(x: float, y: float) -> bytes:
+    """Little-endian WKB for a 2D point."""
+    return struct.pack("<BIdd", 1, 1, x, y)
+
+
+def export_features(
+    features: Iterable[Feature | dict], path: Path, chunk_size: int = 10000, fields: dict[str, type] = None
+) -> dict:
+    """Write point features to ``path`` in ``chunk_size`` chunks; return the count, size and format.
+
+    The format follows the suffix: newline-delimited GeoJSON, GeoParquet
+    (WKB geometry) or FlatGeobuf with a spatial index (needs fiona). Only
+    one chunk is held at a time, so memory does not grow with the feature
+    count when ``features`` is a generator.
+
+    ``fields`` (name -> str/int/float, see ``mapped_fields``) sets the
+    Parquet and FlatGeobuf schema, so no features still gives a valid file.
+    Without it the schema is taken from the first feature. Attributes a
+    feature lacks are written as null.
+    """
+    path = Path(path)
+    fmt = export_format(path)
+    writer = {"geojsonseq": _write_geojsonseq, "parquet": _write_parquet, "flatgeobuf": _write_flatgeobuf}[fmt]
+    started = time.perf_counter()
+
+    try:
+        count = writer(iter_chunks(map(_feature_dict, features), chunk_size), path, fields)
+    except ExportError:
+        raise
+    except Exception as e:
+        raise ExportError(f"Failed to write {path}: {e}") from e
+
+    size = path.stat().st_size
+    logger.info(
+        f"Wrote {count} features to {path} in {time.perf_counter() - started:.2f}s "
+        f"(format={fmt}, {size / 1e6:.1f} MB, peak RSS {peak_rss_mb():.0f} MB)"
+    )
+    return {"count": count, "bytes": size, "format": fmt}
+
+
+def geojson_feature(feature: dict) -> dict:
+    """Return the GeoJSON Point feature of an ArcGIS feature dict."""
+    geometry = feature.get("geometry") or {}
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [geometry.get("x"), geometry.get("y")]},
+        "properties": feature.get("attributes", {}),
+    }
+
+
+def _write_geojsonseq(chunks: Iterator[list[dict]], path: Path, fields: dict[str, type] = None) -> int:
+    count = 0
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(b"".join(dumps_json(geojson_feature(feature)) + b"\n" for feature in chunk))
+            count += len(chunk)
+    return count
+
+
+def _field_types(fields: dict[str, type] | None, chunk: list[dict]) -> dict[str, type]:
+    if fields is not None:
+        return fields
+    return {name: type(value) for name, value in chunk[0]["attributes"].items()} if chunk else {}
+
+
+def _write_parquet(chunks: Iterator[list[dict]], path: Path, fields: dict[str, type] = None) -> int:
+    """Write one row group per chunk, or an empty file with the schema of ``fields``."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    count = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = _arrow_schema(_field_types(fields, chunk))
+                writer = pq.ParquetWriter(path, schema, compression="zstd")
+            columns = {name: [feature["attributes"].get(name) for feature in chunk] for name in schema.names[:-1]}
+            columns["geometry"] = [point_wkb(feature["geometry"]["x"], feature["geometry"]["y"]) for feature in chunk]
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            count += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        pq.write_table(_arrow_schema(fields or {}).empty_table(), path)
+    return count
+
+
+def _arrow_schema(fields: dict[str, type]):
+    import pyarrow as pa
+
+    types = {str: pa.string(), int: pa.int64(), float: pa.float64()}
+    return pa.schema([
+        *((name, types.get(kind, pa.string())) for name, kind in fields.items()),
+        ("geometry", pa.binary()),
+    ]).with_metadata({"geo": json.dumps(GEO_METADATA)})
+
+
+def _write_flatgeobuf(chunks: Iterator[list[dict]], path: Path, fields: dict[str, type] = None) -> int:
+    """Write through GDAL's FlatGeobuf driver; the spatial index is built when the file is closed."""
+    try:
+        import fiona
+    except ImportError as e:
+        raise ExportError(f"Writing FlatGeobuf needs fiona (pip install fiona): {e}") from e
+
+    types = {str: "str", int: "int", float: "float"}
+
+    def open_output(field_types: dict[str, type]):
+        schema = {"geometry": "Point", "properties": {name: types.get(kind, "str") for name, kind in field_types.items()}}
+        return fiona.open(path, "w", driver="FlatGeobuf", schema=schema, crs="EPSG:4326", SPATIAL_INDEX="YES")
+
+    count = 0
+    output = None
+    try:
+        for chunk in chunks:
+            if output is None:
+                output = open_output(_field_types(fields, chunk))
+                names = list(output.schema["properties"])
+            output.writerecords(
+                {**geojson_feature(feature), "properties": {name: feature["attributes"].get(name) for name in names}}
+                for feature in chunk
+            )
+            count += len(chunk)
+        if output is None:
+            if fields is None:
+                raise ExportError("No features to write; FlatGeobuf needs the output fields for its schema")
+            output = open_output(fields)
+    finally:
+        if output is not None:
+            output.close()
+    return count
@@ -0,0 +1,436 @@
+"""
+Local stand-in for an ArcGIS FeatureServer layer, for offline load testing.
+
+``FakeFeatureLayer`` can be used in place of a ``FeatureLayer`` in-process;
+``serve_fake_feature_server`` exposes the same service over localhost HTTP
+with the ``applyEdits`` and ``query`` endpoints. ``FakeArcGISClient.gis``
+stages files for the layer's ``append`` like portal items.
+
+    python -m utils.fake_feature_server --port 8765 --latency 0.2 --throttle-rate 0.05
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import config
+
+logger = logging.getLogger(__name__)
+
+LAYER_FIELDS = [
+    ("OBJECTID", "esriFieldTypeOID"),
+    *((field, "esriFieldTypeString") for field in config.TEXT_FIELDS.values()),
+    *((field, "esriFieldTypeInteger") for field in config.VALUE_FIELDS.values()),
+    *((field, "esriFieldTypeInteger") for field in config.RUN_FIELDS.values()),
+]
+
+
+class FakeServiceError(Exception):
+    """Error carrying an ArcGIS REST error code."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{message} (Error Code: {code})")
+        self.code = code
+        self.message = message
+
+
+class FakeFeatureService:
+    """In-memory feature store with configurable latency and failure modes.
+
+    ``throttle_rate`` is the share of requests answered with 429 and
+    ``max_concurrent`` the number of simultaneous requests served before
+    further ones are throttled. Requests larger than ``max_request_bytes``
+    fail with 413 and ``reject_rate`` is the share of added features
+    rejected individually. With a ``token``, HTTP applyEdits requests carrying
+    another token fail with 498.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_concurrent: int = 0,
+        max_request_bytes: int = 0,
+        reject_rate: float = 0.0,
+        seed: int = 0,
+        token: str = None
+    ):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.max_concurrent = max_concurrent
+        self.max_request_bytes = max_request_bytes
+        self.reject_rate = reject_rate
+        self.token = token
+        self.features: dict[int, dict] = {}
+        self.uploads: dict[str, Path] = {}
+        self.requests = 0
+        self.throttled = 0
+        self.bytes_received = 0
+        self._next_id = 1
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply_edits(self, adds: list[dict] = None, deletes: list[int] = None, request_bytes: int = 0) -> dict:
+        """Apply adds and deletes like the REST ``applyEdits`` operation."""
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += request_bytes
+            throttled = (
+                (self.max_concurrent and self._in_flight >= self.max_concurrent)
+                or self._random.random() < self.throttle_rate
+            )
+            if throttled:
+                self.throttled += 1
+            else:
+                self._in_flight += 1
+
+        if throttled:
+            raise FakeServiceError(429, "Too many requests")
+
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if self.max_request_bytes and request_bytes > self.max_request_bytes:
+                raise FakeServiceError(413, f"Request size {request_bytes} exceeds limit {self.max_request_bytes}")
+
+            with self._lock:
+                return {
+                    "addResults": [self._add(feature) for feature in adds or []],
+                    "updateResults": [],
+                    "deleteResults": [self._delete(oid) for oid in deletes or []],
+                }
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def delete_where(self, where: str = "1=1") -> int:
+        """Delete the features matching ``where`` and return how many were removed."""
+        min_id = _parse_min_object_id(where)
+        with self._lock:
+            self.requests += 1
+            object_ids = [oid for oid in self.features if oid > min_id]
+            for oid in object_ids:
+                del self.features[oid]
+        return len(object_ids)
+
+    def truncate(self) -> None:
+        """Delete every feature and, like a hosted layer, restart objectIds at 1."""
+        with self._lock:
+            self.requests += 1
+            self.features.clear()
+            self._next_id = 1
+
+    def query(self, where: str = "1=1", out_fields: str = "*", return_geometry: bool = True,
+              result_offset: int = 0, result_record_count: int = None) -> list[dict]:
+        """Return stored features as feature dicts, ordered by objectId.
+
+        Only ``1=1`` and ``OBJECTID > n`` where clauses are understood.
+        """
+        min_id = _parse_min_object_id(where)
+        end = None if result_record_count is None else result_offset + result_record_count
+        fields = None if out_fields in ("*", None) else set(out_fields.split(",")) | {"OBJECTID"}
+
+        # Stored features are never changed in place, so the page can be built outside the lock
+        with self._lock:
+            self.requests += 1
+            object_ids = [oid for oid in sorted(self.features) if oid > min_id]
+            page = [self.features[oid] for oid in object_ids[result_offset:end]]
+
+        features = []
+        for stored in page:
+            attributes = {k: v for k, v in stored["attributes"].items() if fields is None or k in fields}
+            feature = {"attributes": attributes}
+            if return_geometry:
+                feature["geometry"] = stored["geometry"]
+            features.append(feature)
+        return features
+
+    def _add(self, feature: dict) -> dict:
+        if self._random.random() < self.reject_rate:
+            return {"objectId": None, "success": False, "error": {"code": 1000, "description": "Feature rejected"}}
+
+        oid = self._next_id
+        self._next_id += 1
+        self.features[oid] = {
+            "attributes": {**feature.get("attributes", {}), "OBJECTID": oid},
+            "geometry": feature.get("geometry"),
+        }
+        return {"objectId": oid, "success": True}
+
+    def _delete(self, oid: int) -> dict:
+        if self.features.pop(int(oid), None) is None:
+            return {"objectId": int(oid), "success": False, "error": {"code": 1018, "description": "Feature not found"}}
+        return {"objectId": int(oid), "success": True}
+
+
+def _parse_min_object_id(where: str) -> int:
+    where = (where or "1=1").replace(" ", "").upper()
+    if where.startswith("OBJECTID>"):
+        return int(where[len("OBJECTID>"):])
+    return 0
+
+
+class FakeFeatureLayer:
+    """Duck-typed ``FeatureLayer`` backed by a ``FakeFeatureService``.
+
+    ``supports_truncate`` and ``supports_append`` switch the corresponding
+    layer capabilities, to exercise the fallbacks of a replace.
+    """
+
+    def __init__(self, service: FakeFeatureService = None, name: str = "Fake layer", url: str = None,
+                 supports_truncate: bool = True, supports_append: bool = True):
+        self.service = service or FakeFeatureService()
+        self.url = url
+        self.properties = SimpleNamespace(
+            name=name,
+            maxRecordCount=2000,
+            fields=[SimpleNamespace(name=n, type=t, alias=n) for n, t in LAYER_FIELDS],
+            supportsTruncate=supports_truncate,
+            supportsAppend=supports_append,
+            supportedAppendFormats="geojson" if supports_append else "",
+        )
+        self.manager = SimpleNamespace(truncate=self._truncate)
+
+    def _truncate(self, **kwargs) -> dict:
+        if not self.properties.supportsTruncate:
+            raise FakeServiceError(400, "Truncate is not supported on this layer")
+        self.service.truncate()
+        return {"success": True}
+
+    def delete_features(self, deletes=None, where: str = None, **kwargs) -> dict:
+        """Delete by objectIds or, unlike ``edit_features``, by where clause."""
+        if where is not None:
+            self.service.delete_where(where)
+            return {"deleteResults": []}
+        return self.edit_features(deletes=deletes)
+
+    def append(self, item_id: str = None, upload_format: str = "geojson", upsert: bool = False, **kwargs) -> bool:
+        """Add all features of a staged GeoJSON item in one request."""
+        if not self.properties.supportsAppend or upload_format != "geojson":
+            raise FakeServiceError(400, f"Append of {upload_format} is not supported on this layer")
+        with open(self.service.uploads[item_id], encoding="utf-8") as f:
+            collection = json.load(f)
+        adds = [
+            {"attributes": feature["properties"], "geometry": dict(zip("xy", feature["geometry"]["coordinates"]))}
+            for feature in collection["features"]
+        ]
+        self.service.apply_edits(adds)
+        return True
+
+    def edit_features(self, adds=None, updates=None, deletes=None, **kwargs) -> dict:
+        """Send adds/deletes, raising like the arcgis package on service errors."""
+        add_dicts = [f.as_dict if hasattr(f, "as_dict") else f for f in adds or []]
+        if isinstance(deletes, str):
+            deletes = [int(oid) for oid in deletes.split(",") if oid]
+        request_bytes = len(json.dumps(add_dicts, default=str)) if add_dicts else 0
+        return self.service.apply_edits(add_dicts, deletes, request_bytes=request_bytes)
+
+    def query(self, where: str = "1=1", out_fields: str = "*", return_geometry: bool = True,
+              result_offset: int = 0, result_record_count: int = None, return_count_only: bool = False,
+              return_ids_only: bool = False, out_statistics: list[dict] = None, **kwargs):
+        """Return a FeatureSet-like object with ``features``, or the count / objectIds when asked.
+
+        ``out_statistics`` supports ``min``, ``max`` and ``count`` over the matched features.
+        """
+        from arcgis.features import Feature
+
+        features = self.service.query(where, out_fields, return_geometry, result_offset, result_record_count)
+        if return_count_only:
+            return len(features)
+        if return_ids_only:
+            return {"objectIdFieldName": "OBJECTID", "objectIds": [f["attributes"]["OBJECTID"] for f in features]}
+        if out_statistics:
+            functions = {"min": lambda v: min(v, default=None), "max": lambda v: max(v, default=None), "count": len}
+            attributes = {
+                stat["outStatisticFieldName"]: functions[stat["statisticType"]](
+                    [f["attributes"][stat["onStatisticField"]] for f in features if f["attributes"].get(stat["onStatisticField"]) is not None]
+                )
+                for stat in out_statistics
+            }
+            return SimpleNamespace(features=[Feature(attributes=attributes)])
+        return SimpleNamespace(features=[Feature(attributes=f["attributes"], geometry=f.get("geometry")) for f in features])
+
+
+class _FakeContent:
+    """``gis.content`` stand-in that registers staged files with the service."""
+
+    def __init__(self, service: FakeFeatureService):
+        self.service = service
+
+    def add(self, item_properties: dict, data: str = None, **kwargs) -> SimpleNamespace:
+        item_id = uuid.uuid4().hex
+        self.service.uploads[item_id] = Path(data)
+        return SimpleNamespace(id=item_id, delete=lambda: self.service.uploads.pop(item_id, None) is not None)
+
+
+class FakeArcGISClient:
+    """Drop-in for ``ArcGISClient`` that hands out one fake layer.
+
+    With ``serve`` a layer without a URL is also served over localhost HTTP,
+    for the REST transport and the aiohttp sender; ``close`` stops the server.
+    """
+
+    def __init__(self, service: FakeFeatureService = None, layer: FakeFeatureLayer = None, serve: bool = False):
+        self.layer = layer or FakeFeatureLayer(service or FakeFeatureService(
+            latency=config.FAKE_LATENCY,
+            throttle_rate=config.FAKE_THROTTLE_RATE,
+            max_concurrent=config.FAKE_MAX_CONCURRENT,
+            max_request_bytes=config.FAKE_MAX_REQUEST_BYTES,
+            reject_rate=config.FAKE_REJECT_RATE,
+        ))
+        self.gis = SimpleNamespace(content=_FakeContent(self.layer.service))
+        self.token = None
+        self.server = None
+        if serve and self.layer.url is None:
+            self.server, self.layer.url = serve_fake_feature_server(self.layer.service)
+        logger.info("Using local fake FeatureServer")
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def refresh_token(self) -> None:
+        pass
+
+    def get_feature_layer(self, item_id: str, layer_index: int = 0) -> FakeFeatureLayer:
+        return self.layer
+
+    def print_layer_fields(self, layer: FakeFeatureLayer) -> None:
+        from utils.arcgis_client import print_layer_fields
+
+        print_layer_fields(layer)
+
+
+class _FeatureServerHandler(BaseHTTPRequestHandler):
+    """REST endpoints ``.../FeatureServer/0``, ``/applyEdits`` and ``/query``."""
+
+    service: FakeFeatureService = None
+
+    def do_GET(self):
+        self._handle(parse_qs(urlparse(self.path).query), 0)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        size = len(body)
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            self._handle(_parse_multipart(body, content_type.split("boundary=", 1)[1]), size)
+        else:
+            self._handle(parse_qs(body.decode("utf-8")), size)
+
+    def _handle(self, params: dict, size: int) -> None:
+        path = urlparse(self.path).path.rstrip("/")
+        param = lambda name, default=None: params.get(name, [default])[0]
+
+        try:
+            if path.endswith("/applyEdits"):
+                if self.service.token and param("token") != self.service.token:
+                    raise FakeServiceError(498, "Invalid token")
+                adds = json.loads(param("adds", "[]"))
+                deletes = [int(oid) for oid in (param("deletes") or "").split(",") if oid]
+                payload = self.service.apply_edits(adds, deletes, request_bytes=size)
+            elif path.endswith("/query"):
+                count = param("resultRecordCount")
+                payload = {"features": self.service.query(
+                    param("where", "1=1"),
+                    param("outFields", "*"),
+                    param("returnGeometry", "true") != "false",
+                    int(param("resultOffset", 0)),
+                    int(count) if count else None
+                )}
+            elif path.endswith("/FeatureServer/0"):
+                payload = {
+                    "name": "Fake layer",
+                    "maxRecordCount": 2000,
+                    "fields": [{"name": n, "type": t, "alias": n} for n, t in LAYER_FIELDS],
+                }
+            else:
+                self.send_error(404)
+                return
+        except FakeServiceError as e:
+            payload = {"error": {"code": e.code, "message": e.message, "details": []}}
+            if e.code == 429:
+                self._send_json(payload, status=429)
+                return
+
+        self._send_json(payload)
+
+    def _send_json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _parse_multipart(body: bytes, boundary: str) -> dict[str, list[str]]:
+    """Parse a multipart/form-data body into the ``parse_qs`` shape."""
+    params = {}
+    for part in body.split(f"--{boundary}".encode("ascii"))[1:-1]:
+        head, _, value = part[2:-2].partition(b"\r\n\r\n")
+        name = head.decode("utf-8").split('name="', 1)[1].split('"', 1)[0]
+        params.setdefault(name, []).append(value.decode("utf-8"))
+    return params
+
+
+def serve_fake_feature_server(service: FakeFeatureService, host: str = "127.0.0.1", port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """Serve ``service`` over HTTP in a background thread.
+
+    Returns the server (call ``shutdown()`` when done) and the layer URL.
+    """
+    handler = type("FeatureServerHandler", (_FeatureServerHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{host}:{server.server_port}/arcgis/rest/services/fake/FeatureServer/0"
+    logger.info(f"Fake FeatureServer listening on {url}")
+    return server, url
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a local fake ArcGIS FeatureServer")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=config.FAKE_LATENCY)
+    parser.add_argument("--throttle-rate", type=float, default=config.FAKE_THROTTLE_RATE)
+    parser.add_argument("--max-concurrent", type=int, default=config.FAKE_MAX_CONCURRENT)
+    parser.add_argument("--max-request-bytes", type=int, default=config.FAKE_MAX_REQUEST_BYTES)
+    parser.add_argument("--reject-rate", type=float, default=config.FAKE_REJECT_RATE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format=config.LOG_FORMAT, datefmt=config.LOG_DATE_FORMAT)
+    service = FakeFeatureService(
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        max_concurrent=args.max_concurrent,
+        max_request_bytes=args.max_request_bytes,
+        reject_rate=args.reject_rate,
+    )
+    server, _ = serve_fake_feature_server(service, args.host, args.port)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb() -> float:
+    """Return the process peak resident set size in MB (0 where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def rss_mb() -> float:
+    """Return the current resident set size in MB (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, AttributeError, IndexError, ValueError):
+        return 0.0
+
+
+class Span:
+    """Timings and counters of one pipeline stage.
+
+    ``rss_start_mb``/``rss_end_mb`` are the resident memory when the stage
+    started and finished; ``cumulative_peak_rss_mb`` is the process peak up
+    to the end of the stage, so it includes every earlier stage.
+    """
+
+    def __init__(self, name: str, rows_in: Optional[int] = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.bytes_sent: Optional[int] = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rss_start_mb: Optional[float] = None
+        self.rss_end_mb = 0.0
+        self.cumulative_peak_rss_mb = 0.0
+
+    def as_dict(self) -> dict:
+        data = {
+            "name": self.name,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "rss_start_mb": round(self.rss_start_mb or 0.0, 1),
+            "rss_end_mb": round(self.rss_end_mb, 1),
+            "cumulative_peak_rss_mb": round(self.cumulative_peak_rss_mb, 1),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "bytes_sent": self.bytes_sent,
+        }
+        if self.rows_out and self.wall_seconds > 0:
+            data["rows_per_second"] = round(self.rows_out / self.wall_seconds, 1)
+        return data
+
+
+class RunRecorder:
+    """Collect per-stage spans and per-batch upload records for a run report.
+
+    Stages are timed with ``span`` (context manager), ``timed`` (decorator) or
+    ``track`` (wraps a generator stage; time spent in nested tracked stages is
+    attributed to them, so streaming pipelines still split by stage).
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.spans: dict[str, Span] = {}
+        self.batches: list[dict] = []
+        self.results: dict = {}
+        self._lock = threading.Lock()
+        self._nested = threading.local()
+
+    @contextmanager
+    def span(self, name: str, rows_in: Optional[int] = None) -> Iterator[Span]:
+        """Time the enclosed block, excluding time spent in nested stages."""
+        span = self._get(name, rows_in)
+        self._start_rss(span)
+        stack = self._stack()
+        stack.append([0.0, 0.0])
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield span
+        finally:
+            self._close(span, stack, time.perf_counter() - wall, time.process_time() - cpu)
+            self._end_rss(span)
+
+    def timed(self, name: str):
+        """Decorator recording every call of the function under ``name``."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def track(self, name: str, items: Iterable, rows_in: Optional[int] = None) -> Iterator:
+        """Yield from ``items``, timing only the work done in this stage.
+
+        Items with a length (DataFrame chunks) count as that many rows out,
+        anything else as one.
+        """
+        span = self._get(name, rows_in)
+        span.rows_out = span.rows_out or 0
+        return self._tracked(span, iter(items))
+
+    def _tracked(self, span: Span, iterator: Iterator) -> Iterator:
+        self._start_rss(span)
+        while True:
+            stack = self._stack()
+            stack.append([0.0, 0.0])
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                item = _DONE
+            finally:
+                self._close(span, stack, time.perf_counter() - wall, time.process_time() - cpu)
+
+            if item is _DONE:
+                self._end_rss(span)
+                return
+            span.rows_out += len(item) if hasattr(item, "__len__") else 1
+            yield item
+
+    def record_batch(
+        self, size: int, seconds: float, bytes_sent: int, success: int, failed: int, cpu_seconds: float = None
+    ) -> None:
+        """Record one applyEdits request; safe to call from worker threads.
+
+        ``cpu_seconds`` is left out of the record when the caller cannot measure it.
+        """
+        batch = {"size": size, "seconds": round(seconds, 6)}
+        if cpu_seconds is not None:
+            batch["cpu_seconds"] = round(cpu_seconds, 6)
+        batch.update(bytes_sent=bytes_sent, success=success, failed=failed)
+        with self._lock:
+            self.batches.append(batch)
+
+    def report(self, **extra) -> dict:
+        """Return the run report as a JSON-serializable dict."""
+        latencies = sorted(b["seconds"] for b in self.batches)
+        batch_summary = {
+            "count": len(latencies),
+            "bytes_sent": sum(b["bytes_sent"] for b in self.batches),
+        }
+        if latencies:
+            batch_summary.update({
+                "seconds_p50": latencies[len(latencies) // 2],
+                "seconds_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "seconds_max": latencies[-1],
+            })
+
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            **extra,
+            "results": self.results,
+            "stages": [span.as_dict() for span in self.spans.values()],
+            "batch_summary": batch_summary,
+            "batches": self.batches,
+        }
+
+    def write(self, path: Path, **extra) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(**extra), indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+        logger.info(f"Run report written to {path}")
+
+    def _get(self, name: str, rows_in: Optional[int]) -> Span:
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                span = self.spans[name] = Span(name, rows_in)
+            elif rows_in is not None:
+                span.rows_in = rows_in
+            return span
+
+    @staticmethod
+    def _start_rss(span: Span) -> None:
+        if span.rss_start_mb is None:
+            span.rss_start_mb = rss_mb()
+
+    @staticmethod
+    def _end_rss(span: Span) -> None:
+        span.rss_end_mb = rss_mb()
+        span.cumulative_peak_rss_mb = peak_rss_mb()
+
+    @staticmethod
+    def _close(span: Span, stack: list, wall: float, cpu: float) -> None:
+        """Charge elapsed time minus nested stages to ``span`` and to the parent."""
+        inner_wall, inner_cpu = stack.pop()
+        span.wall_seconds += wall - inner_wall
+        span.cpu_seconds += cpu - inner_cpu
+        if stack:
+            stack[-1][0] += wall
+            stack[-1][1] += cpu
+
+    def _stack(self) -> list:
+        if not hasattr(self._nested, "stack"):
+            self._nested.stack = []
+        return self._nested.stack
+
+
+_DONE = object()
@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "m1mt"
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsExportError(Exception):
+    pass
+
+
+def render_metrics(report: dict, buckets: tuple = LATENCY_BUCKETS) -> str:
+    """Render a run report in the Prometheus text exposition format.
+
+    Counters and the latency histogram cover the single run the report
+    describes; the scraper keeps the history.
+    """
+    results = report.get("results", {})
+    stages = report.get("stages", [])
+    batches = report.get("batches", [])
+    expand = next((s for s in stages if s["name"] == "expand"), {})
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str, samples: list[tuple[dict, float]]) -> None:
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{PREFIX}_{name}{_labels(labels)} {_number(value)}")
+
+    metric("features_uploaded_total", "counter", "Features added to the layer.", [({}, results.get("success", 0))])
+    metric("features_failed_total", "counter", "Features that failed to upload.", [({}, results.get("failed", 0))])
+    metric("upload_retries_total", "counter", "applyEdits requests retried after transient errors.", [({}, results.get("retries", 0))])
+    metric("upload_errors_total", "counter", "applyEdits errors by class.",
+           [({"class": name}, count) for name, count in sorted(results.get("errors", {}).items())])
+    metric("rows_expanded_total", "counter", "Rows produced by the unit ladder expansion.", [({}, expand.get("rows_out") or 0)])
+    metric("upload_bytes_total", "counter", "Estimated applyEdits payload bytes.", [({}, sum(b["bytes_sent"] for b in batches))])
+
+    latencies = [b["seconds"] for b in batches]
+    samples = [({"le": _number(bound)}, sum(1 for s in latencies if s <= bound)) for bound in buckets]
+    samples.append(({"le": "+Inf"}, len(latencies)))
+    lines.append(f"# HELP {PREFIX}_batch_latency_seconds applyEdits request latency.")
+    lines.append(f"# TYPE {PREFIX}_batch_latency_seconds histogram")
+    for labels, value in samples:
+        lines.append(f"{PREFIX}_batch_latency_seconds_bucket{_labels(labels)} {value}")
+    lines.append(f"{PREFIX}_batch_latency_seconds_sum {_number(sum(latencies))}")
+    lines.append(f"{PREFIX}_batch_latency_seconds_count {len(latencies)}")
+
+    metric("stage_duration_seconds", "gauge", "Wall time per pipeline stage.",
+           [({"stage": s["name"]}, s["wall_seconds"]) for s in stages])
+    metric("stage_rss_bytes", "gauge", "Resident memory when a pipeline stage started and finished.",
+           [({"stage": s["name"], "at": at}, s.get(f"rss_{at}_mb", 0) * 2**20) for s in stages for at in ("start", "end")])
+    metric("stage_cumulative_peak_rss_bytes", "gauge", "Process peak resident memory up to the end of a stage, earlier stages included.",
+           [({"stage": s["name"]}, s.get("cumulative_peak_rss_mb", 0) * 2**20) for s in stages])
+    if "swap_seconds" in results:
+        metric("layer_swap_seconds", "gauge", "Time the layer was empty or partial during a replace.", [({}, results["swap_seconds"])])
+    metric("run_peak_rss_bytes", "gauge", "Peak resident memory of the run.", [({}, report.get("peak_rss_mb", 0) * 2**20)])
+    metric("run_exit_code", "gauge", "Exit code of the run.", [({}, report.get("exit_code", 0))])
+    if "finished_at" in report:
+        finished = datetime.fromisoformat(report["finished_at"]).timestamp()
+        metric("run_finished_timestamp_seconds", "gauge", "Unix time the run finished.", [({}, finished)])
+
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(text: str, path: Path) -> None:
+    """Write metrics for the node-exporter textfile collector (atomically)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    tmp_path.replace(path)
+    logger.info(f"Metrics written to {path}")
+
+
+def push_metrics(text: str, gateway_url: str, job: str = PREFIX, timeout: float = 10) -> None:
+    """Replace the job's metrics on a pushgateway-compatible endpoint."""
+    import urllib.request
+
+    url = f"{gateway_url.rstrip('/')}/metrics/job/{job}"
+    request = urllib.request.Request(
+        url, data=text.encode("utf-8"), method="PUT", headers={"Content-Type": CONTENT_TYPE}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout):
+            pass
+    except OSError as e:
+        raise MetricsExportError(f"Failed to push metrics to {url}: {e}") from e
+    logger.info(f"Metrics pushed to {url}")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
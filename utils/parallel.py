@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import TYPE_CHECKING, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.arcgis_client import FeatureBatch
+from utils.data_processing import compact_dataframe, _expand_vectorized
+
+if TYPE_CHECKING:
+    from arcgis.features import Feature
+
+logger = logging.getLogger(__name__)
+
+
+def parallel_feature_batch(
+    df: pd.DataFrame,
+    value_columns: Optional[list[str]] = None,
+    jobs: int = 2,
+    mode: str = "ladder",
+    spatial_reference: int = 4326,
+    partition_rows: Optional[int] = None,
+    as_dict: bool = False,
+    raw: bool = False
+) -> FeatureBatch:
+    """Expand and encode ``df`` in a process pool.
+
+    Row-range partitions are expanded and encoded as ``FeatureBatch`` columns
+    by the workers and joined here in partition order with
+    ``FeatureBatch.concat``, so no ``Feature`` is built in this process and the
+    result equals ``FeatureBatch.from_dataframe(expand_dataframe(df, ...))``.
+    """
+    if value_columns is None:
+        value_columns = [f'Значення {i}' for i in range(1, 11)]
+    if partition_rows is None:
+        partition_rows = max(1, -(-len(df) // (jobs * 4)))
+
+    # An empty frame still goes through one worker, for a batch with the full field list
+    starts = range(0, max(len(df), 1), partition_rows)
+    logger.info(f"Expanding {len(df)} rows in {len(starts)} partitions on {jobs} processes")
+    batches, skipped = [], 0
+    for batch, part_skipped in _iter_partitions(df, starts, partition_rows, value_columns, mode, jobs, (spatial_reference, as_dict, raw)):
+        batches.append(batch)
+        skipped += part_skipped
+
+    batch = FeatureBatch.concat(batches)
+    if skipped:
+        logger.warning(f"Skipped {skipped} rows (invalid coordinates)")
+    logger.info(f"Encoded {len(batch)} features in {batch.nbytes / 2**20:.1f} MB")
+    return batch
+
+
+def parallel_features(
+    df: pd.DataFrame,
+    value_columns: Optional[list[str]] = None,
+    jobs: int = 2,
+    mode: str = "ladder",
+    spatial_reference: int = 4326,
+    partition_rows: Optional[int] = None,
+    as_dict: bool = False,
+    raw: bool = False
+) -> list[Feature]:
+    """Features of ``parallel_feature_batch``; equals ``df_to_features(expand_dataframe(df, ...))``."""
+    return parallel_feature_batch(df, value_columns, jobs, mode, spatial_reference, partition_rows, as_dict, raw).to_list()
+
+
+def _iter_partitions(df, starts, partition_rows, value_columns, mode, jobs, encoding) -> Iterator[tuple[FeatureBatch, int]]:
+    """Keep ``2 * jobs`` partitions submitted and yield results in submission order."""
+    rows_out = 0
+    starts = iter(starts)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        submit = lambda start: executor.submit(_expand_partition, df.iloc[start:start + partition_rows], value_columns, mode, *encoding)
+        pending = deque(submit(start) for start in islice(starts, jobs * 2))
+        while pending:
+            batch, skipped, rows = pending.popleft().result()
+            pending.extend(submit(start) for start in islice(starts, 1))
+            rows_out += rows
+            yield batch, skipped
+
+    logger.info(f"Expanded {len(df)} → {rows_out} rows")
+
+
+def _expand_partition(
+    part: pd.DataFrame, value_columns: list[str], mode: str, spatial_reference: int, as_dict: bool, raw: bool
+) -> tuple[FeatureBatch, int, int]:
+    """Worker: expand and encode one partition; return it with its skipped and expanded row counts.
+
+    Text fields are already small codes into categories; numbers are narrowed
+    to the smallest dtype holding them, which keeps the payload near the
+    expanded frame size.
+    """
+    expand = compact_dataframe if mode == "weighted" else _expand_vectorized
+    expanded = expand(part, value_columns)
+    batch, skipped = FeatureBatch._encode(expanded, spatial_reference, as_dict, raw)
+    batch.columns = [column if categories is not None else _narrow(column) for column, categories in zip(batch.columns, batch.categories)]
+    return batch, skipped, len(expanded)
+
+
+def _narrow(array: np.ndarray) -> np.ndarray:
+    if array.dtype.kind not in "iu" or len(array) == 0:
+        return array
+    return array.astype(np.promote_types(np.min_scalar_type(array.min()), np.min_scalar_type(array.max())))
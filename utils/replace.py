@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from utils.arcgis_client import ArcGISError, _feature_dict, upload_features_batch
+from utils.export import geojson_feature
+from utils.instrumentation import RunRecorder
+
+if TYPE_CHECKING:
+    from arcgis.features import Feature, FeatureLayer
+    from arcgis.gis import GIS
+
+logger = logging.getLogger(__name__)
+
+
+def write_geojson(features: Iterable[Feature | dict], path: Path) -> int:
+    """Stream point features into a GeoJSON FeatureCollection file, one per line; return the feature count."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"type":"FeatureCollection","features":[\n')
+        for feature in features:
+            f.write(",\n" if count else "")
+            json.dump(geojson_feature(_feature_dict(feature)), f, ensure_ascii=False, default=str)
+            count += 1
+        f.write("\n]}")
+    return count
+
+
+def read_geojson(path: Path) -> Iterator[dict]:
+    """Yield the features of a ``write_geojson`` file as ArcGIS feature dicts, a line at a time."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip().rstrip(",")
+            if line.endswith("[") or line in ("", "]}"):
+                continue
+            feature = json.loads(line)
+            x, y = feature["geometry"]["coordinates"]
+            yield {"attributes": feature["properties"], "geometry": {"x": x, "y": y, "spatialReference": {"wkid": 4326}}}
+
+
+def supports_append(layer: FeatureLayer) -> bool:
+    """Whether the layer accepts GeoJSON through the append operation."""
+    properties = layer.properties
+    formats = getattr(properties, "supportedAppendFormats", None) or ""
+    return bool(getattr(properties, "supportsAppend", False)) and "geojson" in formats.lower().split(",")
+
+
+def count_features(layer: FeatureLayer) -> int:
+    return int(layer.query(where="1=1", return_count_only=True))
+
+
+def clear_layer(layer: FeatureLayer) -> tuple[str, int]:
+    """Remove every feature with the fastest operation the layer allows.
+
+    Tries ``truncate`` on the layer manager first and falls back to a single
+    ``deleteFeatures`` call with a ``1=1`` where clause. Returns the method
+    used and the number of features removed.
+    """
+    before = count_features(layer)
+    manager = getattr(layer, "manager", None)
+    if manager is not None and getattr(layer.properties, "supportsTruncate", False):
+        try:
+            result = manager.truncate()
+            if not hasattr(result, "get") or result.get("success", True):
+                logger.info(f"Truncated layer ({before} features)")
+                return "truncate", before
+            logger.warning(f"Truncate was refused: {result}")
+        except Exception as e:
+            logger.warning(f"Truncate failed, deleting by where clause instead: {e}")
+
+    try:
+        layer.delete_features(where="1=1")
+    except Exception as e:
+        raise ArcGISError(f"Failed to clear layer: {e}") from e
+
+    remaining = count_features(layer)
+    if remaining:
+        raise ArcGISError(f"Failed to clear layer: {remaining} features left")
+    logger.info(f"Deleted all {before} features by where clause")
+    return "delete", before
+
+
+def append_geojson(layer: FeatureLayer, gis: GIS, path: Path) -> None:
+    """Add a GeoJSON file as a temporary item and append it to the layer."""
+    item = gis.content.add({"type": "GeoJson", "title": path.stem}, data=str(path))
+    try:
+        result = layer.append(item_id=item.id, upload_format="geojson", upsert=False)
+    finally:
+        item.delete()
+    if result is not True and not (hasattr(result, "get") and result.get("success")):
+        raise ArcGISError(f"Append failed: {result}")
+
+
+def replace_layer(
+    layer: FeatureLayer,
+    features: Iterable[Feature | dict],
+    gis: GIS = None,
+    recorder: RunRecorder = None,
+    **upload_options
+) -> dict:
+    """Replace all features of ``layer`` with ``features``.
+
+    The features are first written to a temporary GeoJSON file, so a source
+    that fails to load or validate leaves the layer untouched. The layer is
+    then cleared and, when it supports GeoJSON appends and a ``gis`` to stage
+    the file is given, loaded in one append (``on_commit`` then gets the new
+    objectIds in one call); otherwise, or when the append fails, the file is
+    replayed as batched adds. ``swap_seconds`` in the result is how long the
+    layer was empty or partial. Remaining keyword arguments go to
+    ``upload_features_batch``.
+    """
+    recorder = recorder or RunRecorder()
+    use_append = gis is not None and supports_append(layer)
+
+    with tempfile.TemporaryDirectory(prefix="m1mt_replace_") as tmp:
+        path = Path(tmp) / "features.geojson"
+        with recorder.span("stage") as span:
+            span.rows_out = total = write_geojson(features, path)
+        logger.info(f"Staged {total} features ({path.stat().st_size / 1e6:.1f} MB)")
+
+        with recorder.span("clear") as span:
+            cleared_at = time.monotonic()
+            method, cleared = clear_layer(layer)
+            span.rows_out = cleared
+
+        with recorder.span("upload") as span:
+            stats = None
+            if use_append:
+                try:
+                    append_geojson(layer, gis, path)
+                    object_ids = layer.query(where="1=1", return_ids_only=True)["objectIds"]
+                    success = len(object_ids)
+                    if upload_options.get("on_commit"):
+                        upload_options["on_commit"](0, sorted(object_ids))
+                    stats = {
+                        "success": success, "failed": total - success, "total": total,
+                        "resumed": 0, "retries": 0, "retry_wait": 0.0, "errors": {}
+                    }
+                    upload_method = "append"
+                    span.bytes_sent = path.stat().st_size
+                except Exception as e:
+                    logger.warning(f"Append failed, falling back to batched adds: {e}")
+                    if count_features(layer):
+                        clear_layer(layer)
+
+            if stats is None:
+                stats = upload_features_batch(layer=layer, features=read_geojson(path), recorder=recorder, **upload_options)
+                upload_method = "adds"
+                span.bytes_sent = sum(batch["bytes_sent"] for batch in recorder.batches)
+            span.rows_in = stats["total"]
+            span.rows_out = stats["success"]
+            swap_seconds = time.monotonic() - cleared_at
+
+    logger.info(f"Layer was empty or partial for {swap_seconds:.1f}s ({method} + {upload_method})")
+    stats.update(cleared=cleared, clear_method=method, upload_method=upload_method, swap_seconds=round(swap_seconds, 3))
+    return stats
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+import pandas as pd
+
+from utils.data_processing import expand_dataframe
+from utils.arcgis_client import delete_features, df_to_features, upload_features_batch
+
+if TYPE_CHECKING:
+    from arcgis.features import FeatureLayer
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMN = "_row_key"
+
+
+def row_keys(df: pd.DataFrame, value_columns: Optional[list[str]] = None) -> pd.Series:
+    """Return a stable content key per source row.
+
+    The key hashes date, region, city, coordinates and values; identical rows
+    get an occurrence suffix so each of them is tracked separately.
+    """
+    if value_columns is None:
+        value_columns = [f'Значення {i}' for i in range(1, 11)]
+
+    content = pd.DataFrame({
+        "date": df["Дата"].astype(str),
+        "region": df["Область"].astype(str),
+        "city": df["Місто"].astype(str),
+        "long": df["long"].astype("float64").round(6),
+        "lat": df["lat"].astype("float64").round(6),
+        **{col: df[col].astype("int64") for col in value_columns}
+    })
+    hashes = pd.util.hash_pandas_object(content, index=False).map("{:016x}".format)
+    occurrence = hashes.groupby(hashes).cumcount().astype(str)
+    return (hashes + "#" + occurrence).set_axis(df.index)
+
+
+class SyncState:
+    """SQLite store of synced source rows and the objectIds they produced."""
+
+    def __init__(self, path: Path, source: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.source = source
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_rows ("
+            "source TEXT NOT NULL, row_key TEXT NOT NULL, object_ids TEXT NOT NULL, "
+            "complete INTEGER NOT NULL, synced_at TEXT DEFAULT CURRENT_TIMESTAMP, "
+            "PRIMARY KEY (source, row_key))"
+        )
+        self.conn.commit()
+
+    def rows(self) -> dict[str, tuple[list[int], bool]]:
+        """Return ``{row_key: (object_ids, complete)}`` for this source."""
+        rows = self.conn.execute(
+            "SELECT row_key, object_ids, complete FROM sync_rows WHERE source = ?",
+            (self.source,)
+        )
+        return {key: (json.loads(ids), bool(complete)) for key, ids, complete in rows}
+
+    def save(self, rows: dict[str, tuple[list[int], bool]]) -> None:
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO sync_rows (source, row_key, object_ids, complete) VALUES (?, ?, ?, ?)",
+            [(self.source, key, json.dumps(ids), int(complete)) for key, (ids, complete) in rows.items()]
+        )
+        self.conn.commit()
+
+    def remove(self, keys: list[str]) -> None:
+        self.conn.executemany(
+            "DELETE FROM sync_rows WHERE source = ? AND row_key = ?",
+            [(self.source, key) for key in keys]
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SyncState":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def plan_sync(df: pd.DataFrame, state: SyncState, value_columns: Optional[list[str]] = None) -> tuple[pd.DataFrame, list[str]]:
+    """Split the sheet into rows to upload and stored rows to remove.
+
+    Returns the new (or changed) rows with a ``_row_key`` column, and the keys of
+    stored rows that disappeared from the sheet or were only partially uploaded.
+    """
+    keys = row_keys(df, value_columns)
+    stored = state.rows()
+    synced = {key for key, (_, complete) in stored.items() if complete}
+    current = set(keys)
+
+    new = ~keys.isin(synced).to_numpy()
+    new_df = df[new].assign(**{KEY_COLUMN: keys.to_numpy()[new]})
+    removed = [key for key in stored if key not in synced or key not in current]
+    return new_df, removed
+
+
+def sync_sheet(
+    layer: FeatureLayer,
+    df: pd.DataFrame,
+    state: SyncState,
+    value_columns: Optional[list[str]] = None,
+    batch_size: int = 500,
+    show_progress: bool = True,
+    dry_run: bool = False,
+    output_mode: str = "ladder",
+    **upload_options
+) -> dict:
+    """Upload only new rows and delete features of removed or changed rows."""
+    new_df, removed = plan_sync(df, state, value_columns)
+    stored = state.rows()
+    logger.info(f"Sync plan: {len(new_df)} new rows, {len(removed)} removed, {len(df) - len(new_df)} unchanged")
+
+    stats = {
+        "success": 0, "failed": 0, "total": 0, "resumed": 0, "retries": 0, "retry_wait": 0.0, "errors": {},
+        "deleted": 0, "new_rows": len(new_df), "removed_rows": len(removed), "unchanged_rows": len(df) - len(new_df)
+    }
+    if dry_run:
+        return stats
+
+    if removed:
+        object_ids = [oid for key in removed for oid in stored[key][0]]
+        deleted = set(delete_features(layer, object_ids, batch_size=batch_size))
+        stats["deleted"] = len(deleted)
+        # Rows with features left on the layer keep them, stored incomplete, so the next sync deletes them again
+        remaining = {key: [oid for oid in stored[key][0] if oid not in deleted] for key in removed}
+        state.remove([key for key, ids in remaining.items() if not ids])
+        state.save({key: (ids, False) for key, ids in remaining.items() if ids})
+
+    if len(new_df) == 0:
+        return stats
+
+    expanded = expand_dataframe(new_df, value_columns, show_progress=False, mode=output_mode)
+    valid = (expanded["long"].notna() & expanded["lat"].notna()).to_numpy()
+    feature_keys = expanded.loc[valid, KEY_COLUMN].tolist()
+
+    added: dict[str, list[int]] = {key: [] for key in new_df[KEY_COLUMN]}
+    failed_keys = set()
+
+    def on_commit(start: int, object_ids: list) -> None:
+        for key, oid in zip(feature_keys[start:start + len(object_ids)], object_ids):
+            if oid is None:
+                failed_keys.add(key)
+            else:
+                added[key].append(oid)
+
+    expected = pd.Series(feature_keys, dtype=object).value_counts().to_dict()
+    try:
+        upload_stats = upload_features_batch(
+            layer=layer,
+            features=df_to_features(expanded),
+            batch_size=batch_size,
+            show_progress=show_progress,
+            on_commit=on_commit,
+            **upload_options
+        )
+    finally:
+        # Saved even when the upload is interrupted; rows whose features were
+        # not all added are stored incomplete and redone next run
+        state.save({
+            key: (ids, key not in failed_keys and len(ids) == expected.get(key, 0))
+            for key, ids in added.items()
+        })
+
+    stats.update(upload_stats)
+    return stats